@@ -2,9 +2,14 @@ import pandas as pd
 import numpy as np
 from sklearn.preprocessing import FunctionTransformer
 from sklearn.base import TransformerMixin, BaseEstimator
-from ....ml.feature_engineering.target_mean_aggregate import df_feature_vals_target_association_dict
+from ....ml.feature_engineering.target_association import TargetAssociationStats
+from ....ml.feature_engineering.target_encoding import df_kfold_target_encoding, apply_target_encoding
+from ....ml.feature_engineering.woe import df_woe_tables, apply_woe
+from ....ml.feature_engineering.hashing import hash_encode
+from ....ml.feature_engineering.count_encoding import ValueCountTable
 from ....ml.feature_engineering.one_hot import get_specific_dummies
 from ....ml.feature_engineering.one_hot import text_match_one_hot_from_map
+from ....pandas.engineering.logarithm import positive_domain_offsets
 
 
 class DFLookupTable(TransformerMixin):
@@ -303,8 +308,41 @@ class TargetAssociatedFeatureValueAggregator(TransformerMixin):
             self.y = y
         if isinstance(y, pd.Series):
             self.y = y.name
-        self.one_hot_dict = df_feature_vals_target_association_dict(X, y,
-                                include=self.include, exclude=self.exclude,
+        # Start the sufficient statistics from scratch
+        self.target_stats = TargetAssociationStats(self.y, include=self.include, exclude=self.exclude)
+        return self.partial_fit(X, verbose=verbose)
+
+    def partial_fit(self, X, y=None, verbose=1):
+        """ Update the target statistics with a new batch of labelled data and
+        recompute one_hot_dict from the accumulated statistics without refitting
+        on the full history
+
+        Parameters
+        ----------
+        X: Pandas DataFrame
+            A batch of data including the target column
+        y: str/Pandas Series of Target
+            The STRING column name of the target in dataframe X. Required on the
+            first call, when the transformer hasn't been fit yet
+        """
+        if not hasattr(self, 'target_stats'):
+            if y is None:
+                raise ValueError('y (the target column name) is required on the first call to partial_fit')
+            return self.fit(X, y, verbose=verbose)
+        self.target_stats.partial_fit(X)
+        self._update_one_hot_dict(verbose=verbose)
+        return self
+
+    def merge(self, other, verbose=1):
+        """ Merge in the target statistics of another fitted
+        TargetAssociatedFeatureValueAggregator (e.g. fit on another worker)
+        and recompute one_hot_dict"""
+        self.target_stats.merge(other.target_stats)
+        self._update_one_hot_dict(verbose=verbose)
+        return self
+
+    def _update_one_hot_dict(self, verbose=1):
+        self.one_hot_dict = self.target_stats.association_dict(
                                 min_mean_target_threshold=self.min_mean_target_threshold,
                                 min_sample_size=self.min_sample_size,
                                 min_sample_frequency=self.min_sample_frequency,
@@ -315,13 +353,12 @@ class TargetAssociatedFeatureValueAggregator(TransformerMixin):
         if verbose:
             if not self.one_hot_dict:
                 print('WARNING:one_hot_dict attribute empty is empty')
-        return self
 
     def transform(self, X, y=None):
         if not hasattr(self, 'one_hot_dict'):
             return f'{self} has not been fitted yet. Please fit before transforming'
         if self.aggregation_method == 'one_hot':
-            return get_specific_dummies(col_map = self.one_hot_dict,
+            return get_specific_dummies(X, col_map = self.one_hot_dict,
                                         prefix=self.prefix, suffix=self.suffix)
         else:
             assert self.aggregation_method == 'aggregate'
@@ -329,6 +366,299 @@ class TargetAssociatedFeatureValueAggregator(TransformerMixin):
                                              prefix=self.prefix, suffix=self.suffix)
 
 
+class DFKFoldTargetEncoder(BaseEstimator, TransformerMixin):
+    """ Encode categorical columns with their smoothed average target value without
+        leaking the target. fit_transform encodes every row with the statistics of the
+        other K-1 folds, transform applies the statistics of the full fitted data.
+        All folds' statistics come from one bincount over factorized codes per column.
+
+        Example:
+        encoder = DFKFoldTargetEncoder(columns=['state', 'product'], smoothing=20)
+        X_train = encoder.fit_transform(X_train, 'target')
+        X_test = encoder.transform(X_test)
+    """
+
+    def __init__(self, columns=None, n_splits=5, smoothing=10, shuffle=True, random_state=None,
+                 suffix='_target_encoded', remove_original=False, parallel=False, ncores=None):
+        """
+        Parameters
+        ----------
+        columns: list
+            A list of the columns to encode. Default is all object and category columns
+        n_splits: int
+            The number of folds used for the out of fold encodings
+        smoothing: float
+            The weight of the prior (the target mean) in number of samples. Values with few
+            samples are shrunk towards the prior. 0 is the raw target mean
+        shuffle: boolean
+            Flag to randomly assign rows to folds
+        random_state: int
+            Seed for the random fold assignment
+        suffix: str
+            The string suffix added to the column names of the encoded columns
+        remove_original: bool
+            Boolean flag to remove the columns that are encoded. Default is False
+        parallel: boolean
+            Flag to encode the columns in parallel threads
+        ncores : int
+            Number of threads to use when parallel. Defaults to all cores in cpu minus one.
+        """
+        self.columns = columns
+        self.n_splits = n_splits
+        self.smoothing = smoothing
+        self.shuffle = shuffle
+        self.random_state = random_state
+        self.suffix = suffix
+        self.remove_original = remove_original
+        self.parallel = parallel
+        self.ncores = ncores
+
+    def fit(self, X, y):
+        """
+        Parameters
+        ----------
+        X: Pandas DataFrame
+            The data to fit the encodings on
+        y: str/Pandas Series of Target
+            The column name of the target in dataframe X or the target values
+        """
+        target_name = y if isinstance(y, str) else None
+        if self.columns:
+            self.encoded_cols_ = [col for col in self.columns if col in X.columns]
+        else:
+            self.encoded_cols_ = [col for col in X.select_dtypes(include=['object', 'category']).columns
+                                  if col != target_name]
+        self.oof_encoded_df_, self.encodings_, self.prior_ = df_kfold_target_encoding(
+            X, y, self.encoded_cols_, n_splits=self.n_splits, smoothing=self.smoothing,
+            shuffle=self.shuffle, random_state=self.random_state,
+            parallel=self.parallel, ncores=self.ncores)
+        return self
+
+    def fit_transform(self, X, y):
+        # Encode the training data out of fold to avoid target leakage
+        self.fit(X, y)
+        X_transform = self._add_encoded_cols(X, self.oof_encoded_df_)
+        # No need to keep the training encodings around
+        del self.oof_encoded_df_
+        return X_transform
+
+    def transform(self, X):
+        if not hasattr(self, 'encodings_'):
+            print('Must use .fit() method before transforming')
+            return
+        encoded_df = pd.DataFrame({col: apply_target_encoding(X[col].values, self.encodings_[col], self.prior_)
+                                   for col in self.encoded_cols_},
+                                  index=X.index, columns=self.encoded_cols_)
+        return self._add_encoded_cols(X, encoded_df)
+
+    def _add_encoded_cols(self, X, encoded_df):
+        encoded_df = encoded_df.add_suffix(self.suffix)
+        if self.remove_original:
+            X = X[[col for col in X.columns if col not in self.encoded_cols_]]
+        return pd.concat([X, encoded_df], axis=1)
+
+
+class DFWoETransformer(BaseEstimator, TransformerMixin):
+    """ Replace feature values with their Weight of Evidence against a binary target.
+        Numeric columns with more than n_bins distinct values are split into equal frequency
+        bins at fit time. The fitted WoE tables are kept in woe_tables_ and the
+        Information Value of every column in iv_.
+
+        Example:
+        woe = DFWoETransformer(n_bins=20).fit(X_train, 'target')
+        woe.iv_.sort_values(ascending=False)
+        X_test = woe.transform(X_test)
+    """
+
+    def __init__(self, include=None, exclude=None, n_bins=10, smoothing=0.5,
+                 suffix='_woe', remove_original=False, parallel=False, ncores=None):
+        """
+        Parameters
+        ----------
+        include: list
+            A list of columns to include when computing
+        exclude: list
+            A list of columns to exclude when computing
+        n_bins: int
+            The number of quantile bins for numeric columns
+        smoothing: float
+            Count added to the events and non events of every bin so empty bins
+            get a finite WoE
+        suffix: str
+            The string suffix added to the column names of the WoE columns
+        remove_original: bool
+            Boolean flag to remove the columns that are encoded. Default is False
+        parallel: boolean
+            Flag to compute the columns in parallel threads
+        ncores : int
+            Number of threads to use when parallel. Defaults to all cores in cpu minus one.
+        """
+        self.include = include
+        self.exclude = exclude
+        self.n_bins = n_bins
+        self.smoothing = smoothing
+        self.suffix = suffix
+        self.remove_original = remove_original
+        self.parallel = parallel
+        self.ncores = ncores
+
+    def fit(self, X, y):
+        """
+        Parameters
+        ----------
+        X: Pandas DataFrame
+            The data to fit the WoE tables on
+        y: str/Pandas Series of Target
+            The column name of the binary target in dataframe X or the target values
+        """
+        if isinstance(y, str):
+            target = y
+        else:
+            # Add the target values to the data
+            target = y.name if y.name is not None else '__target__'
+            X = X.assign(**{target: y.values})
+        self.woe_tables_ = df_woe_tables(X, target, include=self.include, exclude=self.exclude,
+                                         n_bins=self.n_bins, smoothing=self.smoothing,
+                                         parallel=self.parallel, ncores=self.ncores)
+        self.iv_ = pd.Series({column: woe_table['iv'].sum()
+                              for column, (woe_table, _) in self.woe_tables_.items()})
+        return self
+
+    def transform(self, X):
+        if not hasattr(self, 'woe_tables_'):
+            print('Must use .fit() method before transforming')
+            return
+        woe_cols = [col for col in self.woe_tables_ if col in X.columns]
+        woe_df = pd.DataFrame({col: apply_woe(X[col].values, *self.woe_tables_[col])
+                               for col in woe_cols},
+                              index=X.index, columns=woe_cols).add_suffix(self.suffix)
+        if self.remove_original:
+            X = X[[col for col in X.columns if col not in woe_cols]]
+        return pd.concat([X, woe_df], axis=1)
+
+
+class DFHashingEncoder(BaseEstimator, TransformerMixin):
+    """ Hashing trick encoder for high cardinality categoricals. Every column=value pair
+        is hashed into one of n_buckets sparse columns, so unlike dummy encoding the
+        output size doesn't depend on the number of levels and nothing is learned at fit.
+        Hashes are stable across processes and sessions.
+
+        Example:
+        hasher = DFHashingEncoder(columns=['user_id', 'merchant_id'], n_buckets=2**18, signed=True)
+        X_hashed = hasher.fit_transform(X)   # scipy.sparse.csr_matrix
+    """
+
+    def __init__(self, columns=None, n_buckets=2**20, signed=False, seed=0,
+                 return_sparse_matrix=True, prefix='hash_'):
+        """
+        Parameters
+        ----------
+        columns: list
+            A list of the columns to encode. Default is all object and category columns
+        n_buckets: int
+            The number of hashed columns
+        signed: boolean
+            Flag to give each column=value pair a hashed sign of +1 or -1 so that collisions
+            cancel out in expectation instead of adding up
+        seed: int
+            Seed of the hash
+        return_sparse_matrix: boolean
+            Flag to return a scipy CSR matrix. If False returns a DataFrame with sparse
+            columns named prefix+bucket (only sensible for a small number of buckets)
+        prefix: str
+            The string prefix of the hashed column names when returning a DataFrame
+        """
+        self.columns = columns
+        self.n_buckets = n_buckets
+        self.signed = signed
+        self.seed = seed
+        self.return_sparse_matrix = return_sparse_matrix
+        self.prefix = prefix
+
+    def fit(self, X, y=None):
+        # Nothing to learn but which columns to hash
+        if self.columns:
+            self.encoded_cols_ = [col for col in self.columns if col in X.columns]
+        else:
+            self.encoded_cols_ = X.select_dtypes(include=['object', 'category']).columns.values.tolist()
+        return self
+
+    def transform(self, X):
+        hashed_matrix = hash_encode(X, self.encoded_cols_, n_buckets=self.n_buckets,
+                                    signed=self.signed, seed=self.seed)
+        if self.return_sparse_matrix:
+            return hashed_matrix
+        return pd.DataFrame.sparse.from_spmatrix(hashed_matrix, index=X.index,
+                                                 columns=[self.prefix + str(bucket)
+                                                          for bucket in range(self.n_buckets)])
+
+
+class DFCountEncoder(BaseEstimator, TransformerMixin):
+    """ Encode columns with the count (or frequency) of their values in the fitted data.
+        Counts are kept in a mergeable ValueCountTable so they can be built chunk by chunk
+        with partial_fit, combined with merge and reused across runs instead of recomputing
+        groupby(...).transform('size'). Unseen values are encoded as 0.
+
+        Example:
+        encoder = DFCountEncoder(columns=['user_id'], normalize=True)
+        for chunk in chunks:
+            encoder.partial_fit(chunk)
+        X = encoder.transform(X)
+    """
+
+    def __init__(self, columns=None, normalize=False, suffix=None, remove_original=False):
+        """
+        Parameters
+        ----------
+        columns: list
+            A list of the columns to encode. Default is all object and category columns
+        normalize: boolean
+            Flag to encode with the frequency of each value rather than its count
+        suffix: str
+            The string suffix added to the column names of the encoded columns.
+            Default is '_count' or '_frequency' if normalize
+        remove_original: bool
+            Boolean flag to remove the columns that are encoded. Default is False
+        """
+        self.columns = columns
+        self.normalize = normalize
+        self.suffix = suffix
+        self.remove_original = remove_original
+
+    def fit(self, X, y=None):
+        # Start the counts from scratch
+        if self.columns:
+            encoded_cols = [col for col in self.columns if col in X.columns]
+        else:
+            encoded_cols = X.select_dtypes(include=['object', 'category']).columns.values.tolist()
+        self.value_counts_ = ValueCountTable(encoded_cols)
+        return self.partial_fit(X)
+
+    def partial_fit(self, X, y=None):
+        """ Add the value counts of a new chunk of data"""
+        if not hasattr(self, 'value_counts_'):
+            return self.fit(X)
+        self.value_counts_.partial_fit(X)
+        return self
+
+    def merge(self, other):
+        """ Add the value counts of another fitted DFCountEncoder"""
+        self.value_counts_.merge(other.value_counts_)
+        return self
+
+    def transform(self, X):
+        if not hasattr(self, 'value_counts_'):
+            print('Must use .fit() method before transforming')
+            return
+        suffix = self.suffix
+        if not suffix:
+            suffix = '_frequency' if self.normalize else '_count'
+        encoded_df = self.value_counts_.lookup(X, normalize=self.normalize).add_suffix(suffix)
+        if self.remove_original:
+            X = X[[col for col in X.columns if col not in self.value_counts_.columns]]
+        return pd.concat([X, encoded_df], axis=1)
+
+
 class DFDummyMapTransformer(TransformerMixin):
     """
     From a dictionary mapping of {column:[list of feature values]}, create dummy columns
@@ -449,7 +779,11 @@ class DFInteractionsTransformer(BaseEstimator, TransformerMixin):
         interactions_dict_map: dict
             Nested dictionary of the form {basefeature:[feature1, feature2, feature3]}
         method: str --> 'scale' or 'log-additive'
-            A list of columns to include when computing
+            A list of columns to include when computing.
+            For 'log-additive' the constant needed to shift each column into the
+            positive domain is learned at fit time (attribute log_offsets_) and the same
+            shift is applied to every batch passed to transform. Values below the fitted
+            minimum have no defined log and come out as NaN.
         fillna_val: float
             Optional fill value for NaN results in interaction terms
         verbose: int
@@ -490,6 +824,12 @@ class DFInteractionsTransformer(BaseEstimator, TransformerMixin):
             raise ValueError(f"""Base Features and Interaction Terms must be numeric.
             The following columns are non-numeric: {self.non_numeric_cols}""")
 
+        if self.method == 'log-additive':
+            # Learn the constant that moves each column into the positive domain
+            # so training and scoring batches are shifted the same way
+            log_cols = list(dict.fromkeys(self.present_base_feats + self.present_interacting_feats))
+            self.log_offsets_ = positive_domain_offsets(X, log_cols)
+
         return self
 
     def transform(self, X, y=None):
@@ -520,25 +860,23 @@ class DFInteractionsTransformer(BaseEstimator, TransformerMixin):
                     # Add to collection
                     interaction_terms_df.append(interaction_terms_scaled_df)
         if self.method == 'log-additive':
-            X_copy = X.copy()
-            # Check to make sure column is positive
-            # If not, add minimum value as constant and +1 to get to positive domain
-            for col in self.present_interacting_feats+self.present_base_feats:
-                while X_copy[col].min() <= 0:
-                    # If minimum is negative value, reverse sign and add 1 then add to column
-                    if np.sign(X_copy[col].min()) == -1:
-                         X_copy[col] +=  -1*X_copy[col].min() + 1
-                    # Else add by the minimum value +1 to get to all positive values
-                    else:
-                        X_copy[col] +=  X_copy[col].min() + 1
+            # Shift by the offsets learned in fit and take the log of
+            # every column used in one vectorized pass
+            log_cols = self.log_offsets_.index.values.tolist()
+            log_values = X[log_cols].to_numpy(dtype=float) + self.log_offsets_.values
+            with np.errstate(divide='ignore', invalid='ignore'):
+                np.log(log_values, out=log_values)
+            # Values at or below the fitted minimum have no defined log
+            log_values[np.isneginf(log_values)] = np.nan
+            log_col_position = {col: position for position, col in enumerate(log_cols)}
 
             for base_feature, interaction_terms in self.interactions_dict_map.items():
                 if base_feature in self.present_base_feats:
                     tmp_interaction_terms = [feat for feat in interaction_terms if feat in self.present_interacting_feats]
-                    # Pull vector to log add by
-                    base_vector = np.log(X_copy[base_feature].values)
-                    # Take the log of the rest of the data
-                    log_interaction_features = np.log(X_copy[tmp_interaction_terms].values)
+                    # Pull logged vector to add by
+                    base_vector = log_values[:, log_col_position[base_feature]]
+                    # Pull the logged interacting features
+                    log_interaction_features = log_values[:, [log_col_position[feat] for feat in tmp_interaction_terms]]
                     # Add together
                     interaction_terms_log_added = base_vector.reshape(base_vector.shape[0], 1) \
                     + log_interaction_features
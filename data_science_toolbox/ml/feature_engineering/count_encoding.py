@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+
+def column_value_counts(values):
+    """ Count of every non missing value of a column from a single factorize and bincount
+
+    Returns
+    -------
+    counts: Pandas Series
+        int64 counts indexed by value
+    """
+    codes, uniques = pd.factorize(values)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    return pd.Series(counts, index=uniques, dtype=np.int64)
+
+
+def merge_value_counts(counts, other_counts):
+    """ Add together the value counts of the same column from two sets of data"""
+    return counts.add(other_counts, fill_value=0).astype(np.int64)
+
+
+class ValueCountTable(object):
+    """ Mergeable counts of the values of several columns, each kept as a hash indexed
+    Series of value: count. Can be built chunk by chunk with partial_fit, combined across
+    workers with merge, and looked up with a vectorized hash lookup.
+
+    Example
+    -------
+    counts = ValueCountTable(['user_id', 'merchant_id'])
+    for chunk in pd.read_csv(fpath, chunksize=1_000_000):
+        counts.partial_fit(chunk)
+    counts.lookup(df, normalize=True)
+    """
+
+    def __init__(self, columns):
+        """
+        Parameters
+        ----------
+        columns: list
+            A list of the columns to count the values of
+        """
+        self.columns = list(columns)
+        # {column_name: counts Series}
+        self.column_counts = {column: pd.Series(dtype=np.int64) for column in self.columns}
+        # Number of non missing values seen for each column
+        self.totals = {column: 0 for column in self.columns}
+
+    def partial_fit(self, df):
+        """ Add the value counts of a new chunk of data"""
+        for column in self.columns:
+            counts = column_value_counts(df[column].values)
+            self.column_counts[column] = merge_value_counts(self.column_counts[column], counts)
+            self.totals[column] += int(counts.sum())
+        return self
+
+    def merge(self, other):
+        """ Add the value counts accumulated by another ValueCountTable"""
+        for column in other.columns:
+            if column in self.column_counts:
+                self.column_counts[column] = merge_value_counts(self.column_counts[column],
+                                                                other.column_counts[column])
+                self.totals[column] += other.totals[column]
+            else:
+                self.columns.append(column)
+                self.column_counts[column] = other.column_counts[column]
+                self.totals[column] = other.totals[column]
+        return self
+
+    def lookup_column(self, values, column, normalize=False):
+        """ Count (or frequency if normalize) of every value of a column.
+        Unseen and missing values get 0"""
+        counts = self.column_counts[column]
+        positions = counts.index.get_indexer(values)
+        encoded = np.where(positions >= 0, counts.values[np.maximum(positions, 0)], 0)
+        if normalize:
+            return encoded / max(self.totals[column], 1)
+        return encoded
+
+    def lookup(self, df, normalize=False):
+        """ DataFrame of the count (or frequency if normalize) of every value of every column"""
+        return pd.DataFrame({column: self.lookup_column(df[column].values, column, normalize=normalize)
+                             for column in self.columns},
+                            index=df.index, columns=self.columns)
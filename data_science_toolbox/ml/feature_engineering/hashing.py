@@ -0,0 +1,112 @@
+import numbers
+import numpy as np
+import pandas as pd
+from scipy import sparse as sp
+
+# Fixed key so hashes are the same in every process and session
+HASH_KEY = 'datasciencetools'
+
+
+def fmix64(hashes):
+    """ MurmurHash3 64 bit finalizer. Mixes every bit of the input into every bit
+    of the output so the low bits can be used as buckets"""
+    hashes = hashes.copy()
+    hashes ^= hashes >> np.uint64(33)
+    hashes *= np.uint64(0xff51afd7ed558ccd)
+    hashes ^= hashes >> np.uint64(33)
+    hashes *= np.uint64(0xc4ceb53fe1a85ec5)
+    hashes ^= hashes >> np.uint64(33)
+    return hashes
+
+
+def hash_strings(strings, seed=0):
+    """ Stable 64 bit hash of every string: a keyed siphash (pandas hash_array)
+    finished with the murmur3 mixer and seeded"""
+    hashes = pd.util.hash_array(np.asarray(strings, dtype=object), hash_key=HASH_KEY, categorize=False)
+    seed_mix = fmix64(np.array([seed], dtype=np.uint64))[0]
+    return fmix64(hashes ^ seed_mix)
+
+
+def canonical_key_value(value):
+    """ String of a value that doesn't depend on the dtype of the batch it came from, so
+    5, 5.0 (e.g. an int column with missing values) and np.int32(5) hash the same"""
+    if isinstance(value, (bool, np.bool_)):
+        return str(bool(value))
+    if isinstance(value, numbers.Integral):
+        return str(int(value))
+    if isinstance(value, numbers.Real):
+        value = float(value)
+        return str(int(value)) if value.is_integer() else repr(value)
+    return str(value)
+
+
+def column_hash_buckets(values, column, n_buckets=2**20, signed=False, seed=0):
+    """ Bucket (and sign) of every value of a column from hashing the string column=value,
+    with the value in a canonical form (see canonical_key_value) so equal values get the
+    same bucket in every batch. Only the distinct values are hashed and rows look up their
+    value's bucket by code.
+
+    Returns
+    -------
+    rows: numpy array
+        The rows with a non missing value
+    buckets: numpy array
+        The bucket of each of those rows
+    signs: numpy array
+        +1/-1 for each of those rows if signed, else 1
+    """
+    codes, uniques = pd.factorize(values)
+    keys = [f'{column}={canonical_key_value(value)}' for value in uniques]
+    hashes = hash_strings(keys, seed=seed)
+    unique_buckets = (hashes % np.uint64(n_buckets)).astype(np.int64)
+    if signed:
+        # Sign from the top bit, independent of the (low bit) bucket
+        unique_signs = np.where(hashes >> np.uint64(63), -1, 1).astype(np.float32)
+    else:
+        unique_signs = np.ones(len(uniques), dtype=np.float32)
+    # Missing values aren't encoded
+    rows = np.flatnonzero(codes >= 0)
+    return rows, unique_buckets[codes[rows]], unique_signs[codes[rows]]
+
+
+def hash_encode(df, columns=None, n_buckets=2**20, signed=False, seed=0):
+    """ Hashing trick encoding of categorical columns. Every column=value pair is hashed
+    into one of n_buckets columns of a sparse matrix, so the encoding never grows with the
+    number of levels and needs no fitted vocabulary. Hashes are stable across processes.
+
+    Parameters
+    ----------
+    df : Pandas DataFrame
+        The dataframe where data resides
+    columns : list
+        A list of the columns to encode. Default is all columns
+    n_buckets : int
+        The number of columns of the encoded matrix
+    signed : boolean
+        Flag to give each column=value pair a hashed sign of +1 or -1 so that collisions
+        cancel out in expectation instead of adding up
+    seed : int
+        Seed of the hash. Different seeds give independent encodings
+
+    Returns
+    -------
+    hashed_matrix: scipy.sparse.csr_matrix
+        float32 matrix of shape (number of rows, n_buckets)
+    """
+    if columns is None:
+        columns = df.columns.values.tolist()
+    all_rows, all_buckets, all_signs = [], [], []
+    for column in columns:
+        rows, buckets, signs = column_hash_buckets(df[column].values, column, n_buckets=n_buckets,
+                                                   signed=signed, seed=seed)
+        all_rows.append(rows)
+        all_buckets.append(buckets)
+        all_signs.append(signs)
+    if not columns:
+        return sp.csr_matrix((df.shape[0], n_buckets), dtype=np.float32)
+    # Colliding pairs in the same row are summed
+    hashed_matrix = sp.csr_matrix((np.concatenate(all_signs),
+                                   (np.concatenate(all_rows), np.concatenate(all_buckets))),
+                                  shape=(df.shape[0], n_buckets), dtype=np.float32)
+    hashed_matrix.sum_duplicates()
+    return hashed_matrix
@@ -0,0 +1,160 @@
+import numpy as np
+import pandas as pd
+from ..feature_list.feature_list import interaction_features_to_dict
+from ...pandas.engineering.logarithm import positive_domain_offsets
+
+
+def _top_k_upper_triangle(scores, row_offset, top_k):
+    """ Return the (row, column, score) of the top_k absolute scores in a block of
+    pairwise scores, only looking at pairs above the diagonal (column > row)"""
+    block_rows, n_cols = scores.shape
+    abs_scores = np.abs(scores)
+    # Mask the diagonal, lower triangle and undefined scores
+    rows = np.arange(row_offset, row_offset + block_rows).reshape(block_rows, 1)
+    abs_scores[np.arange(n_cols) <= rows] = -np.inf
+    abs_scores[np.isnan(abs_scores)] = -np.inf
+    flat_scores = abs_scores.ravel()
+    k = min(top_k, flat_scores.shape[0])
+    top_positions = np.argpartition(-flat_scores, k - 1)[:k]
+    top_positions = top_positions[np.isfinite(flat_scores[top_positions])]
+    top_rows, top_cols = np.divmod(top_positions, n_cols)
+    return top_rows + row_offset, top_cols, scores[top_rows, top_cols]
+
+
+def screen_pairwise_interactions(df, target, columns=None, method='scale', top_k=20,
+                                 block_size=256, min_abs_correlation=0, return_scores=False):
+    """ Screen every pairwise interaction of the numeric columns in a dataframe against
+    the target and return the strongest pairs as an interactions_dict_map for
+    DFInteractionsTransformer.
+
+    Interactions are scored by the absolute pearson correlation with the target of the
+    interaction term DFInteractionsTransformer creates: the raw product of the two columns
+    for 'scale' and the sum of their logs for 'log-additive'. Scores are computed with
+    blocked matrix products over the columns, so only block_size x n_columns scores are
+    held in memory at once and no interaction term is ever materialized. Missing values
+    are scored as the column mean.
+
+    Parameters
+    ----------
+    df : Pandas DataFrame
+        The dataframe where data resides
+    target : str
+        Column name of the target to screen the interactions against
+    columns: list
+        A list of the numeric columns to screen. Default is all numeric columns
+        except the target
+    method: str --> 'scale' or 'log-additive'
+        'scale' scores the product of the two columns, 'log-additive' scores the sum
+        of the logs of the two columns (shifted into the positive domain the same way
+        DFInteractionsTransformer does)
+    top_k: int
+        The number of interaction pairs to return
+    block_size: int
+        The number of base columns scored against all other columns at once.
+        Lower this to reduce peak memory with very wide data
+    min_abs_correlation: float
+        The minimum absolute correlation for an interaction pair to be returned
+    return_scores: boolean
+        Flag to also return a dataframe of the scored interaction pairs
+
+    Returns
+    -------
+    interactions_dict_map: dict
+        Nested dictionary of the form {basefeature:[feature1, feature2, feature3]}
+    interaction_scores_df: Pandas DataFrame
+        If return_scores, a dataframe with columns Base_Feature, Interaction_Term,
+        Method and Correlation sorted by absolute correlation
+
+    Example
+    -------
+    interactions_dict_map = screen_pairwise_interactions(df, 'target', top_k=50)
+    DFInteractionsTransformer(interactions_dict_map).fit_transform(df)
+    """
+    assert method in ['scale', 'log-additive'], print(f'argument "method" must be either "scale" or "log-additive" and not "{method}"')
+    if columns is None:
+        columns = [col for col in df.select_dtypes(include=np.number).columns.values.tolist()
+                   if col != target]
+
+    # Center the target
+    y = df[target].to_numpy(dtype=float)
+    y = np.where(np.isnan(y), np.nanmean(y), y)
+    y_centered = y - y.mean()
+    y_std = y_centered.std()
+    n_rows = y.shape[0]
+
+    if method == 'scale':
+        X = df[columns].to_numpy(dtype=float)
+    else:
+        # Log of the columns shifted into the positive domain
+        X = df[columns].to_numpy(dtype=float) + positive_domain_offsets(df, columns).values
+        with np.errstate(divide='ignore', invalid='ignore'):
+            np.log(X, out=X)
+        X[~np.isfinite(X)] = np.nan
+
+    # Fill missing values with the column mean
+    column_means = np.nanmean(X, axis=0)
+    missing_rows, missing_cols = np.nonzero(np.isnan(X))
+    X[missing_rows, missing_cols] = column_means[missing_cols]
+    column_stds = X.std(axis=0)
+    # Constant columns only rescale the column they interact with
+    keep = column_stds > 0
+    X = X[:, keep]
+    column_means = column_means[keep]
+    column_stds = column_stds[keep]
+    columns = np.asarray(columns, dtype=object)[keep]
+
+    if method == 'scale':
+        # The product is of the raw (uncentered) columns. Dividing by the standard
+        # deviations only rescales each product, which leaves its correlation unchanged
+        X /= column_stds
+        X_squared = X ** 2
+        X_y = X * y_centered.reshape(n_rows, 1)
+    else:
+        # Center the logged columns for their covariances with the target and each other
+        X -= column_means
+        target_covariances = X.T.dot(y_centered) / n_rows
+        column_variances = column_stds ** 2
+
+    top_rows = np.array([], dtype=int)
+    top_cols = np.array([], dtype=int)
+    top_scores = np.array([], dtype=float)
+    n_cols = X.shape[1]
+    for block_start in range(0, n_cols, block_size):
+        block = slice(block_start, min(block_start + block_size, n_cols))
+        # Pairwise means of the products of the block columns with every column
+        # (covariances for 'log-additive', whose columns are centered)
+        pair_means = X[:, block].T.dot(X) / n_rows
+        if method == 'scale':
+            # cov(x_i * x_j, y) = E[x_i x_j y] as y is centered
+            interaction_target_cov = X_y[:, block].T.dot(X) / n_rows
+            # var(x_i * x_j) = E[x_i^2 x_j^2] - E[x_i x_j]^2
+            interaction_var = X_squared[:, block].T.dot(X_squared) / n_rows - pair_means ** 2
+        else:
+            # cov(l_i + l_j, y) = cov(l_i, y) + cov(l_j, y)
+            interaction_target_cov = target_covariances[block].reshape(-1, 1) + target_covariances
+            # var(l_i + l_j) = var(l_i) + var(l_j) + 2cov(l_i, l_j)
+            interaction_var = column_variances[block].reshape(-1, 1) + column_variances + 2 * pair_means
+        with np.errstate(divide='ignore', invalid='ignore'):
+            block_scores = interaction_target_cov / np.sqrt(interaction_var) / y_std
+
+        # Keep a running top_k of the pairs scored so far
+        block_rows, block_cols, block_top_scores = _top_k_upper_triangle(block_scores, block_start, top_k)
+        top_rows = np.concatenate([top_rows, block_rows])
+        top_cols = np.concatenate([top_cols, block_cols])
+        top_scores = np.concatenate([top_scores, block_top_scores])
+        keep_top = np.argsort(-np.abs(top_scores), kind='mergesort')[:top_k]
+        top_rows, top_cols, top_scores = top_rows[keep_top], top_cols[keep_top], top_scores[keep_top]
+
+    interaction_scores_df = pd.DataFrame({
+        'Base_Feature': columns[top_rows],
+        'Interaction_Term': columns[top_cols],
+        'Method': method,
+        'Correlation': top_scores
+    })
+    interaction_scores_df = interaction_scores_df[interaction_scores_df['Correlation'].abs() >= min_abs_correlation]
+    interactions_dict_map = interaction_features_to_dict(interaction_scores_df)
+
+    if return_scores:
+        return interactions_dict_map, interaction_scores_df.reset_index(drop=True)
+    else:
+        return interactions_dict_map
@@ -1,7 +1,10 @@
 import pandas as pd
 import numpy as np
+from scipy import sparse as sp
 import re as witchcraft
 import warnings
+from .phrase_matching import PhraseMatcher
+from ...pandas.optimization.packed_bools import PackedBoolBlock
 
 
 def feature_value_match_dict_from_column_names(column_names, 
@@ -67,24 +70,65 @@ def feature_value_match_dict_from_column_names(column_names,
     return match_value_map     
 
 
-def get_specific_dummies(df, col_map=None, prefix=None, suffix=None, return_df=True):
+def specific_dummies_matrix(df, col_map=None):
+    """ Given a mapping of column_name: list of values, return a sparse CSR matrix with a
+    one hot column for every listed value (in order) and the names of those columns.
+
+    Each mapped column is factorized against its list of values with a single hash lookup
+    and all indicators are scattered into the matrix at once.
+
+    Returns
+    -------
+    one_hot_matrix: scipy.sparse.csr_matrix
+        uint8 matrix of shape (number of rows, number of mapped values)
+    column_names: list
+        The name of each column of the matrix, column+'_==_'+value
+    """
+    row_indexes = []
+    col_indexes = []
+    column_names = []
+    for column, values in col_map.items():
+        # One column per listed value, in order. Values that compare equal
+        # (e.g. 1, 1.0 and True) share a lookup key but each keep their own column
+        values = list(values)
+        keys = pd.Index(list(dict.fromkeys(values)), dtype=object)
+        value_keys = keys.get_indexer(values)
+        # Key of every row's value (-1 if not listed)
+        row_keys = keys.get_indexer(df[column].values)
+        # Missing values never match (NaN != NaN)
+        row_keys[pd.isnull(df[column].values)] = -1
+        matched_rows = np.flatnonzero(row_keys >= 0)
+        # Matched rows grouped by key
+        matched_rows = matched_rows[np.argsort(row_keys[matched_rows], kind='stable')]
+        key_rows = np.split(matched_rows, np.cumsum(np.bincount(row_keys[matched_rows], minlength=len(keys)))[:-1])
+        for position, key in enumerate(value_keys):
+            row_indexes.append(key_rows[key])
+            col_indexes.append(np.full(key_rows[key].shape[0], len(column_names) + position))
+        # Set descriptive name
+        column_names.extend([column+'_==_'+str(val) for val in values])
+    row_indexes = np.concatenate(row_indexes) if row_indexes else np.array([], dtype=int)
+    col_indexes = np.concatenate(col_indexes) if col_indexes else np.array([], dtype=int)
+    one_hot_matrix = sp.csr_matrix((np.ones(row_indexes.shape[0], dtype=np.uint8), (row_indexes, col_indexes)),
+                                   shape=(df.shape[0], len(column_names)))
+    return one_hot_matrix, column_names
+
+
+def get_specific_dummies(df, col_map=None, prefix=None, suffix=None, return_df=True, sparse=False):
     """ Given a mapping of column_name: list of values, one hot the values
     in the column and concat to dataframe. Optional arguments to add prefixes 
     and/or suffixes to created column names.
     
     Example col_map: {'foo':['bar', 'zero']} would create one hot columns 
-    for the values bar and zero that appear in the column foo"""
-    one_hot_cols = []
-    for column, value in col_map.items():
-        for val in value:
-            # Create one hot encoded arrays for each value specified in key column
-            one_hot_column = pd.Series(np.where(df[column] == val, 1, 0))
-            # Set descriptive name
-            one_hot_column.name = column+'_==_'+str(val)
-            # add to list of one hot columns
-            one_hot_cols.append(one_hot_column)
-    # Concatenate all created arrays together        
-    one_hot_cols = pd.concat(one_hot_cols, axis=1)
+    for the values bar and zero that appear in the column foo
+
+    Each mapped column is factorized once and all one hot columns are created in one
+    uint8 block (see specific_dummies_matrix). Pass sparse=True to keep the block as
+    sparse columns and return_df=False to skip concatenating it back onto df."""
+    one_hot_matrix, column_names = specific_dummies_matrix(df, col_map=col_map)
+    if sparse:
+        one_hot_cols = pd.DataFrame.sparse.from_spmatrix(one_hot_matrix, index=df.index, columns=column_names)
+    else:
+        one_hot_cols = pd.DataFrame(one_hot_matrix.toarray(), index=df.index, columns=column_names)
     if prefix:
         one_hot_cols = one_hot_cols.add_prefix(prefix)
     if suffix:
@@ -97,36 +141,20 @@ def get_specific_dummies(df, col_map=None, prefix=None, suffix=None, return_df=T
 def text_match_one_hot(df, column=None, text_phrases=None, new_col_name=None, return_df=False, case=False,
                       supress_warnings: bool=False):
     """Given a dataframe, text column to search and a list of text phrases, return a binary
-       column with 1s when text is present and 0 otherwise
+       column with 1s when text is present and 0 otherwise.
+       Each text is scanned once for all phrases (see PhraseMatcher) and the frame
+       is only copied when return_df is specified
     """
-    # Ignore regex group match warning
-    warnings.filterwarnings("ignore", 'This pattern has match groups')
-    
     # Check params
     assert text_phrases, print(f"Must specify 'text_phrases' as a list of strings")
     if (column not in df.columns.values.tolist()):
-        if not suppress_warnings:
+        if not supress_warnings:
             warnings.warn(f'Column "{column}" not found in dataframe. No matches attempted')
-            return
-
-    # Create regex pattern to match any phrase in list
-    # The first phrase will be placed in its own groups
-    regex_pattern = '({})'.format(text_phrases[0])
+        return
 
-    # If there's more than one phrase
-    # Each phrase is placed in its own group () with an OR operand in front of it |
-    # and added to the original phrase
-    
-    if len(text_phrases) > 1:
-        subsquent_phrases = "".join(['|({})'.format(phrase) for phrase in text_phrases[1:]])
-        regex_pattern += subsquent_phrases
-        
-    # Cast to string to ensure .str methods work
-    df_copy = df.copy()
-    df_copy[column] = df_copy[column].astype(str)
-    
-    
-    matches = df_copy[column].str.contains(regex_pattern, na=False, case=case).astype(int)
+    # Match any phrase in list
+    matches = pd.Series(PhraseMatcher([text_phrases], case=case).match(df[column])[:, 0],
+                        index=df.index)
     ## Alter name
     if not new_col_name:
         # If none provided use column name and values matched
@@ -147,7 +175,15 @@ def text_match_one_hot_from_map(df, col_map=None, case=False, prefix=None, suffi
     
     Example col_map: {'foo':['bar', 'zero']} would search the text in the values of
     'foo' for any matches of 'bar' OR 'zero' the result is a one hot encoded
-    column of matches"""
+    column of matches
+
+    Several lists of phrases can be matched against the same column by mapping the
+    column to a dictionary of name: list of values, e.g. {'foo':{'animals':['cat', 'dog'],
+    'colors':['red', 'blue']}} creates one column per name.
+
+    All literal phrases for a column are compiled into one automaton so each text is
+    scanned once for every map entry of its column (phrases with regex special characters
+    are matched as regexes). The frame is not copied."""
     # For naming columns
     def legalize_string(string, illegal_char_replacement):
         "Turn a string into a valid callable variable name"
@@ -158,25 +194,28 @@ def text_match_one_hot_from_map(df, col_map=None, case=False, prefix=None, suffi
         string = witchcraft.sub('^[^a-zA-Z_]+', illegal_char_replacement, string)
         return string
     
+    existing_columns = set(df.columns.values.tolist())
     one_hot_cols = [] 
     for column, value in col_map.items():
-        # Set descriptive name
-        new_col_name = column+'_match_for_____'+str(value)[1:-1].replace(r"'", "").replace(r", ", "_")
-        new_col_name = legalize_string(new_col_name, '__')
-        
-        # Create one hot encoded arrays for each value specified in key column
-        one_hot_column = pd.Series(one_hot_column_text_match(df, column, value, case=case, suppress_warnings=suppress_warnings))
-        
-        # Check if column already exists in df
-        if new_col_name in df.columns.values.tolist():
-            new_col_name = column+'_supplementary_match_for_____'+str(value)[1:-1].replace(r"'", "").replace(r", ", "_")
-            new_col_name = legalize_string(new_col_name, '__')
-            one_hot_column.name = new_col_name        
+        # Map entries to match against this column
+        if isinstance(value, dict):
+            entry_names = [str(name) for name in value.keys()]
+            phrase_groups = list(value.values())
         else:
-            one_hot_column.name = new_col_name
-            
-        # add to list of one hot columns
-        one_hot_cols.append(one_hot_column)
+            entry_names = [str(value)[1:-1].replace(r"'", "").replace(r", ", "_")]
+            phrase_groups = [value]
+
+        # Scan each text once for every entry
+        matches = PhraseMatcher(phrase_groups, case=case).match(df[column])
+
+        for entry_position, entry_name in enumerate(entry_names):
+            # Set descriptive name
+            new_col_name = legalize_string(column+'_match_for_____'+entry_name, '__')
+            # Check if column already exists in df
+            if new_col_name in existing_columns:
+                new_col_name = legalize_string(column+'_supplementary_match_for_____'+entry_name, '__')
+            # add to list of one hot columns
+            one_hot_cols.append(pd.Series(matches[:, entry_position], index=df.index, name=new_col_name))
     
     
     # Concatenate all created arrays together
@@ -196,8 +235,9 @@ def df_group_one_hot(df, cols_to_group, how ='any', new_col_name=None, return_df
     
     Parameters
     ----------
-    df : Pandas DataFrame
-        A dataframe from which to pull the one hot columns
+    df : Pandas DataFrame/PackedBoolBlock
+        A dataframe from which to pull the one hot columns. If a PackedBoolBlock
+        the grouping runs directly on its packed bits
     cols_to_group : list[str]
         A list of column names for which to group.
     how: str
@@ -215,6 +255,7 @@ def df_group_one_hot(df, cols_to_group, how ='any', new_col_name=None, return_df
         A series of the computed intersection of the one hot columns 
     df_copy: Pandas DataFrame
         A copied dataframe with the computed column in it
+        (a new PackedBoolBlock if df is a PackedBoolBlock)
         
     
     Examples
@@ -234,22 +275,28 @@ def df_group_one_hot(df, cols_to_group, how ='any', new_col_name=None, return_df
     """
     assert how in ['any', 'all'], print(f'argument "how" must be either "any" or "all" and not "{how}"')
     
+    # Create column name if necessary
+    if not new_col_name:
+        new_col_name = ('_AND_' if how == 'all' else '_OR_').join(cols_to_group)
+
+    if isinstance(df, PackedBoolBlock):
+        # Bitwise AND/OR of the packed columns
+        grouped = df.all(cols_to_group) if how == 'all' else df.any(cols_to_group)
+        grouped_one_hot_col = pd.Series(grouped.astype(int), index=df.index, name=new_col_name)
+        if return_df:
+            return df.with_column(new_col_name, grouped)
+        return grouped_one_hot_col
+
     # Group one hot columns
     # Create boolean mask where columns are 1
     mask = df[cols_to_group] == 1
     if how == 'all':
-        # Create column name if necessary
-        if not new_col_name:
-            new_col_name = '_AND_'.join(cols_to_group)
         grouped_one_hot_col = pd.Series(mask 
                                         .all(axis=1) # Return True where entire row is all True
                                         .astype(int),  # Cast to int
                                         name = new_col_name 
                                        )
     elif how =='any':
-        # Create column name if necessary
-        if not new_col_name:
-            new_col_name = '_OR_'.join(cols_to_group)        
         grouped_one_hot_col = pd.Series(mask # Create boolean mask where columns are 1
                                         .any(axis=1) # Return True where any element of row is True
                                         .astype(int),  # Cast to int
@@ -261,4 +308,4 @@ def df_group_one_hot(df, cols_to_group, how ='any', new_col_name=None, return_df
         df_copy[new_col_name] = grouped_one_hot_col
         return df_copy
     else:
-        return grouped_one_hot_col     
\ No newline at end of file
+        return grouped_one_hot_col     
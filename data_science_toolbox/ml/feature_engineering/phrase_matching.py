@@ -0,0 +1,129 @@
+import re
+import numpy as np
+import pandas as pd
+
+# pyahocorasick is optional. Without it literal phrases are matched
+# with a single alternation regex instead of an Aho-Corasick automaton
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+REGEX_SPECIAL_CHARACTERS = set('.^$*+?{}[]\\|()')
+
+
+def is_literal_phrase(phrase):
+    """ Check if a phrase has no regex special characters and can be matched literally"""
+    return not any(char in REGEX_SPECIAL_CHARACTERS for char in phrase)
+
+
+class PhraseMatcher(object):
+    """ Match many groups of phrases against texts with a single scan of each text.
+
+    Literal phrases of all groups are compiled into one Aho-Corasick automaton (or, if
+    pyahocorasick isn't installed, one alternation regex). Phrases with regex special
+    characters are kept as regexes and only tried for groups that the literal scan
+    didn't already match.
+
+    Example
+    -------
+    matcher = PhraseMatcher([['back pain', 'lumbar'], ['fracture', 'broken (arm|leg)']])
+    matcher.match(df['notes'])
+
+    >>> array([[1, 0],
+               [0, 1],
+               [1, 1]], dtype=uint8)
+    """
+
+    def __init__(self, phrase_groups, case=False):
+        """
+        Parameters
+        ----------
+        phrase_groups: list[list[str]]
+            A list of groups of phrases. A text matches a group when any of
+            its phrases is found in the text
+        case: Boolean
+            Flag for phrases to be case sensitive or not. Default is False
+        """
+        self.phrase_groups = [list(phrases) for phrases in phrase_groups]
+        self.case = case
+        self.n_groups = len(self.phrase_groups)
+
+        # {literal phrase: set of group ids}
+        literal_groups = {}
+        # {group id: [regex phrases]}
+        regex_phrases = {}
+        for group_id, phrases in enumerate(self.phrase_groups):
+            for phrase in phrases:
+                phrase = str(phrase)
+                if is_literal_phrase(phrase):
+                    literal_groups.setdefault(self._normalize(phrase), set()).add(group_id)
+                else:
+                    regex_phrases.setdefault(group_id, []).append(phrase)
+        flags = 0 if case else re.IGNORECASE
+        self._group_regexes = {group_id: re.compile('|'.join(f'({phrase})' for phrase in phrases), flags)
+                               for group_id, phrases in regex_phrases.items()}
+        self._compile_literals(literal_groups)
+
+    def _normalize(self, text):
+        return text if self.case else text.casefold()
+
+    def _compile_literals(self, literal_groups):
+        self._literal_groups = {phrase: tuple(sorted(groups)) for phrase, groups in literal_groups.items()
+                                if phrase}
+        self._automaton = None
+        self._literal_regex = None
+        if not self._literal_groups:
+            return
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for phrase, groups in self._literal_groups.items():
+                self._automaton.add_word(phrase, groups)
+            self._automaton.make_automaton()
+        else:
+            # The regex only reports the longest phrase starting at each position,
+            # so a phrase also flags the groups of every phrase that is a prefix of it
+            phrases = sorted(self._literal_groups, key=len, reverse=True)
+            for phrase in phrases:
+                prefix_groups = set(self._literal_groups[phrase])
+                for other_phrase in phrases:
+                    if (len(other_phrase) < len(phrase)) and phrase.startswith(other_phrase):
+                        prefix_groups.update(self._literal_groups[other_phrase])
+                self._literal_groups[phrase] = tuple(sorted(prefix_groups))
+            # Zero width lookahead finds a match starting at every position
+            self._literal_regex = re.compile('(?=({}))'.format('|'.join(re.escape(phrase) for phrase in phrases)))
+
+    def _literal_matches(self, text):
+        """ Set of the group ids whose literal phrases are found in an (already normalized) text"""
+        matched_groups = set()
+        if self._automaton is not None:
+            for _, groups in self._automaton.iter(text):
+                matched_groups.update(groups)
+        elif self._literal_regex is not None:
+            for match in self._literal_regex.finditer(text):
+                matched_groups.update(self._literal_groups[match.group(1)])
+        return matched_groups
+
+    def match(self, texts):
+        """ Indicator array of shape (number of texts, number of groups) with 1 where
+        a text matches a group. Missing values never match
+
+        Parameters
+        ----------
+        texts: Pandas Series/list
+            The texts to search. Non string values are cast to string
+        """
+        texts = texts.values if isinstance(texts, pd.Series) else texts
+        indicators = np.zeros((len(texts), self.n_groups), dtype=np.uint8)
+        for row, text in enumerate(texts):
+            if not isinstance(text, str):
+                if pd.isnull(text):
+                    continue
+                text = str(text)
+            matched_groups = self._literal_matches(self._normalize(text))
+            for group_id, regex in self._group_regexes.items():
+                if (group_id not in matched_groups) and regex.search(text):
+                    matched_groups.add(group_id)
+            if matched_groups:
+                indicators[row, list(matched_groups)] = 1
+        return indicators
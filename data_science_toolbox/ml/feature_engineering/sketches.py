@@ -0,0 +1,153 @@
+import warnings
+import numpy as np
+import pandas as pd
+from .target_association import (column_target_stats,
+                                 merge_target_stats,
+                                 target_stats_to_association_frame)
+
+
+class CountMinSketch(object):
+    """ Count-min sketch of value counts in a fixed width x depth table of counters.
+    Estimated counts are never below the true count and overestimate it by at most
+    ~e*N/width (N is the total count) with probability 1 - e^-depth, whatever the
+    number of distinct values.
+
+    Values are hashed with pandas' stable (seeded siphash) hash_array, so sketches built
+    in different processes can be merged.
+    """
+
+    def __init__(self, width=2**18, depth=4):
+        """
+        Parameters
+        ----------
+        width: int
+            The number of counters per row. Larger is more accurate
+        depth: int
+            The number of rows (independent hashes). Larger is more confident
+        """
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.total_count = 0
+
+    def _bucket_indexes(self, values):
+        """ (depth, n) array of the counter of each value in each row, from one 64 bit
+        hash split into two 32 bit hashes (double hashing)"""
+        hashes = pd.util.hash_array(np.asarray(values))
+        hash_low = hashes & np.uint64(0xFFFFFFFF)
+        hash_high = (hashes >> np.uint64(32)) | np.uint64(1)
+        rows = np.arange(self.depth, dtype=np.uint64).reshape(self.depth, 1)
+        return ((hash_low + rows * hash_high) % np.uint64(self.width)).astype(np.int64)
+
+    def update(self, values):
+        """ Add one count for every value in values"""
+        for row, indexes in enumerate(self._bucket_indexes(values)):
+            self.table[row] += np.bincount(indexes, minlength=self.width)
+        self.total_count += len(values)
+        return self
+
+    def query(self, values):
+        """ Estimated count of every value in values"""
+        indexes = self._bucket_indexes(values)
+        return self.table[np.arange(self.depth).reshape(self.depth, 1), indexes].min(axis=0)
+
+    def merge(self, other):
+        """ Add the counts of another sketch with the same width and depth"""
+        if (other.width != self.width) or (other.depth != self.depth):
+            raise ValueError('Can only merge count-min sketches with the same width and depth')
+        self.table += other.table
+        self.total_count += other.total_count
+        return self
+
+
+def heavy_hitter_target_average(df, feature, target,
+                                sample_frequency=True,
+                                freq_weighted_average=True,
+                                min_mean_target_threshold=0,
+                                min_sample_size=0,
+                                min_sample_frequency=0,
+                                min_weighted_target_threshold=0,
+                                sketch_width=2**18,
+                                sketch_depth=4,
+                                chunksize=1000000):
+    """ Memory bounded version of column_values_target_average for ID-like columns
+    with a huge number of distinct values.
+
+    A first pass counts the feature values in a count-min sketch. A second pass only
+    keeps the target statistics of values whose estimated count can pass both
+    min_sample_size and min_sample_frequency. As the sketch never underestimates,
+    no value that meets the minimums is missed and the statistics of the returned
+    values are exact. At most (number of rows / minimum count) distinct values
+    (plus sketch false positives) are held in memory at any time.
+
+    Parameters
+    ----------
+    df : Pandas DataFrame
+        The dataframe where data resides
+    feature : str
+        Column name for which to groupby and check for average target value
+    target : str
+        Column name of the target to find grouped by average of
+    sample_frequency: Boolean
+        Flag to include sample frequency for a given feature value.
+    freq_weighted_average: Boolean
+        Flag to include the frequency weighted average for a given feature value.
+    min_mean_target_threshold : float
+        The minimum value of the average target class to use as cutoff.
+    min_sample_size: int
+        The minimum value of the number of samples for a feature value
+    min_sample_frequency: float
+        The minimum value of the frequency of samples for a feature value
+    min_weighted_target_threshold : float
+        The minimum value of the frequency weighted average target class to use as cutoff.
+    sketch_width: int
+        The number of counters per row of the count-min sketch
+    sketch_depth: int
+        The number of rows of the count-min sketch
+    chunksize: int
+        The number of rows hashed at once. Bounds the size of temporary arrays
+
+    Returns
+    -------
+    grouped_mean_target_df
+        DataFrame of the feature values and their asssociations
+    """
+    feature_values = df[feature]
+    n_samples = int(feature_values.notnull().sum())
+    # The smallest count a value needs to pass the minimums. Like the exact path,
+    # min_sample_frequency only applies when a frequency column is computed
+    min_count = min_sample_size
+    if sample_frequency or freq_weighted_average:
+        min_count = max(min_count, int(np.ceil(min_sample_frequency * n_samples)))
+    if min_count <= 1:
+        warnings.warn('min_sample_size and min_sample_frequency allow values with a single sample. '
+                      'Every distinct value is kept so memory is not bounded by the sketch')
+
+    # First pass: count the values
+    sketch = CountMinSketch(width=sketch_width, depth=sketch_depth)
+    for chunk_start in range(0, df.shape[0], chunksize):
+        chunk_values = feature_values.iloc[chunk_start:chunk_start + chunksize]
+        sketch.update(chunk_values[chunk_values.notnull()].values)
+
+    # Second pass: exact statistics of the values that may pass the minimums
+    stats_df = None
+    for chunk_start in range(0, df.shape[0], chunksize):
+        chunk = df.iloc[chunk_start:chunk_start + chunksize][[feature, target]]
+        chunk = chunk[chunk[feature].notnull()]
+        candidates = chunk[sketch.query(chunk[feature].values) >= min_count]
+        chunk_stats_df = column_target_stats(candidates, feature, target)
+        if stats_df is None:
+            stats_df = chunk_stats_df
+        else:
+            stats_df = merge_target_stats(stats_df, chunk_stats_df)
+    if stats_df is None:
+        stats_df = column_target_stats(df, feature, target)
+
+    return target_stats_to_association_frame(stats_df, feature=feature,
+                                             total_samples=n_samples,
+                                             sample_frequency=sample_frequency,
+                                             freq_weighted_average=freq_weighted_average,
+                                             min_mean_target_threshold=min_mean_target_threshold,
+                                             min_sample_size=min_sample_size,
+                                             min_sample_frequency=min_sample_frequency,
+                                             min_weighted_target_threshold=min_weighted_target_threshold)
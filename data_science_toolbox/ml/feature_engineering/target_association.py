@@ -0,0 +1,400 @@
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import cpu_count
+import numpy as np
+import pandas as pd
+
+
+def factorize_column(values):
+    """ Factorize a column into integer codes and sorted unique values.
+    Missing values get the code -1 (the same values groupby drops).
+    Falls back to order of appearance when the values can't be sorted (mixed types)
+    """
+    try:
+        return pd.factorize(values, sort=True)
+    except TypeError:
+        return pd.factorize(values, sort=False)
+
+
+def column_target_stats(df, feature, target, target_values=None):
+    """ Compute the sufficient statistics of the target for every value of a feature
+    in a single pass: the feature value sample size, the target sum and the number of
+    non missing target values. Averages, frequencies and frequency weighted averages can
+    all be derived from (and merged through) these.
+
+    Parameters
+    ----------
+    df : Pandas DataFrame
+        The dataframe where data resides
+    feature : str
+        Column name for which to compute the statistics for each value
+    target : str
+        Column name of the target
+    target_values: numpy array
+        Optional float array of the target values. Pass this when computing the
+        statistics for many columns so the target is only cast once
+
+    Returns
+    -------
+    stats_df: Pandas DataFrame
+        DataFrame indexed by feature value with columns sample_size, target_sum and target_count
+    """
+    if target_values is None:
+        target_values = df[target].to_numpy(dtype=float)
+    codes, uniques = factorize_column(df[feature].values)
+    n_values = len(uniques)
+    # Ignore missing feature values like groupby
+    present = codes >= 0
+    codes = codes[present]
+    target_values = target_values[present]
+    target_present = ~np.isnan(target_values)
+
+    sample_size = np.bincount(codes, minlength=n_values)
+    if target_present.all():
+        target_sum = np.bincount(codes, weights=target_values, minlength=n_values)
+        target_count = sample_size.astype(float)
+    else:
+        target_sum = np.bincount(codes[target_present], weights=target_values[target_present],
+                                 minlength=n_values)
+        target_count = np.bincount(codes[target_present], minlength=n_values).astype(float)
+
+    return pd.DataFrame({'sample_size': sample_size,
+                         'target_sum': target_sum,
+                         'target_count': target_count},
+                        index=pd.Index(uniques, name=feature))
+
+
+def target_stats_to_association_frame(stats_df, feature=None,
+                                      total_samples=None,
+                                      sample_frequency=True,
+                                      freq_weighted_average=True,
+                                      min_mean_target_threshold=0,
+                                      min_sample_size=0,
+                                      min_sample_frequency=0,
+                                      min_weighted_target_threshold=0):
+    """ From the sufficient statistics of a feature (see column_target_stats) compute
+    the average target value, sample size, sample frequency and frequency weighted
+    average target value for every feature value and filter by the given minimums.
+    The result has the same layout as column_values_target_average.
+
+    Parameters
+    ----------
+    stats_df : Pandas DataFrame
+        DataFrame indexed by feature value with columns sample_size, target_sum and target_count
+    feature : str
+        Column name to give the feature values. Default is the name of the stats_df index
+    total_samples : int
+        The total number of samples the frequencies are relative to. Default is the
+        sum of the sample sizes in stats_df. Pass it when stats_df only holds some of
+        the feature values
+    sample_frequency: Boolean
+        Flag to include sample frequency for a given feature value.
+        Default is true
+    freq_weighted_average: Boolean
+        Flag to include the frequency weighted average for a given feature value.
+        Default is true
+    min_mean_target_threshold : float
+        The minimum value of the average target class to use as cutoff.
+    min_sample_size: int
+        The minimum value of the number of samples for a feature value
+    min_sample_frequency: float
+        The minimum value of the frequency of samples for a feature value
+    min_weighted_target_threshold : float
+        The minimum value of the frequency weighted average target class to use as cutoff.
+
+    Returns
+    -------
+    grouped_mean_target_df
+        DataFrame of the feature values and their asssociations
+    """
+    if feature is None:
+        feature = stats_df.index.name
+    sample_size = stats_df['sample_size'].values
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg_target = stats_df['target_sum'].values / stats_df['target_count'].values
+        if total_samples is None:
+            total_samples = sample_size.sum()
+        feature_value_frequency = sample_size / total_samples
+    freq_weighted_avg_target = feature_value_frequency * avg_target
+
+    # Filter out minimum metrics all at once
+    keep = (avg_target >= min_mean_target_threshold) & (sample_size >= min_sample_size)
+    if sample_frequency or freq_weighted_average:
+        keep &= feature_value_frequency >= min_sample_frequency
+    if freq_weighted_average:
+        keep &= freq_weighted_avg_target >= min_weighted_target_threshold
+
+    grouped_mean_target_df = pd.DataFrame({feature: stats_df.index.values,
+                                           'sample_size': sample_size,
+                                           'avg_target': avg_target})
+    if sample_frequency:
+        grouped_mean_target_df['feature_value_frequency'] = feature_value_frequency
+    if freq_weighted_average:
+        grouped_mean_target_df['freq_weighted_avg_target'] = freq_weighted_avg_target
+    grouped_mean_target_df = (grouped_mean_target_df[keep]
+                              .sort_values(by='avg_target', ascending=False, kind='mergesort'))
+    return grouped_mean_target_df
+
+
+def is_binary_stats(stats_df):
+    """ Check if the only values in the statistics of a feature are 1 and 0"""
+    return stats_df.index.isin([0, 1]).all()
+
+
+def df_target_stats(df, target, include=None, exclude=None, parallel=False, ncores=None):
+    """ Compute the sufficient target statistics (see column_target_stats) for every
+    column in a dataframe, factorizing each column once.
+
+    Parameters
+    ----------
+    df : Pandas DataFrame
+        The dataframe where data resides
+    target : str
+        Column name of the target
+    include: list
+        A list of columns to include when computing
+    exclude: list
+        A list of columns to exclude when computing
+    parallel: boolean
+        Flag to compute the columns in parallel threads
+    ncores : int
+        Number of threads to use when parallel. Defaults to all cores in cpu minus one.
+
+    Returns
+    -------
+    stats_dict: dict
+        Dictionary of the form {column_name: stats_df}
+    """
+    # Start with all columns and filter out/include desired columns
+    columns_to_check = df.columns.values.tolist()
+    if include:
+        columns_to_check = [col for col in columns_to_check if col in include]
+    if exclude:
+        columns_to_check = [col for col in columns_to_check if col not in exclude]
+    columns_to_check = [col for col in columns_to_check if col != target]
+
+    # Cast the target once for all columns
+    target_values = df[target].to_numpy(dtype=float)
+
+    def compute_column_stats(column):
+        return column_target_stats(df, column, target, target_values=target_values)
+
+    if parallel and len(columns_to_check) > 1:
+        # If no number of cores to work with, default to max
+        if not ncores:
+            ncores = max(cpu_count() - 1, 1)
+        # factorize and bincount release the GIL so threads avoid copying df to processes
+        with ThreadPoolExecutor(max_workers=ncores) as executor:
+            stats_list = list(executor.map(compute_column_stats, columns_to_check))
+    else:
+        stats_list = [compute_column_stats(column) for column in columns_to_check]
+    return dict(zip(columns_to_check, stats_list))
+
+
+def df_target_association_stats(df,
+                                target,
+                                include=None,
+                                exclude=None,
+                                min_mean_target_threshold=0,
+                                min_sample_size=0,
+                                min_sample_frequency=0,
+                                min_weighted_target_threshold=0,
+                                ignore_binary=False,
+                                parallel=False,
+                                ncores=None):
+    """ For a given dataframe and a target column, compute for each column value the
+    average target value, feature value sample size, feature value frequency, and
+    frequency weighted average target value.
+
+    Single pass replacement for df_feature_values_target_average. Each column is
+    factorized once and all statistics come from bincounts over the codes, instead
+    of a groupby, sort, filter and concat per column.
+
+    Parameters
+    ----------
+    df : Pandas DataFrame
+        The dataframe where data resides
+    target : str
+        Column name of the target to find grouped by average of
+    include: list
+        A list of columns to include when computing
+    exclude: list
+        A list of columns to exclude when computing
+    min_mean_target_threshold : float
+        The minimum value of the average target class to use as cutoff.
+    min_sample_size: int
+        The minimum value of the number of samples for a feature value
+    min_sample_frequency: float
+        The minimum value of the frequency of samples for a feature value
+    min_weighted_target_threshold : float
+        The minimum value of the frequency weighted average target class to use as cutoff.
+    ignore_binary: boolean
+        Flag to leave out columns whose only values are 1 and 0
+    parallel: boolean
+        Flag to compute the columns in parallel threads
+    ncores : int
+        Number of threads to use when parallel. Defaults to all cores in cpu minus one.
+
+    Returns
+    -------
+    feature_values_target_average_df
+        DataFrame of the feature values and their asssociations with columns
+        feature_value, sample_size, avg_target, feature_value_frequency,
+        freq_weighted_avg_target and feature
+    """
+    stats_dict = df_target_stats(df, target, include=include, exclude=exclude,
+                                 parallel=parallel, ncores=ncores)
+    return target_stats_association_frame(stats_dict,
+                                          min_mean_target_threshold=min_mean_target_threshold,
+                                          min_sample_size=min_sample_size,
+                                          min_sample_frequency=min_sample_frequency,
+                                          min_weighted_target_threshold=min_weighted_target_threshold,
+                                          ignore_binary=ignore_binary)
+
+
+def target_stats_association_frame(stats_dict,
+                                   min_mean_target_threshold=0,
+                                   min_sample_size=0,
+                                   min_sample_frequency=0,
+                                   min_weighted_target_threshold=0,
+                                   ignore_binary=False):
+    """ From a dictionary of {column_name: stats_df} (see df_target_stats) return the tidy
+    frame of feature value associations for every column (see df_target_association_stats)
+    """
+    dataframe_lists = [target_stats_to_association_frame(stats_df, feature='feature_value',
+                                                         min_mean_target_threshold=min_mean_target_threshold,
+                                                         min_sample_size=min_sample_size,
+                                                         min_sample_frequency=min_sample_frequency,
+                                                         min_weighted_target_threshold=min_weighted_target_threshold)
+                       .assign(feature=column)
+                       for column, stats_df in stats_dict.items()
+                       if not (ignore_binary and is_binary_stats(stats_df))]
+    if not dataframe_lists:
+        return pd.DataFrame(columns=['feature_value', 'sample_size', 'avg_target',
+                                     'feature_value_frequency', 'freq_weighted_avg_target', 'feature'])
+    return pd.concat(dataframe_lists)
+
+
+def target_stats_association_dict(stats_dict,
+                                  min_mean_target_threshold=0,
+                                  min_sample_size=0,
+                                  min_sample_frequency=0,
+                                  min_weighted_target_threshold=0,
+                                  ignore_binary=True):
+    """ From a dictionary of {column_name: stats_df} (see df_target_stats) return a
+    dictionary of the form {column_name:[list of values]} with the values of each column
+    that meet the thresholds. Columns without any such values are left out.
+    """
+    combined_dict = {}
+    for column, stats_df in stats_dict.items():
+        # Check to see if only values are 1 and 0. If so, don't compute rest
+        if ignore_binary and is_binary_stats(stats_df):
+            continue
+        grouped_mean_target = target_stats_to_association_frame(stats_df, feature=column,
+                                                                min_mean_target_threshold=min_mean_target_threshold,
+                                                                min_sample_size=min_sample_size,
+                                                                min_sample_frequency=min_sample_frequency,
+                                                                min_weighted_target_threshold=min_weighted_target_threshold)
+        # Only keep columns with values that fit the minimum thresholds
+        if grouped_mean_target.shape[0] >= 1:
+            combined_dict[column] = grouped_mean_target[column].values.tolist()
+    return combined_dict
+
+
+def merge_target_stats(stats_df, other_stats_df):
+    """ Add together the sufficient statistics of the same feature computed on
+    two different sets of data"""
+    merged_stats_df = stats_df.add(other_stats_df, fill_value=0)
+    merged_stats_df['sample_size'] = merged_stats_df['sample_size'].astype(np.int64)
+    merged_stats_df.index.name = stats_df.index.name
+    return merged_stats_df
+
+
+class TargetAssociationStats(object):
+    """ Mergeable running state of the sufficient target statistics (sample size, target
+    sum and target count of every column value) so target associations can be updated
+    as new labelled data arrives instead of refitting on the full history.
+
+    Example
+    -------
+    stats = TargetAssociationStats('target')
+    for chunk in pd.read_csv(fpath, chunksize=100_000):
+        stats.partial_fit(chunk)
+    stats.merge(stats_from_another_worker)
+    one_hot_dict = stats.association_dict(min_sample_size=50, min_mean_target_threshold=.4)
+    """
+
+    def __init__(self, target, include=None, exclude=None):
+        """
+        Parameters
+        ----------
+        target : str
+            Column name of the target
+        include: list
+            A list of columns to include when computing
+        exclude: list
+            A list of columns to exclude when computing
+        """
+        self.target = target
+        self.include = include
+        self.exclude = exclude
+        # {column_name: stats_df}
+        self.column_stats = {}
+        self.n_samples = 0
+
+    def partial_fit(self, df, parallel=False, ncores=None):
+        """ Update the statistics with a new batch of labelled data
+
+        Parameters
+        ----------
+        df : Pandas DataFrame
+            A batch of data including the target column
+        parallel: boolean
+            Flag to compute the columns in parallel threads
+        ncores : int
+            Number of threads to use when parallel. Defaults to all cores in cpu minus one.
+        """
+        batch_stats = df_target_stats(df, self.target, include=self.include, exclude=self.exclude,
+                                      parallel=parallel, ncores=ncores)
+        self._add_column_stats(batch_stats)
+        self.n_samples += df.shape[0]
+        return self
+
+    def merge(self, other):
+        """ Merge in the statistics accumulated by another TargetAssociationStats
+        (e.g. from another worker or another period of data)"""
+        if other.target != self.target:
+            raise ValueError(f'Can not merge statistics of target "{other.target}" into target "{self.target}"')
+        self._add_column_stats(other.column_stats)
+        self.n_samples += other.n_samples
+        return self
+
+    def _add_column_stats(self, stats_dict):
+        for column, stats_df in stats_dict.items():
+            if column in self.column_stats:
+                self.column_stats[column] = merge_target_stats(self.column_stats[column], stats_df)
+            else:
+                self.column_stats[column] = stats_df
+
+    def association_frame(self, min_mean_target_threshold=0, min_sample_size=0,
+                          min_sample_frequency=0, min_weighted_target_threshold=0,
+                          ignore_binary=False):
+        """ Tidy frame of the accumulated feature value associations
+        (see df_target_association_stats)"""
+        return target_stats_association_frame(self.column_stats,
+                                              min_mean_target_threshold=min_mean_target_threshold,
+                                              min_sample_size=min_sample_size,
+                                              min_sample_frequency=min_sample_frequency,
+                                              min_weighted_target_threshold=min_weighted_target_threshold,
+                                              ignore_binary=ignore_binary)
+
+    def association_dict(self, min_mean_target_threshold=0, min_sample_size=0,
+                         min_sample_frequency=0, min_weighted_target_threshold=0,
+                         ignore_binary=True):
+        """ Dictionary of the form {column_name:[list of values]} of the accumulated
+        feature values that meet the thresholds (see df_feature_vals_target_association_dict)"""
+        return target_stats_association_dict(self.column_stats,
+                                             min_mean_target_threshold=min_mean_target_threshold,
+                                             min_sample_size=min_sample_size,
+                                             min_sample_frequency=min_sample_frequency,
+                                             min_weighted_target_threshold=min_weighted_target_threshold,
+                                             ignore_binary=ignore_binary)
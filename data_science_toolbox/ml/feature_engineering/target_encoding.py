@@ -0,0 +1,176 @@
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import cpu_count
+import numpy as np
+import pandas as pd
+from .target_association import factorize_column
+
+
+def kfold_fold_ids(n_samples, n_splits=5, shuffle=True, random_state=None):
+    """ Assign each row to one of n_splits folds of (nearly) equal size
+
+    Parameters
+    ----------
+    n_samples : int
+        The number of rows to assign
+    n_splits : int
+        The number of folds
+    shuffle : boolean
+        Flag to randomly assign rows to folds. If False rows are assigned
+        to contiguous folds in order
+    random_state : int
+        Seed for the random assignment
+
+    Returns
+    -------
+    fold_ids: numpy array
+        Integer array with the fold (0 to n_splits-1) of each row
+    """
+    fold_ids = np.arange(n_samples) * n_splits // max(n_samples, 1)
+    if shuffle:
+        fold_ids = np.random.RandomState(random_state).permutation(fold_ids)
+    return fold_ids
+
+
+def smoothed_target_mean(target_sum, target_count, prior, smoothing):
+    """ Target mean shrunk towards the prior: (sum + smoothing*prior) / (count + smoothing).
+    Values without any samples get the prior"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        smoothed_mean = (target_sum + smoothing * prior) / (target_count + smoothing)
+    return np.where(target_count + smoothing > 0, smoothed_mean, prior)
+
+
+def column_kfold_target_encoding(values, target_values, fold_ids, n_splits=5, smoothing=10):
+    """ Out of fold and full data smoothed target encodings of a column, with every
+    fold's statistics computed from a single bincount over (fold, value) codes.
+
+    Each row is encoded with the statistics of the other folds only, so its own
+    target never leaks into its encoding. The full data encodings are for
+    data scored after fitting.
+
+    Parameters
+    ----------
+    values : numpy array/Pandas Series
+        The values of the column to encode
+    target_values : numpy array
+        Float array of the target values
+    fold_ids : numpy array
+        Integer array with the fold of each row (see kfold_fold_ids)
+    n_splits : int
+        The number of folds
+    smoothing : float
+        The weight of the prior (the target mean) in number of samples. Values with few
+        samples are shrunk towards the prior. 0 is the raw target mean
+
+    Returns
+    -------
+    oof_encoded: numpy array
+        The out of fold encoding of each row
+    encoding: Pandas Series
+        The full data encoding of each value, indexed by value
+    prior: float
+        The full data target mean, used for unseen and missing values
+    """
+    codes, uniques = factorize_column(values)
+    n_values = len(uniques)
+    # Rows with a missing target don't contribute to any statistics
+    target_present = ~np.isnan(target_values)
+    valid = target_present & (codes >= 0)
+
+    # Per (fold, value) counts and target sums in one pass
+    fold_value_codes = fold_ids[valid] * n_values + codes[valid]
+    fold_value_counts = np.bincount(fold_value_codes,
+                                    minlength=n_splits * n_values).reshape(n_splits, n_values)
+    fold_value_sums = np.bincount(fold_value_codes, weights=target_values[valid],
+                                  minlength=n_splits * n_values).reshape(n_splits, n_values)
+    value_counts = fold_value_counts.sum(axis=0)
+    value_sums = fold_value_sums.sum(axis=0)
+
+    # Prior of each fold is the target mean of the other folds
+    fold_counts = np.bincount(fold_ids[target_present], minlength=n_splits)
+    fold_sums = np.bincount(fold_ids[target_present], weights=target_values[target_present],
+                            minlength=n_splits)
+    prior = fold_sums.sum() / fold_counts.sum()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        oof_priors = (fold_sums.sum() - fold_sums) / (fold_counts.sum() - fold_counts)
+    oof_priors = np.where(np.isnan(oof_priors), prior, oof_priors)
+
+    # Out of fold statistics are the totals minus the fold's own statistics
+    oof_encoding = smoothed_target_mean(value_sums - fold_value_sums,
+                                        value_counts - fold_value_counts,
+                                        oof_priors.reshape(n_splits, 1), smoothing)
+    row_has_value = codes >= 0
+    oof_encoded = oof_priors[fold_ids]
+    oof_encoded[row_has_value] = oof_encoding[fold_ids[row_has_value], codes[row_has_value]]
+
+    encoding = pd.Series(smoothed_target_mean(value_sums, value_counts, prior, smoothing),
+                         index=uniques)
+    return oof_encoded, encoding, prior
+
+
+def apply_target_encoding(values, encoding, prior):
+    """ Map the values of a column to their fitted target encoding through a single
+    hash lookup. Unseen and missing values get the prior"""
+    positions = encoding.index.get_indexer(values)
+    return np.where(positions >= 0, encoding.values[positions], prior)
+
+
+def df_kfold_target_encoding(df, target, columns, n_splits=5, smoothing=10, shuffle=True,
+                             random_state=None, parallel=False, ncores=None):
+    """ Out of fold and full data smoothed target encodings for several columns,
+    sharing one fold assignment (see column_kfold_target_encoding)
+
+    Parameters
+    ----------
+    df : Pandas DataFrame
+        The dataframe where data resides
+    target : str/Pandas Series
+        Column name of the target in df or the target values
+    columns : list
+        A list of the columns to encode
+    n_splits : int
+        The number of folds
+    smoothing : float
+        The weight of the prior in number of samples
+    shuffle : boolean
+        Flag to randomly assign rows to folds
+    random_state : int
+        Seed for the random fold assignment
+    parallel: boolean
+        Flag to encode the columns in parallel threads
+    ncores : int
+        Number of threads to use when parallel. Defaults to all cores in cpu minus one.
+
+    Returns
+    -------
+    oof_encoded_df: Pandas DataFrame
+        The out of fold encodings of each column, with the index of df
+    encodings: dict
+        Dictionary of the form {column_name: encoding Series}
+    prior: float
+        The full data target mean
+    """
+    if isinstance(target, str):
+        target_values = df[target].to_numpy(dtype=float)
+    else:
+        target_values = np.asarray(target, dtype=float)
+    fold_ids = kfold_fold_ids(df.shape[0], n_splits=n_splits, shuffle=shuffle,
+                              random_state=random_state)
+
+    def encode_column(column):
+        return column_kfold_target_encoding(df[column].values, target_values, fold_ids,
+                                            n_splits=n_splits, smoothing=smoothing)
+
+    if parallel and len(columns) > 1:
+        # If no number of cores to work with, default to max
+        if not ncores:
+            ncores = max(cpu_count() - 1, 1)
+        with ThreadPoolExecutor(max_workers=ncores) as executor:
+            results = list(executor.map(encode_column, columns))
+    else:
+        results = [encode_column(column) for column in columns]
+
+    oof_encoded_df = pd.DataFrame({column: result[0] for column, result in zip(columns, results)},
+                                  index=df.index, columns=columns)
+    encodings = {column: result[1] for column, result in zip(columns, results)}
+    prior = results[0][2] if results else np.nanmean(target_values)
+    return oof_encoded_df, encodings, prior
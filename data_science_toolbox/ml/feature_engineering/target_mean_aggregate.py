@@ -1,5 +1,11 @@
 import numpy as np
 import pandas as pd
+from .target_association import (column_target_stats,
+                                 target_stats_to_association_frame,
+                                 df_target_stats,
+                                 df_target_association_stats,
+                                 target_stats_association_dict)
+from .sketches import heavy_hitter_target_average
 
 def column_values_target_average(df, feature, target,
                                       sample_frequency=True,
@@ -7,7 +13,10 @@ def column_values_target_average(df, feature, target,
                                       min_mean_target_threshold = 0, 
                                       min_sample_size = 0,
                                       min_sample_frequency = 0,
-                                      min_weighted_target_threshold=0):
+                                      min_weighted_target_threshold=0,
+                                      approximate=False,
+                                      sketch_width=2**18,
+                                      sketch_depth=4):
     """ Group by a feature and computing the average target value and sample size
     Returns a dictionary Pandas DataFrame fitting that criteria
 
@@ -39,49 +48,40 @@ def column_values_target_average(df, feature, target,
     min_sample_frequency: float
         The minimum value of the frequency of samples for a feature value
         E.g. .5 would only include feature values with at least 50% of the values in the column         
+    approximate: Boolean
+        Flag to use a count-min sketch to only keep the statistics of feature values
+        likely to pass min_sample_size and min_sample_frequency, so memory stays bounded
+        for columns with a huge number of distinct values (see heavy_hitter_target_average).
+        Default is False
+    sketch_width: int
+        The number of counters per row of the count-min sketch when approximate
+    sketch_depth: int
+        The number of rows of the count-min sketch when approximate
 
     Returns
     -------
     grouped_mean_target_df
         DataFrame of the feature values and their asssociations
     """
-    grouped_mean_target_df = (df.groupby(by=feature)
-     .agg({target:['size', 'mean']})
-     .loc[:, target]
-     .reset_index()
-     .sort_values(by='mean', ascending=False)
-     .rename(columns={'mean':'avg_target', 'size':'sample_size'})
-    )
-    # Sum the sample sizes to get total number of samples
-    total_samples = grouped_mean_target_df['sample_size'].sum()
-    
-    # Flags for adding sample frequency and frequency weighted average
-    if sample_frequency:
-        # Compute frequency
-        grouped_mean_target_df['feature_value_frequency'] = grouped_mean_target_df['sample_size'] / total_samples
-        # Filter out minimums
-        grouped_mean_target_df = grouped_mean_target_df[grouped_mean_target_df['feature_value_frequency'] >= min_sample_frequency]
-        
-    if freq_weighted_average:
-        # Sample frequency must be calculated for frequency weighted average
-        grouped_mean_target_df['feature_value_frequency']  = grouped_mean_target_df['sample_size'] / total_samples 
-        grouped_mean_target_df['freq_weighted_avg_target'] = grouped_mean_target_df['feature_value_frequency']  * grouped_mean_target_df['avg_target']
-        grouped_mean_target_df = grouped_mean_target_df[(grouped_mean_target_df['feature_value_frequency'] >= min_sample_frequency)
-                                                       & (grouped_mean_target_df['freq_weighted_avg_target'] >= min_weighted_target_threshold)
-                                                       ]
-        
-        # If sample frequency not included, drop the column
-        if not sample_frequency:
-            grouped_mean_target_df.drop(labels=['feature_value_frequency'], axis=1, inplace=True)
-    
-    # Filter out minimum metrics
-    grouped_mean_target_df = grouped_mean_target_df[
-        (grouped_mean_target_df['avg_target'] >= min_mean_target_threshold) 
-        & (grouped_mean_target_df['sample_size'] >= min_sample_size)]
-    
-
-    
-    
+    if approximate:
+        return heavy_hitter_target_average(df, feature, target,
+                                      sample_frequency=sample_frequency,
+                                      freq_weighted_average=freq_weighted_average,
+                                      min_mean_target_threshold = min_mean_target_threshold,
+                                      min_sample_size = min_sample_size,
+                                      min_sample_frequency = min_sample_frequency,
+                                      min_weighted_target_threshold = min_weighted_target_threshold,
+                                      sketch_width=sketch_width,
+                                      sketch_depth=sketch_depth)
+    # Single pass sufficient statistics of the target for each feature value
+    stats_df = column_target_stats(df, feature, target)
+    grouped_mean_target_df = target_stats_to_association_frame(stats_df, feature=feature,
+                                      sample_frequency=sample_frequency,
+                                      freq_weighted_average=freq_weighted_average,
+                                      min_mean_target_threshold = min_mean_target_threshold,
+                                      min_sample_size = min_sample_size,
+                                      min_sample_frequency = min_sample_frequency,
+                                      min_weighted_target_threshold = min_weighted_target_threshold)
     return grouped_mean_target_df
 
 
@@ -94,7 +94,9 @@ def df_feature_values_target_average(df,
                                      min_sample_size = 0,
                                      min_sample_frequency = 0,
                                      min_weighted_target_threshold=0,
-                                     ignore_binary=True):
+                                     ignore_binary=True,
+                                     parallel=False,
+                                     ncores=None):
 
     
     """ For a given dataframe and a target column, groupby each column and compute 
@@ -131,30 +133,24 @@ def df_feature_values_target_average(df,
     min_sample_frequency: float
         The minimum value of the frequency of samples for a feature value
         E.g. .5 would only include feature values with at least 50% of the values in the column         
+    parallel: boolean
+        Flag to compute the columns in parallel threads
+    ncores : int
+        Number of threads to use when parallel. Defaults to all cores in cpu minus one.
 
     Returns
     -------
     feature_values_target_average_df
         DataFrame of the feature values and their asssociations
     """
-    
-    # Start with all columns and filter out/include desired columns
-    columns_to_check = df.columns.values.tolist()
-    if include:
-        columns_to_check = [col for col in columns_to_check if col in include]
-    if exclude:
-        columns_to_check = [col for col in columns_to_check if col not in exclude]
-        
-    # Compute for all specified columns in dataframe
-    dataframe_lists = [column_values_target_average(df, column, target,  
+    # Each column is factorized once and its statistics computed with bincount
+    feature_values_target_average_df = df_target_association_stats(df, target,
+                                      include=include, exclude=exclude,
                                       min_mean_target_threshold = min_mean_target_threshold, 
                                       min_sample_size = min_sample_size,
                                       min_sample_frequency = min_sample_frequency,
-                                      min_weighted_target_threshold = min_weighted_target_threshold)
-                     .rename(columns={column:'feature_value'}).assign(feature = column)
-            for column in columns_to_check if column != target] 
-    
-    feature_values_target_average_df = pd.concat(dataframe_lists)
+                                      min_weighted_target_threshold = min_weighted_target_threshold,
+                                      parallel=parallel, ncores=ncores)
     
     return feature_values_target_average_df
 
@@ -197,30 +193,23 @@ def df_feature_vals_target_association_dict(df,
                                             min_sample_size = 0,
                                             min_sample_frequency = 0,
                                             min_weighted_target_threshold=0,
-                                           ignore_binary=True):
+                                           ignore_binary=True,
+                                           parallel=False,
+                                           ncores=None):
 
-    
-    columns_to_check = df.columns.values.tolist()
-    if include:
-        columns_to_check = [col for col in columns_to_check if col in include]
-    if exclude:
-        columns_to_check = [col for col in columns_to_check if col not in exclude]
-        
-    # Compute for all specified columns in dataframe
-    list_of_dicts = [feature_vals_target_association_dict(df, column, target,  
-                                       min_mean_target_threshold = min_mean_target_threshold, 
+    """Return a dictionary of the form {column_name:[list of values]} for every column
+       with values that meet the thresholds of feature_vals_target_association_dict.
+       Each column is factorized once and its statistics computed with bincount,
+       optionally in parallel threads (parallel=True, ncores threads)
+    """
+    stats_dict = df_target_stats(df, target, include=include, exclude=exclude,
+                                 parallel=parallel, ncores=ncores)
+    # Combine into single dictionary if there are any values
+    # that fit the minimum thresholds
+    combined_dict = target_stats_association_dict(stats_dict,
+                                      min_mean_target_threshold = min_mean_target_threshold, 
                                       min_sample_size = min_sample_size,
                                       min_sample_frequency = min_sample_frequency,
                                       min_weighted_target_threshold = min_weighted_target_threshold,
-                                                         ignore_binary=ignore_binary)
-            for column in columns_to_check if column != target]
-
-    # Combine into single dictionary if there are any values
-    # that fit the minimum thresholds
-    combined_dict = {}
-    for dictionary in list_of_dicts:
-        # Check it see if any values in list
-        feat_vals = list(dictionary.values())
-        if len(feat_vals[0]) >=1:
-            combined_dict.update(dictionary)
-    return combined_dict
\ No newline at end of file
+                                      ignore_binary=ignore_binary)
+    return combined_dict
@@ -0,0 +1,208 @@
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import cpu_count
+import numpy as np
+import pandas as pd
+from .target_association import factorize_column
+
+
+def quantile_bin_edges(values, n_bins=10):
+    """ Interior cutpoints splitting numeric values into (at most) n_bins equal frequency bins.
+    Bin i holds the values in [edges[i-1], edges[i])"""
+    quantiles = np.linspace(0, 1, n_bins + 1)[1:-1]
+    values = values[~np.isnan(values)]
+    if values.shape[0] == 0:
+        return np.array([])
+    return np.unique(np.quantile(values, quantiles))
+
+
+def float_values(values):
+    """ Numeric values (including nullable extension arrays) as a float array with NaN
+    for missing values"""
+    return pd.Series(values).to_numpy(dtype=float, na_value=np.nan)
+
+
+def bin_codes(values, edges):
+    """ Bin code of every numeric value given the interior cutpoints. Missing values get -1"""
+    codes = np.searchsorted(edges, values, side='right')
+    codes[np.isnan(values)] = -1
+    return codes
+
+
+def bin_labels(edges):
+    """ String labels of the bins defined by interior cutpoints"""
+    bounds = np.concatenate([[-np.inf], edges, [np.inf]])
+    return [f'[{lower:g}, {upper:g})' for lower, upper in zip(bounds[:-1], bounds[1:])]
+
+
+def woe_from_counts(events, non_events, smoothing=0.5):
+    """ Weight of Evidence and Information Value of every bin from its event and non event
+    counts. smoothing is added to every count so empty bins get a finite WoE
+
+    Returns
+    -------
+    dist_event, dist_non_event, woe, iv: numpy arrays
+    """
+    n_bins = events.shape[0]
+    dist_event = (events + smoothing) / (events.sum() + smoothing * n_bins)
+    dist_non_event = (non_events + smoothing) / (non_events.sum() + smoothing * n_bins)
+    woe = np.log(dist_event / dist_non_event)
+    iv = (dist_event - dist_non_event) * woe
+    return dist_event, dist_non_event, woe, iv
+
+
+def column_woe(values, target_values, n_bins=10, smoothing=0.5):
+    """ Weight of Evidence table of a column from a single pass over its factorized
+    (or, for numeric columns with more than n_bins distinct values, quantile binned) codes.
+    Missing values are kept as their own bin.
+
+    Parameters
+    ----------
+    values : numpy array
+        The values of the column
+    target_values : numpy array
+        Binary target values where 1 is the event and 0 the non event
+    n_bins : int
+        The number of quantile bins for numeric columns
+    smoothing : float
+        Count added to the events and non events of every bin
+
+    Returns
+    -------
+    woe_table: Pandas DataFrame
+        DataFrame with columns feature_value, sample_size, events, non_events,
+        dist_event, dist_non_event, woe and iv
+    edges: numpy array
+        Interior cutpoints of the bins if the column was binned, else None
+    """
+    edges = None
+    if pd.api.types.is_numeric_dtype(values) and pd.unique(values).shape[0] > n_bins:
+        values = float_values(values)
+        edges = quantile_bin_edges(values, n_bins)
+        codes = bin_codes(values, edges)
+        feature_values = bin_labels(edges)
+    else:
+        codes, feature_values = factorize_column(values)
+        feature_values = list(feature_values)
+    # Missing values get their own code after the present values
+    n_values = len(feature_values)
+    has_missing = (codes < 0).any()
+    if has_missing:
+        codes = np.where(codes < 0, n_values, codes)
+        feature_values = feature_values + [np.nan]
+        n_values += 1
+
+    sample_size = np.bincount(codes, minlength=n_values)
+    events = np.bincount(codes, weights=(target_values == 1), minlength=n_values)
+    non_events = np.bincount(codes, weights=(target_values == 0), minlength=n_values)
+    dist_event, dist_non_event, woe, iv = woe_from_counts(events, non_events, smoothing=smoothing)
+
+    woe_table = pd.DataFrame({'feature_value': pd.Series(feature_values, dtype=object),
+                              'sample_size': sample_size,
+                              'events': events.astype(np.int64),
+                              'non_events': non_events.astype(np.int64),
+                              'dist_event': dist_event,
+                              'dist_non_event': dist_non_event,
+                              'woe': woe,
+                              'iv': iv})
+    return woe_table, edges
+
+
+def df_woe_tables(df, target, include=None, exclude=None, n_bins=10, smoothing=0.5,
+                  parallel=False, ncores=None):
+    """ Weight of Evidence tables (see column_woe) for every column of a dataframe
+
+    Returns
+    -------
+    woe_tables: dict
+        Dictionary of the form {column_name: (woe_table, edges)}
+    """
+    # Start with all columns and filter out/include desired columns
+    columns_to_check = df.columns.values.tolist()
+    if include:
+        columns_to_check = [col for col in columns_to_check if col in include]
+    if exclude:
+        columns_to_check = [col for col in columns_to_check if col not in exclude]
+    columns_to_check = [col for col in columns_to_check if col != target]
+    target_values = df[target].values
+
+    def compute_column_woe(column):
+        return column_woe(df[column].values, target_values, n_bins=n_bins, smoothing=smoothing)
+
+    if parallel and len(columns_to_check) > 1:
+        # If no number of cores to work with, default to max
+        if not ncores:
+            ncores = max(cpu_count() - 1, 1)
+        with ThreadPoolExecutor(max_workers=ncores) as executor:
+            results = list(executor.map(compute_column_woe, columns_to_check))
+    else:
+        results = [compute_column_woe(column) for column in columns_to_check]
+    return dict(zip(columns_to_check, results))
+
+
+def df_woe_iv_report(df, target, include=None, exclude=None, n_bins=10, smoothing=0.5,
+                     parallel=False, ncores=None):
+    """ Weight of Evidence and Information Value of every column against a binary target.
+    Numeric columns with more than n_bins distinct values are split into equal frequency
+    bins, other columns use their values. Missing values are kept as their own bin.
+
+    Parameters
+    ----------
+    df : Pandas DataFrame
+        The dataframe where data resides
+    target : str
+        Column name of the binary target where 1 is the event and 0 the non event
+    include: list
+        A list of columns to include when computing
+    exclude: list
+        A list of columns to exclude when computing
+    n_bins : int
+        The number of quantile bins for numeric columns
+    smoothing : float
+        Count added to the events and non events of every bin so empty bins
+        get a finite WoE
+    parallel: boolean
+        Flag to compute the columns in parallel threads
+    ncores : int
+        Number of threads to use when parallel. Defaults to all cores in cpu minus one.
+
+    Returns
+    -------
+    woe_df: Pandas DataFrame
+        Tidy DataFrame of every column's bins with columns feature, feature_value,
+        sample_size, events, non_events, dist_event, dist_non_event, woe and iv
+    iv_df: Pandas DataFrame
+        DataFrame of every column's Information Value (feature, iv, n_bins)
+        sorted from most to least predictive
+    """
+    woe_tables = df_woe_tables(df, target, include=include, exclude=exclude, n_bins=n_bins,
+                               smoothing=smoothing, parallel=parallel, ncores=ncores)
+    woe_df = pd.concat([woe_table.assign(feature=column)
+                        for column, (woe_table, _) in woe_tables.items()],
+                       ignore_index=True)
+    woe_df = woe_df[['feature'] + [col for col in woe_df.columns if col != 'feature']]
+    iv_df = (woe_df.groupby('feature', sort=False)
+             .agg({'iv': 'sum', 'feature_value': 'size'})
+             .rename(columns={'feature_value': 'n_bins'})
+             .reset_index()
+             .sort_values(by='iv', ascending=False)
+             .reset_index(drop=True))
+    return woe_df, iv_df
+
+
+def apply_woe(values, woe_table, edges=None):
+    """ Map the values of a column to the WoE of their fitted bin. Unseen values get a
+    neutral WoE of 0, missing values the WoE of the missing bin if one was fitted"""
+    woe_values = woe_table['woe'].values
+    present_values = woe_table['feature_value']
+    missing_bin = np.flatnonzero(present_values.isnull().values)
+    missing_woe = woe_values[missing_bin[0]] if missing_bin.shape[0] else 0.0
+    if edges is not None:
+        values = float_values(values)
+        positions = bin_codes(values, edges)
+    else:
+        is_missing = pd.isnull(values)
+        positions = pd.Index(present_values[present_values.notnull()].tolist()).get_indexer(values)
+        positions[is_missing] = -1
+    woe_encoded = np.where(positions >= 0, woe_values[np.maximum(positions, 0)], 0.0)
+    woe_encoded[pd.isnull(values)] = missing_woe
+    return woe_encoded
@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+from .feature_list_store import FeatureListStore
+
+CONSENSUS_SCORES = ['Borda_Score', 'Mean_Reciprocal_Rank', 'Selection_Frequency']
+
+
+def _list_ids(ranked_df):
+    """ Id of the feature list of every row of a ranked_flists DataFrame. Uses the List_ID
+    column if present, otherwise a new list starts at every Rank of 1"""
+    if 'List_ID' in ranked_df.columns:
+        return pd.factorize(ranked_df.List_ID.values)[0]
+    return np.cumsum(ranked_df.Rank.values == 1) - 1
+
+
+class ConsensusRanking(object):
+    """ Consensus ranking of features over many ranked feature lists, kept as running
+    per feature sums so it can be updated incrementally as new lists are logged.
+
+    Scores of every feature:
+        Borda_Score: mean over lists of (list length - rank + 1), 0 when not selected
+        Mean_Reciprocal_Rank: mean over lists of 1 / rank, 0 when not selected
+        Selection_Frequency: share of lists that selected the feature
+        Mean_Rank: mean rank over the lists that selected the feature
+
+    Example
+    -------
+    consensus = ConsensusRanking()
+    consensus.update(ranked_flists(flist_log))
+    consensus.ranking(by='Borda_Score')
+
+    # Incrementally from a FeatureListStore, reading only the new lists
+    consensus = ConsensusRanking(method='RFE')
+    consensus.update_from_store(store)
+    """
+
+    def __init__(self, method=None):
+        """
+        Parameters
+        ----------
+        method : str
+            Only use the feature lists of this feature selection method. Default is all
+        """
+        self.method = method
+        self.features = pd.Index([])
+        self.n_lists = 0
+        # Running sums per feature, aligned with self.features
+        self.borda_sum = np.zeros(0)
+        self.reciprocal_rank_sum = np.zeros(0)
+        self.rank_sum = np.zeros(0)
+        self.selected_count = np.zeros(0, dtype=np.int64)
+        # Ids of the first and last store lists read by update_from_store
+        self.first_list_id = None
+        self.last_list_id = None
+
+    def _extend_features(self, new_features):
+        """ Add unseen features with zero sums and return the position of every feature"""
+        unseen = pd.Index(new_features).difference(self.features)
+        if len(unseen):
+            self.features = self.features.append(unseen)
+            padding = len(unseen)
+            self.borda_sum = np.append(self.borda_sum, np.zeros(padding))
+            self.reciprocal_rank_sum = np.append(self.reciprocal_rank_sum, np.zeros(padding))
+            self.rank_sum = np.append(self.rank_sum, np.zeros(padding))
+            self.selected_count = np.append(self.selected_count, np.zeros(padding, dtype=np.int64))
+        return self.features.get_indexer(new_features)
+
+    def update(self, ranked_df):
+        """ Add the lists of a ranked_flists (or FeatureListStore.ranked) DataFrame.
+        Every score is accumulated with one bincount over the feature codes"""
+        if self.method is not None:
+            ranked_df = ranked_df[ranked_df.Method == self.method]
+        # Empty lists are stored as a single empty feature
+        ranked_df = ranked_df[ranked_df.Feature.notnull() & (ranked_df.Feature != '')]
+        if ranked_df.empty:
+            return self
+        list_codes = _list_ids(ranked_df)
+        feature_codes, features = pd.factorize(ranked_df.Feature.values)
+        positions = self._extend_features(features)
+        ranks = ranked_df.Rank.values.astype(float)
+        list_lengths = np.bincount(list_codes)
+        n_features = len(features)
+        self.borda_sum[positions] += np.bincount(feature_codes, weights=list_lengths[list_codes] - ranks + 1,
+                                                 minlength=n_features)
+        self.reciprocal_rank_sum[positions] += np.bincount(feature_codes, weights=1 / ranks, minlength=n_features)
+        self.rank_sum[positions] += np.bincount(feature_codes, weights=ranks, minlength=n_features)
+        self.selected_count[positions] += np.bincount(feature_codes, minlength=n_features)
+        self.n_lists += int(list_codes.max()) + 1
+        return self
+
+    def update_from_store(self, store):
+        """ Add the lists logged to a FeatureListStore since the last call"""
+        if not isinstance(store, FeatureListStore):
+            raise TypeError('store must be a FeatureListStore')
+        ranked_df = store.ranked(method=self.method, after_id=self.last_list_id)
+        if not ranked_df.empty:
+            first_list_id = int(ranked_df.List_ID.min())
+            self.first_list_id = first_list_id if self.first_list_id is None else min(self.first_list_id,
+                                                                                       first_list_id)
+            self.last_list_id = int(ranked_df.List_ID.max())
+        return self.update(ranked_df)
+
+    def merge(self, other):
+        """ Add the running sums of another ConsensusRanking. Rankers that read overlapping
+        ranges of store lists can't be merged as those lists would be counted twice. The
+        merged ranker's update_from_store continues after the last list either one read"""
+        if (self.last_list_id is not None) and (other.last_list_id is not None) and \
+                (self.first_list_id <= other.last_list_id) and (other.first_list_id <= self.last_list_id):
+            raise ValueError(f'Can not merge rankers that read overlapping store lists '
+                             f'({self.first_list_id}-{self.last_list_id} and '
+                             f'{other.first_list_id}-{other.last_list_id})')
+        positions = self._extend_features(other.features)
+        self.borda_sum[positions] += other.borda_sum
+        self.reciprocal_rank_sum[positions] += other.reciprocal_rank_sum
+        self.rank_sum[positions] += other.rank_sum
+        self.selected_count[positions] += other.selected_count
+        self.n_lists += other.n_lists
+        if other.last_list_id is not None:
+            self.first_list_id = (other.first_list_id if self.first_list_id is None
+                                  else min(self.first_list_id, other.first_list_id))
+            self.last_list_id = (other.last_list_id if self.last_list_id is None
+                                 else max(self.last_list_id, other.last_list_id))
+        return self
+
+    def ranking(self, by='Borda_Score'):
+        """ DataFrame of every feature's consensus scores sorted by one of them, with columns
+        Feature, Consensus_Rank, Borda_Score, Mean_Reciprocal_Rank, Selection_Frequency and Mean_Rank"""
+        if by not in CONSENSUS_SCORES:
+            raise ValueError(f'by must be one of {CONSENSUS_SCORES}')
+        n_lists = max(self.n_lists, 1)
+        consensus_df = pd.DataFrame({'Feature': self.features.values,
+                                     'Borda_Score': self.borda_sum / n_lists,
+                                     'Mean_Reciprocal_Rank': self.reciprocal_rank_sum / n_lists,
+                                     'Selection_Frequency': self.selected_count / n_lists,
+                                     'Mean_Rank': self.rank_sum / np.maximum(self.selected_count, 1)})
+        consensus_df = consensus_df.sort_values(by=[by, 'Feature'], ascending=[False, True]).reset_index(drop=True)
+        consensus_df.insert(1, 'Consensus_Rank', np.arange(1, consensus_df.shape[0] + 1))
+        return consensus_df
+
+
+def consensus_ranking(ranked_df, by='Borda_Score', method=None):
+    """ Consensus ranking of the features of a ranked_flists DataFrame (see ConsensusRanking)
+
+    Parameters
+    ----------
+    ranked_df : Pandas DataFrame
+        Output of ranked_flists or FeatureListStore.ranked
+    by : str
+        The score to rank by: 'Borda_Score', 'Mean_Reciprocal_Rank' or 'Selection_Frequency'
+    method : str
+        Only use the feature lists of this feature selection method. Default is all
+
+    Returns
+    -------
+    consensus_df: Pandas DataFrame
+        DataFrame of every feature's scores sorted by the by score
+    """
+    return ConsensusRanking(method=method).update(ranked_df).ranking(by=by)
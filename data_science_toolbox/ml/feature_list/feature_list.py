@@ -1,8 +1,9 @@
 import pandas as pd
 import numpy as np
+from .feature_list_store import FeatureListStore
 
 def feature_list_log(selected_features_df, method=None, notes = None, split_char='---',
-                     export=False, export_fpath=None, previous_features_df_fpath=None):
+                     export=False, export_fpath=None, previous_features_df_fpath=None, store=None):
     """ Given a DataFrame, create a record of its columns as selected features.
         Optionally specify feature selection method or notes
         Can specify a filepath of previous feature list logs to add to
@@ -23,6 +24,9 @@ def feature_list_log(selected_features_df, method=None, notes = None, split_char
     split_char : str
         The string character pattern to join the features together on.
         Default is '---' 
+    store : FeatureListStore
+        A store to append the record to instead of re-reading and rewriting a csv log.
+        Only the new record is returned. split_char must match the store's split_char
     
     Returns
     -------
@@ -44,6 +48,13 @@ def feature_list_log(selected_features_df, method=None, notes = None, split_char
         'Notes': notes,
         'Features':split_char.join(selected_features_df.columns.values.tolist())
         }
+    if (store is not None) and (split_char != store.split_char):
+        raise ValueError(f"split_char '{split_char}' does not match the store's split_char "
+                         f"'{store.split_char}'. Set split_char when creating the FeatureListStore")
+    if store is not None:
+        # Append only, the rest of the log is never read
+        store.append(selected_features_df.columns.values.tolist(), method=method, notes=notes, date=timestamp)
+        return pd.DataFrame(selected_features_record, index=[0])
     if previous_features_df_fpath:
         # Load in previous log of features
         previous_feature_selections_df = pd.read_csv(previous_features_df_fpath)
@@ -60,32 +71,19 @@ def feature_list_log(selected_features_df, method=None, notes = None, split_char
     return features_log
 
 def ranked_flists(flist_log, split_char='---'):
-    """Given a feature list log, return an unpacked dataframe with each
+    """Given a feature list log (or FeatureListStore), return an unpacked dataframe with each
        method and ranking of features (assuming features are listed in order
        of importance)
     """
-    ranked_flist_dfs = []
-    # iterrows is slow but featurelist log should rarely if ever
-    # be large
-    for index, row in flist_log.iterrows():
-        method = row['Method']
-        flist = row.Features.split(split_char)
-        
-        # Get ranking from list order
-        ranked_feats = [ranked_feature for ranked_feature in enumerate(flist)]
-        ranks = [ranked_feat[0]+1 for ranked_feat in ranked_feats]
-        feats = [ranked_feat[1] for ranked_feat in ranked_feats]
-        
-        # Record
-        ranked_features = pd.DataFrame({
-            'Method':method,
-            'Rank':ranks,
-            'Feature':feats
-        })
-        ranked_flist_dfs.append(ranked_features)
-    
-    ranked_flists_df = pd.concat(ranked_flist_dfs, ignore_index=True).reset_index(drop=True)
-    return ranked_flists_df
+    if isinstance(flist_log, FeatureListStore):
+        return flist_log.ranked()[['Method', 'Rank', 'Feature']]
+    # One row per feature of every list, in list order
+    ranked_flists_df = (pd.DataFrame({'Method': flist_log.Method.values,
+                                      'Feature': flist_log.Features.str.split(split_char).values})
+                        .explode('Feature'))
+    # Get ranking from list order
+    ranked_flists_df['Rank'] = ranked_flists_df.groupby(level=0).cumcount() + 1
+    return ranked_flists_df[['Method', 'Rank', 'Feature']].reset_index(drop=True)
         
         
 def feature_list_latest(feature_selection_df, method=None, max_features=None, 
@@ -97,9 +95,10 @@ def feature_list_latest(feature_selection_df, method=None, max_features=None,
         Order of filtering goes: method --> max number of features --> notes
     Parameters
     ----------
-    feature_selection_df : Pandas DataFrame
+    feature_selection_df : Pandas DataFrame/FeatureListStore
         A dataframe log of feature selection lists.
         Must have columns: ['Date', 'Method', 'Number_of_Features', 'Notes', 'Features']
+        A FeatureListStore is filtered with indexed queries instead
     method : str
         A feature selection method name. Searches df column 'Method' for a match
     max_features : int
@@ -118,6 +117,17 @@ def feature_list_latest(feature_selection_df, method=None, max_features=None,
     feature_selection_df: Pandas DataFrame
         A dataframe of feature lists filtered by the given criteria
     """
+    if isinstance(feature_selection_df, FeatureListStore):
+        ## Filter with indexed queries on the store
+        store = feature_selection_df
+        if not return_df:
+            latest_flist = store.latest(method=method, max_features=max_features, notes_contains=notes_contains)
+            if latest_flist is None:
+                return print('No feature list with specified filters found')
+            return latest_flist
+        feature_selection_df = store.to_frame(method=method, max_features=max_features,
+                                              notes_contains=notes_contains)
+        method, max_features, notes_contains = None, None, None
     if method:
         ## Filter by method
         feature_selection_df = feature_selection_df[feature_selection_df.Method == method]
@@ -0,0 +1,166 @@
+import datetime
+import re
+import sqlite3
+import pandas as pd
+
+LOG_COLUMNS = ['Date', 'Method', 'Number_of_Features', 'Notes', 'Features']
+
+
+def _regexp(pattern, value):
+    """ REGEXP function for sqlite, matching like pandas str.contains"""
+    return value is not None and re.search(pattern, value) is not None
+
+
+class FeatureListStore(object):
+    """ Append-only SQLite store of feature list logs.
+
+    Each feature list is one row of the feature_lists table (same columns as the
+    feature_list_log DataFrame) and its features are also stored one per row with their
+    rank in list_features, so appends never rewrite the log, feature_list_latest is an
+    indexed query and rankings don't need to split the Features strings.
+    The database is in WAL mode and every append is its own transaction, so parallel
+    feature selection jobs (threads or processes) can append to the same store.
+
+    Example
+    -------
+    store = FeatureListStore('feature_lists.db')
+    feature_list_log(X_selected, method='RFE', store=store)
+    feature_list_latest(store, method='RFE')
+    ranked_flists(store)
+    """
+
+    def __init__(self, db_fpath, split_char='---', timeout=60):
+        """
+        Parameters
+        ----------
+        db_fpath : str
+            The file path of the SQLite database. Created if it doesn't exist
+        split_char : str
+            The string character pattern the features are joined on in the Features column
+        timeout : float
+            Seconds to wait for a concurrent writer to finish before failing
+        """
+        self.db_fpath = db_fpath
+        self.split_char = split_char
+        self.timeout = timeout
+        # sqlite3's connection context manager only commits, so close explicitly
+        conn = self._connect()
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS feature_lists (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    Date TEXT,
+                    Method TEXT,
+                    Number_of_Features INTEGER,
+                    Notes TEXT,
+                    Features TEXT
+                );
+                CREATE TABLE IF NOT EXISTS list_features (
+                    list_id INTEGER REFERENCES feature_lists(id),
+                    Rank INTEGER,
+                    Feature TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_feature_lists_method ON feature_lists (Method, id);
+                CREATE INDEX IF NOT EXISTS idx_feature_lists_n_features ON feature_lists (Number_of_Features, id);
+                CREATE INDEX IF NOT EXISTS idx_list_features_list ON list_features (list_id);
+                CREATE INDEX IF NOT EXISTS idx_list_features_feature ON list_features (Feature);
+            """)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_fpath, timeout=self.timeout)
+        conn.create_function('REGEXP', 2, _regexp)
+        return conn
+
+    def append(self, features, method=None, notes=None, date=None):
+        """ Add a feature list (in order of importance) to the store
+
+        Returns
+        -------
+        list_id: int
+            The id of the new feature list
+        """
+        features = [str(feature) for feature in features]
+        if date is None:
+            # Time as YYY:MM:DD HH:MM
+            date = str(datetime.datetime.today())[:-10]
+        record = (date, method or 'Not_Specified', len(features), notes or '', self.split_char.join(features))
+        conn = self._connect()
+        try:
+            with conn:
+                # Take the write lock up front so concurrent appends queue instead of failing
+                conn.execute('BEGIN IMMEDIATE')
+                list_id = conn.execute('INSERT INTO feature_lists (Date, Method, Number_of_Features, Notes, Features) '
+                                       'VALUES (?, ?, ?, ?, ?)', record).lastrowid
+                conn.executemany('INSERT INTO list_features (list_id, Rank, Feature) VALUES (?, ?, ?)',
+                                 [(list_id, rank, feature) for rank, feature in enumerate(features, start=1)])
+        finally:
+            conn.close()
+        return list_id
+
+    def import_log(self, features_log):
+        """ Add every feature list of a feature_list_log DataFrame (e.g. read from an old csv log)"""
+        for row in features_log[LOG_COLUMNS].itertuples(index=False):
+            # Empty lists are read back from csv as NaN
+            features = row.Features.split(self.split_char) if isinstance(row.Features, str) and row.Features else []
+            notes = row.Notes if isinstance(row.Notes, str) else None
+            method = row.Method if isinstance(row.Method, str) else None
+            self.append(features, method=method, notes=notes, date=row.Date)
+        return self
+
+    def _query(self, sql, params=()):
+        conn = self._connect()
+        try:
+            return pd.read_sql_query(sql, conn, params=params)
+        finally:
+            conn.close()
+
+    def _filters(self, method=None, max_features=None, notes_contains=None):
+        """ WHERE clause and parameters for the feature_list_latest filters"""
+        conditions, params = [], []
+        if method:
+            conditions.append('Method = ?')
+            params.append(method)
+        if max_features:
+            conditions.append('Number_of_Features <= ?')
+            params.append(max_features)
+        if notes_contains:
+            conditions.append('Notes REGEXP ?')
+            params.append(notes_contains)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        return where, params
+
+    def to_frame(self, method=None, max_features=None, notes_contains=None):
+        """ The feature lists as a feature_list_log DataFrame, in the order they were added"""
+        where, params = self._filters(method, max_features, notes_contains)
+        return self._query(f"SELECT {', '.join(LOG_COLUMNS)} FROM feature_lists {where} ORDER BY id", params)
+
+    def latest(self, method=None, max_features=None, notes_contains=None):
+        """ The latest feature list matching the filters (see feature_list_latest), or None"""
+        where, params = self._filters(method, max_features, notes_contains)
+        latest_df = self._query(f'SELECT id FROM feature_lists {where} ORDER BY id DESC LIMIT 1', params)
+        if latest_df.empty:
+            return None
+        features_df = self._query('SELECT Feature FROM list_features WHERE list_id = ? ORDER BY Rank',
+                                  (int(latest_df.id[0]),))
+        return features_df.Feature.tolist()
+
+    def ranked(self, method=None, after_id=None):
+        """ DataFrame of the rank of every feature of every list with columns
+        List_ID, Method, Rank and Feature. Only lists with an id greater than
+        after_id if given, to read just the lists logged since a previous call"""
+        where, params = self._filters(method)
+        if after_id is not None:
+            where = f"{where} AND list_features.list_id > ?" if where else 'WHERE list_features.list_id > ?'
+            params.append(after_id)
+        return self._query('SELECT list_features.list_id AS List_ID, Method, Rank, Feature '
+                           'FROM list_features JOIN feature_lists ON list_features.list_id = feature_lists.id '
+                           f'{where} ORDER BY list_features.list_id, Rank', params)
+
+    def __len__(self):
+        return int(self._query('SELECT COUNT(*) AS n FROM feature_lists').n[0])
+
+    def __repr__(self):
+        return f"FeatureListStore('{self.db_fpath}')"
@@ -0,0 +1,231 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import cpu_count
+import numpy as np
+import pandas as pd
+from .feature_list.feature_list import feature_list_log
+
+# multiprocessing.shared_memory needs python 3.8+. Without it
+# parallel permutation importance runs in threads instead of processes
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:
+    resource_tracker = shared_memory = None
+
+# State of each worker process, set once by _init_worker
+_worker_state = {}
+
+
+def prefix_column_groups(columns, base_features, prefix_sep='_'):
+    """ Group the columns made from each base feature (e.g. its dummies base_value)
+    so they are permuted together. Columns not made from a base feature are not grouped.
+    A column matching several base features (e.g. age_group_young for age and age_group)
+    goes to the longest one
+
+    Returns
+    -------
+    column_groups: dict
+        {base feature: [its columns]}
+    """
+    # Longest base features first so each column takes its most specific match
+    longest_first = sorted(base_features, key=lambda base_feature: len(str(base_feature)), reverse=True)
+    column_base_features = {}
+    for col in columns:
+        for base_feature in longest_first:
+            if (col == base_feature) or str(col).startswith(f'{base_feature}{prefix_sep}'):
+                column_base_features[col] = base_feature
+                break
+    column_groups = {}
+    for base_feature in base_features:
+        group = [col for col in columns if column_base_features.get(col) == base_feature]
+        if group:
+            column_groups[base_feature] = group
+    return column_groups
+
+
+def _feature_groups(columns, column_groups=None):
+    """ List of (group name, column positions), with every column not in
+    column_groups as its own group"""
+    column_positions = {col: position for position, col in enumerate(columns)}
+    feature_groups = []
+    grouped = set()
+    for group_name, group_columns in (column_groups or {}).items():
+        overlap = grouped.intersection(group_columns)
+        if overlap:
+            raise ValueError(f'Columns {sorted(map(str, overlap))} are in more than one of column_groups. '
+                             f'Each column can only be shuffled with one group')
+        feature_groups.append((group_name, [column_positions[col] for col in group_columns]))
+        grouped.update(group_columns)
+    feature_groups += [(col, [position]) for col, position in column_positions.items() if col not in grouped]
+    return feature_groups
+
+
+def _predict(model, X_chunk, columns, predict_method):
+    if columns is not None:
+        X_chunk = pd.DataFrame(X_chunk, columns=columns)
+    return getattr(model, predict_method)(X_chunk)
+
+
+def _permuted_score(X, y, model, scoring, columns, predict_method, sample_weight, chunk_size,
+                    group_positions, seed):
+    """ Score of the model with the columns of a group shuffled together. Rows are
+    predicted chunk by chunk so X is never copied whole"""
+    rng = np.random.default_rng(seed)
+    permutation = rng.permutation(X.shape[0])
+    predictions = []
+    for start in range(0, X.shape[0], chunk_size):
+        X_chunk = X[start:start + chunk_size].copy()
+        X_chunk[:, group_positions] = X[permutation[start:start + chunk_size][:, np.newaxis], group_positions]
+        predictions.append(_predict(model, X_chunk, columns, predict_method))
+    y_pred = np.concatenate(predictions)
+    if sample_weight is not None:
+        return scoring(y, y_pred, sample_weight=sample_weight)
+    return scoring(y, y_pred)
+
+
+def _attach_shared_memory(shm_name):
+    """ Attach to a shared memory block owned by another process. Pool workers share the
+    resource tracker of the process that created the block, but a process with its own
+    tracker would unlink the block when it exits, so the attachment is unregistered there"""
+    has_own_tracker = False
+    if os.name == 'posix':
+        try:
+            has_own_tracker = resource_tracker._resource_tracker._fd is None
+        except AttributeError:
+            pass
+    shm = shared_memory.SharedMemory(name=shm_name)
+    if has_own_tracker:
+        try:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        except Exception:
+            pass
+    return shm
+
+
+def _init_worker(shm_name, shape, dtype, y, model, scoring, columns, predict_method, sample_weight, chunk_size):
+    """ Attach the shared X and keep the model and scoring once per worker process"""
+    shm = _attach_shared_memory(shm_name)
+    _worker_state.update({'shm': shm,
+                          'X': np.ndarray(shape, dtype=dtype, buffer=shm.buf),
+                          'args': (y, model, scoring, columns, predict_method, sample_weight, chunk_size)})
+
+
+def _worker_permuted_score(task):
+    group_positions, seed = task
+    return _permuted_score(_worker_state['X'], *_worker_state['args'], group_positions, seed)
+
+
+def permutation_importance(model, X, y, scoring, n_repeats=5, column_groups=None, predict_method='predict',
+                           sample_weight=None, chunk_size=100000, random_state=None,
+                           parallel=False, ncores=None, flist_log_kwargs=None):
+    """ Permutation importance of the features (or groups of features) of a fitted model:
+    the drop in score when the values of a feature are shuffled.
+
+    The baseline prediction and score are computed once. Shuffles run in parallel worker
+    processes that read X from shared memory instead of each getting a copy, and every
+    shuffle predicts X chunk by chunk of rows.
+
+    Parameters
+    ----------
+    model : fitted model
+        Any model with predict_method. Must be picklable when parallel
+    X : Pandas DataFrame/numpy array
+        Numeric features the model was fitted on. DataFrames are rebuilt with their
+        column names before predicting. Must have a numeric (or boolean) dtype when
+        parallel, as it is shared with the worker processes as raw memory
+    y : numpy array
+        The target values
+    scoring : callable
+        scoring(y_true, y_pred) where higher is better, e.g. sklearn.metrics.accuracy_score.
+        Must be a picklable (module level) function when parallel
+    n_repeats : int
+        The number of times every feature is shuffled
+    column_groups : dict
+        {group name: [columns]} of columns to shuffle together, e.g. all the dummies
+        of a base feature (see prefix_column_groups). Other columns are shuffled alone
+    predict_method : str
+        The model method giving the predictions scoring expects, e.g. 'predict_proba'
+    sample_weight : numpy array
+        Weights passed to scoring as sample_weight
+    chunk_size : int
+        The number of rows predicted at once
+    random_state : int
+        Seed for reproducible shuffles
+    parallel : boolean
+        Flag to shuffle the features in parallel processes (threads before python 3.8)
+    ncores : int
+        Number of workers to use when parallel. Defaults to all cores in cpu minus one.
+    flist_log_kwargs : dict
+        If given, the ranked features (all columns of each group in group rank order) are
+        logged with feature_list_log(**flist_log_kwargs), e.g. {'store': store} or
+        {'previous_features_df_fpath': fpath, 'export_fpath': fpath}.
+        The method defaults to 'Permutation_Importance'
+
+    Returns
+    -------
+    importance_df: Pandas DataFrame
+        DataFrame with columns Feature, Rank, Importance_Mean and Importance_Std
+        sorted from most to least important
+    """
+    columns = X.columns.values.tolist() if isinstance(X, pd.DataFrame) else None
+    X_values = np.ascontiguousarray(X.values if isinstance(X, pd.DataFrame) else X)
+    y = np.asarray(y)
+    use_shared_memory = parallel and shared_memory is not None
+    if use_shared_memory and not (np.issubdtype(X_values.dtype, np.number) or X_values.dtype == bool):
+        raise ValueError(f'X must be numeric to be shared with parallel worker processes, got dtype '
+                         f'{X_values.dtype}. Encode non numeric columns or set parallel=False')
+    feature_groups = _feature_groups(columns if columns is not None else list(range(X_values.shape[1])),
+                                     column_groups)
+
+    # Baseline prediction and score, computed once
+    baseline_predictions = np.concatenate([_predict(model, X_values[start:start + chunk_size], columns, predict_method)
+                                           for start in range(0, X_values.shape[0], chunk_size)])
+    if sample_weight is not None:
+        baseline_score = scoring(y, baseline_predictions, sample_weight=sample_weight)
+    else:
+        baseline_score = scoring(y, baseline_predictions)
+
+    # One independent random stream per (group, repeat) so results don't depend on the workers
+    seeds = np.random.SeedSequence(random_state).spawn(len(feature_groups) * n_repeats)
+    tasks = [(group_positions, seeds[group * n_repeats + repeat])
+             for group, (_, group_positions) in enumerate(feature_groups) for repeat in range(n_repeats)]
+    score_args = (y, model, scoring, columns, predict_method, sample_weight, chunk_size)
+
+    if parallel:
+        # If no number of cores to work with, default to max
+        if not ncores:
+            ncores = max(cpu_count() - 1, 1)
+    if use_shared_memory:
+        shm = shared_memory.SharedMemory(create=True, size=max(X_values.nbytes, 1))
+        try:
+            shared_X = np.ndarray(X_values.shape, dtype=X_values.dtype, buffer=shm.buf)
+            shared_X[:] = X_values
+            with ProcessPoolExecutor(max_workers=ncores, initializer=_init_worker,
+                                     initargs=(shm.name, X_values.shape, X_values.dtype) + score_args) as executor:
+                scores = list(executor.map(_worker_permuted_score, tasks))
+        finally:
+            shm.close()
+            shm.unlink()
+    elif parallel:
+        with ThreadPoolExecutor(max_workers=ncores) as executor:
+            scores = list(executor.map(lambda task: _permuted_score(X_values, *score_args, *task), tasks))
+    else:
+        scores = [_permuted_score(X_values, *score_args, *task) for task in tasks]
+
+    importances = baseline_score - np.array(scores).reshape(len(feature_groups), n_repeats)
+    importance_df = (pd.DataFrame({'Feature': [group_name for group_name, _ in feature_groups],
+                                   'Importance_Mean': importances.mean(axis=1),
+                                   'Importance_Std': importances.std(axis=1)})
+                     .sort_values(by='Importance_Mean', ascending=False, kind='mergesort')
+                     .reset_index(drop=True))
+    importance_df.insert(1, 'Rank', np.arange(1, importance_df.shape[0] + 1))
+
+    if flist_log_kwargs is not None:
+        group_columns = dict(feature_groups)
+        all_columns = columns if columns is not None else list(range(X_values.shape[1]))
+        ranked_columns = [all_columns[position] for group_name in importance_df.Feature
+                          for position in group_columns[group_name]]
+        log_kwargs = dict(flist_log_kwargs)
+        log_kwargs.setdefault('method', 'Permutation_Importance')
+        feature_list_log(pd.DataFrame(columns=ranked_columns), **log_kwargs)
+    return importance_df
@@ -1,68 +1,243 @@
 import pandas as pd
 import numpy as np
 
-def inverse_sample_weights(df, target_col, weight_col, 
+def inverse_sample_weights(df, target_col, weight_col,
                     new_col_name=None, min_class_weight = .01,
-                    return_df = True):
-    """ Given a target class an column to use to derive training weights, 
+                    return_df = True, inplace = False):
+    """ Given a target class an column to use to derive training weights,
         create a column of weights where the negative class is the inverse
-        of the weights column. 
-        
+        of the weights column.
+
         E.g. weight column of 'Price' would use Price value for positive class
-        (where target == 1) and 1/Price for the negative class. 
+        (where target == 1) and 1/Price for the negative class.
+
+        Use inplace=True to add the column to df instead of a copy of it, or
+        inverse_weight_array to only get the (float32) weights.
     """
-    df_copy = df.copy()
-    pos_class_weights = np.where(df[target_col] == 1 , # Where class is positive
-                                       df[weight_col], # Use this val as weight
-                                       0) # Else 0
-    neg_class_weights_inverse = np.where(df[target_col] == 0 , # Where class is neg
-                                       1/df[weight_col], # Use inverse of this
-                                       0) # Else 0
-    # Handle Edge Case where dividing by 0 results in undefined
-    neg_class_weights_inverse = np.where(neg_class_weights_inverse == np.inf , # Where weight is inf (divided by 0)
-                                       min_class_weight, # Replace with smallest weighting
-                                       neg_class_weights_inverse) # Otherwise keep it
-    # Combine weights
-    combined_weights_inverse = np.where(pos_class_weights == 0, # Where negative classes 
-                                    neg_class_weights_inverse, # Place the inverse as negative weights
-                                    pos_class_weights) # Else keep the positive weights
+    combined_weights_inverse = inverse_weight_array(df[target_col].values, df[weight_col].values,
+                                                    min_class_weight=min_class_weight, dtype=np.float64)
     if not new_col_name:
         new_col_name = 'Sample_Inverse_Weights'
-        
-    df_copy[new_col_name] = combined_weights_inverse
-    
-    if return_df:
-        return df_copy
-    else:
-        return pd.Series(combined_weights_inverse, name=new_col_name)   
-    
-def even_sample_weights(df, target_col, weight_col, 
-                    new_col_name=None, 
-                    return_df = True):
-    """ Given a target class an column to use to derive training weights, 
+    return _weights_output(df, combined_weights_inverse, new_col_name, return_df, inplace)
+
+def even_sample_weights(df, target_col, weight_col,
+                    new_col_name=None,
+                    return_df = True, inplace = False):
+    """ Given a target class an column to use to derive training weights,
         create a column of weights where the negative class is the inverse
-        of the weights column. 
-        
+        of the weights column.
+
         E.g. weight column of 'Price' would use Price value for positive class
-        (where target == 1) and 1/Price for the negative class. 
+        (where target == 1) and 1/Price for the negative class.
+
+        Use inplace=True to add the column to df instead of a copy of it, or
+        even_weight_array to only get the (float32) weights.
     """
-    df_copy = df.copy()
-    pos_class_weights = np.where(df[target_col] == 1 , # Where class is positive
-                                       df[weight_col], # Use this val as weight
-                                       0) # Else 0
-    neg_class_even_weights = np.where(df[target_col] == 0, # Where class is neg
-          (df[target_col] == 0).sum()/(df[target_col] == 0).shape[0] , # Create even weighting
-                                       0) 
-    # Combine weights
-    combined_weights = np.where(pos_class_weights == 0, # Where negative classes 
-                                    neg_class_even_weights, # Place the inverse as negative weights
-                                    pos_class_weights) # Else keep the positive weights
+    combined_weights = even_weight_array(df[target_col].values, df[weight_col].values, dtype=np.float64)
     if not new_col_name:
         new_col_name = 'Sample_Even_Weights'
-        
-    df_copy[new_col_name] = combined_weights
-    
-    if return_df:
-        return df_copy
+    return _weights_output(df, combined_weights, new_col_name, return_df, inplace)
+
+
+def _weights_output(df, weights, new_col_name, return_df, inplace):
+    """ Return the weights as a new column of df (or a copy of it) or as a Series"""
+    if not return_df:
+        return pd.Series(weights, name=new_col_name)
+    if not inplace:
+        df = df.copy()
+    df[new_col_name] = weights
+    return df
+
+
+def inverse_weight_array(target_values, weight_values, min_class_weight=.01, dtype=np.float32, out=None):
+    """ Weights of inverse_sample_weights as an array, written in place into a single
+    output array: weight_values for the positive class (target == 1), 1/weight_values for
+    the negative class (target == 0, min_class_weight where weight_values is 0) and 0 otherwise.
+
+    Parameters
+    ----------
+    target_values: numpy array
+        Binary target values
+    weight_values: numpy array
+        Values used to derive the weights, e.g. Price
+    min_class_weight: float
+        Weight of negative rows with a weight value of 0
+    dtype: numpy dtype
+        dtype of the weights. Default is float32
+    out: numpy array
+        Optional preallocated array of the weights (e.g. a slice of a memmap)
+
+    Returns
+    -------
+    weights: numpy array
+    """
+    weight_values = np.asarray(weight_values)
+    weights = np.zeros(weight_values.shape[0], dtype=dtype) if out is None else out
+    if out is not None:
+        weights[:] = 0
+    is_positive = target_values == 1
+    np.copyto(weights, weight_values, where=is_positive, casting='unsafe')
+    is_negative = target_values == 0
+    np.divide(1, weight_values, out=weights, where=is_negative & (weight_values != 0), casting='unsafe')
+    # Edge case where dividing by 0 is undefined
+    weights[is_negative & (weight_values == 0)] = min_class_weight
+    return weights
+
+
+def even_weight_array(target_values, weight_values, negative_share=None, dtype=np.float32, out=None):
+    """ Weights of even_sample_weights as an array, written in place into a single output
+    array: weight_values for the positive class (target == 1), the share of negative rows
+    for the negative class (target == 0) and 0 otherwise.
+
+    Parameters
+    ----------
+    target_values: numpy array
+        Binary target values
+    weight_values: numpy array
+        Values used to derive the weights of the positive class
+    negative_share: float
+        Share of negative rows. Default is computed from target_values. Pass the share of
+        all the data (see SampleWeightEngine) when weighting chunk by chunk
+    dtype: numpy dtype
+        dtype of the weights. Default is float32
+    out: numpy array
+        Optional preallocated array of the weights
+
+    Returns
+    -------
+    weights: numpy array
+    """
+    weight_values = np.asarray(weight_values)
+    weights = np.zeros(weight_values.shape[0], dtype=dtype) if out is None else out
+    if out is not None:
+        weights[:] = 0
+    is_negative = target_values == 0
+    if negative_share is None:
+        negative_share = is_negative.sum() / max(is_negative.shape[0], 1)
+    np.copyto(weights, weight_values, where=(target_values == 1), casting='unsafe')
+    weights[is_negative] = negative_share
+    return weights
+
+
+def balanced_class_weights(class_counts):
+    """ Weight of every class so that all classes have the same total weight:
+    number of samples / (number of classes * class count). Empty classes get 0"""
+    class_counts = np.asarray(class_counts, dtype=float)
+    n_classes = max((class_counts > 0).sum(), 1)
+    return np.divide(class_counts.sum(), n_classes * class_counts,
+                     out=np.zeros(class_counts.shape[0]), where=class_counts > 0)
+
+
+def class_weight_array(target_values, class_weight='balanced', dtype=np.float32):
+    """ Weight of every row of a (multiclass) target from its class, using a single
+    factorize, bincount of the class counts and gather.
+
+    Parameters
+    ----------
+    target_values: numpy array
+        The target classes
+    class_weight: str/dict
+        'balanced' for balanced_class_weights or a dict of {class: weight}.
+        Classes missing from the dict get weight 1
+    dtype: numpy dtype
+        dtype of the weights. Default is float32
+
+    Returns
+    -------
+    weights: numpy array
+    """
+    codes, classes = pd.factorize(target_values)
+    if class_weight == 'balanced':
+        weights_by_class = balanced_class_weights(np.bincount(codes[codes >= 0], minlength=len(classes)))
     else:
-        return pd.Series(combined_weights, name=new_col_name) 
\ No newline at end of file
+        weights_by_class = np.array([class_weight.get(value, 1) for value in classes], dtype=float)
+    # Missing targets get 0 weight
+    weights_by_class = np.append(weights_by_class, 0).astype(dtype)
+    return weights_by_class[codes]
+
+
+class SampleWeightEngine(object):
+    """ Sample weights for out of core training data. Class counts are accumulated chunk
+    by chunk with partial_fit and every chunk's weights are then computed in one pass as
+    a float32 array, without copying the chunk.
+
+    Methods:
+        'balanced': multiclass balanced class weights
+        'inverse': the weights of inverse_sample_weights
+        'even': the weights of even_sample_weights, with the negative share of all the data
+
+    Example
+    -------
+    engine = SampleWeightEngine('target', method='balanced')
+    for chunk in pd.read_csv(fpath, chunksize=1_000_000):
+        engine.partial_fit(chunk)
+    for chunk in pd.read_csv(fpath, chunksize=1_000_000):
+        model.partial_fit(X, y, sample_weight=engine.weights(chunk))
+    """
+
+    def __init__(self, target_col, method='balanced', weight_col=None, min_class_weight=.01,
+                 dtype=np.float32):
+        """
+        Parameters
+        ----------
+        target_col: str
+            Column name of the target
+        method: str
+            'balanced', 'inverse' or 'even'
+        weight_col: str
+            Column used to derive the weights for 'inverse' and 'even'
+        min_class_weight: float
+            Weight of negative rows with a weight value of 0 for 'inverse'
+        dtype: numpy dtype
+            dtype of the weights. Default is float32
+        """
+        if method not in ['balanced', 'inverse', 'even']:
+            raise ValueError("method must be 'balanced', 'inverse' or 'even'")
+        if method != 'balanced' and weight_col is None:
+            raise ValueError(f"weight_col is required for method '{method}'")
+        self.target_col = target_col
+        self.method = method
+        self.weight_col = weight_col
+        self.min_class_weight = min_class_weight
+        self.dtype = dtype
+        # {class: count} of all the data seen
+        self.class_counts = pd.Series(dtype=np.int64)
+        # Number of rows seen, including rows with a missing target
+        self.n_samples = 0
+
+    def partial_fit(self, df):
+        """ Add the class counts of a chunk of data"""
+        codes, classes = pd.factorize(df[self.target_col].values)
+        chunk_counts = pd.Series(np.bincount(codes[codes >= 0], minlength=len(classes)), index=classes)
+        self.class_counts = self.class_counts.add(chunk_counts, fill_value=0).astype(np.int64)
+        self.n_samples += df.shape[0]
+        return self
+
+    def fit(self, df):
+        self.class_counts = pd.Series(dtype=np.int64)
+        self.n_samples = 0
+        return self.partial_fit(df)
+
+    def class_weights(self):
+        """ Series of the weight of every class seen for the 'balanced' method"""
+        return pd.Series(balanced_class_weights(self.class_counts.values), index=self.class_counts.index)
+
+    def weights(self, df, out=None):
+        """ Weights of the rows of a chunk of data as a single array"""
+        target_values = df[self.target_col].values
+        if self.method == 'inverse':
+            return inverse_weight_array(target_values, df[self.weight_col].values,
+                                        min_class_weight=self.min_class_weight, dtype=self.dtype, out=out)
+        if self.method == 'even':
+            negative_share = self.class_counts.get(0, 0) / max(self.n_samples, 1)
+            return even_weight_array(target_values, df[self.weight_col].values, negative_share=negative_share,
+                                     dtype=self.dtype, out=out)
+        class_weights = self.class_weights()
+        positions = class_weights.index.get_indexer(target_values)
+        # Classes not seen when fitting get 0 weight
+        weights_by_class = np.append(class_weights.values, 0).astype(self.dtype)
+        weights = weights_by_class[positions]
+        if out is not None:
+            out[:] = weights
+            return out
+        return weights
@@ -1,3 +1,6 @@
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import cpu_count
 import sklearn
 import numpy as np
 import pandas as pd
@@ -6,14 +9,16 @@ from sklearn.metrics import confusion_matrix
 from sklearn.metrics import f1_score
 from sklearn.metrics import precision_score
 from sklearn.metrics import recall_score
-from scipy.stats import chisquare
+from scipy import sparse as sp
+from scipy.stats import binom, chi2, chisquare
 from functools import reduce
 import itertools
 import matplotlib.style as style
 import matplotlib.pyplot as plt
 import seaborn as sns
+from .segments import segment_codes
 
-sklearn.warnings.filterwarnings("ignore", category=sklearn.exceptions.UndefinedMetricWarning)
+warnings.filterwarnings("ignore", category=sklearn.exceptions.UndefinedMetricWarning)
 style.use('fivethirtyeight')
 
 
@@ -36,16 +41,472 @@ def chisquare_preds(df, target_col, pred_col):
 def multiclass_metrics(df, target_col, predicted_col):
     """ Compute predicted vs. actual counts, accuracy, and other metrics 
     on a classification predictions and return in a single dataframe"""
-    # Arguments to pass to functions
-    args = [df, target_col, predicted_col]
-    # Compute the metrics using these arguments 
-    dfs_to_concat = [find_predicted_and_actual_instances(*args), 
-                     response_classification_accuracy(*args), 
-                     class_model_metrics(*args)]
-    # Merge the metrics into one dataframe
-    all_metrics_df = reduce(lambda x, y: pd.merge(x, y, on='class'), dfs_to_concat)
-    return all_metrics_df
+    cm, labels = label_confusion_matrix(df[target_col].values, df[predicted_col].values)
+    return confusion_matrix_metrics_df(cm, labels, classes=df[target_col].unique())
+
+
+def label_codes(y_true, y_pred, labels=None):
+    """ Integer codes of the true and predicted labels in a single factorize.
+
+    Parameters
+    ----------
+    y_true: numpy array
+        The actual classes
+    y_pred: numpy array
+        The predicted classes
+    labels: list
+        The label set to code against. Default is the sorted union of the
+        actual and predicted classes. Classes not in labels get -1
+
+    Returns
+    -------
+    true_codes, pred_codes: numpy arrays
+    labels: numpy array
+    """
+    y_true = np.asarray(y_true)
+    y_pred = np.asarray(y_pred)
+    all_values = np.concatenate([y_true, y_pred])
+    if labels is None:
+        codes, uniques = pd.factorize(all_values)
+        # Re-code so that codes follow the sorted labels
+        order = np.argsort(np.asarray(uniques))
+        labels = np.asarray(uniques)[order]
+        ranks = np.empty(len(order), dtype=np.int64)
+        ranks[order] = np.arange(len(order))
+        codes = np.where(codes >= 0, ranks[np.maximum(codes, 0)], -1)
+    else:
+        labels = np.asarray(labels)
+        codes = pd.Index(labels).get_indexer(all_values)
+    return codes[:y_true.shape[0]], codes[y_true.shape[0]:], labels
+
+
+def label_confusion_matrix(y_true, y_pred, labels=None, sparse=False):
+    """ Confusion matrix (rows actual, columns predicted) from a single bincount.
+    Rows with a missing or unknown class are left out.
+
+    Parameters
+    ----------
+    sparse: boolean
+        Flag to return a scipy sparse COO matrix that only stores the observed
+        (actual, predicted) pairs instead of a dense k x k array. Use for very many classes
+
+    Returns
+    -------
+    cm: numpy array or scipy.sparse.coo_matrix
+        int64 matrix of shape (number of labels, number of labels)
+    labels: numpy array
+        The class of each row/column
+    """
+    true_codes, pred_codes, labels = label_codes(y_true, y_pred, labels=labels)
+    n_labels = len(labels)
+    known = (true_codes >= 0) & (pred_codes >= 0)
+    pair_codes = true_codes[known] * n_labels + pred_codes[known]
+    if sparse:
+        pairs, counts = np.unique(pair_codes, return_counts=True)
+        cm = sp.coo_matrix((counts.astype(np.int64), (pairs // n_labels, pairs % n_labels)),
+                           shape=(n_labels, n_labels))
+        return cm, labels
+    cm = np.bincount(pair_codes, minlength=n_labels * n_labels)
+    return cm.reshape(n_labels, n_labels), labels
+
+
+def confusion_matrix_sums(cm, axis):
+    """ Row (axis=1, actual) or column (axis=0, predicted) sums of a dense or sparse
+    confusion matrix as a 1d array"""
+    if sp.issparse(cm):
+        return np.asarray(cm.sum(axis=axis)).ravel()
+    return np.asarray(cm).sum(axis=axis)
+
+
+def most_confused_pairs(cm, labels, top_n=10):
+    """ The top_n (actual, predicted) pairs of different classes with the most
+    misclassifications, from a dense or sparse confusion matrix.
+
+    Returns
+    -------
+    confused_df: Pandas DataFrame
+        DataFrame with columns actual, predicted, count and share_of_actual
+        (count over the number of actual instances of the class)
+    """
+    coo_cm = sp.coo_matrix(cm)
+    off_diagonal = (coo_cm.row != coo_cm.col) & (coo_cm.data > 0)
+    rows, cols, counts = coo_cm.row[off_diagonal], coo_cm.col[off_diagonal], coo_cm.data[off_diagonal]
+    # Partial sort of only the top_n largest counts
+    if counts.shape[0] > top_n:
+        top = np.argpartition(-counts, top_n - 1)[:top_n]
+        rows, cols, counts = rows[top], cols[top], counts[top]
+    order = np.argsort(-counts, kind='mergesort')
+    actual_count = confusion_matrix_sums(coo_cm, axis=1)
+    labels = np.asarray(labels)
+    return pd.DataFrame({'actual': labels[rows[order]],
+                         'predicted': labels[cols[order]],
+                         'count': counts[order],
+                         'share_of_actual': _safe_divide(counts[order], actual_count[rows[order]])})
+
+
+def _safe_divide(numerator, denominator):
+    """ Elementwise division that gives 0 where the denominator is 0"""
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    return np.divide(numerator, denominator, out=np.zeros(np.broadcast(numerator, denominator).shape),
+                     where=denominator != 0)
+
+
+def confusion_matrix_metrics(cm):
+    """ Per class counts and metrics from confusion matrices. Works over any leading
+    axes, so a stack of matrices of shape (..., k, k) gives arrays of shape (..., k).
+    Undefined metrics (no actual or no predicted instances) are 0 like sklearn.
+
+    A scipy sparse matrix (a single k x k matrix) is also accepted.
+
+    Returns
+    -------
+    metrics: dict
+        {'actual_count', 'predicted_count', 'true_positives', 'precision', 'recall', 'f1'}
+    """
+    if sp.issparse(cm):
+        actual_count = confusion_matrix_sums(cm, axis=1)
+        predicted_count = confusion_matrix_sums(cm, axis=0)
+        true_positives = cm.diagonal()
+    else:
+        cm = np.asarray(cm)
+        actual_count = cm.sum(axis=-1)
+        predicted_count = cm.sum(axis=-2)
+        true_positives = np.diagonal(cm, axis1=-2, axis2=-1)
+    return class_count_metrics(actual_count, predicted_count, true_positives)
+
+
+def class_count_metrics(actual_count, predicted_count, true_positives):
+    """ Precision, recall and F1 from the actual, predicted and true positive counts
+    of every class (arrays of any matching shape)"""
+    precision = _safe_divide(true_positives, predicted_count)
+    recall = _safe_divide(true_positives, actual_count)
+    # 2pr/(p+r) == 2tp/(actual+predicted)
+    f1 = _safe_divide(2 * true_positives, np.add(actual_count, predicted_count))
+    return {'actual_count': actual_count,
+            'predicted_count': predicted_count,
+            'true_positives': true_positives,
+            'precision': precision,
+            'recall': recall,
+            'f1': f1}
+
+
+BOOTSTRAP_METRICS = ['precision', 'recall', 'f1']
+
+
+def _bootstrap_resamples(cell_counts, cell_rows, cell_cols, n_labels, n_resamples, method, seed,
+                         class_positions):
+    """ Precision, recall and F1 of n_resamples bootstrap resamples of the nonzero
+    confusion matrix cells. Returns {metric: float32 array (n_resamples, number of classes)}"""
+    rng = np.random.default_rng(seed)
+    n_cells = cell_counts.shape[0]
+    if method == 'poisson':
+        # Every original row gets a Poisson(1) weight, so a cell of n rows gets Poisson(n)
+        draws = rng.poisson(cell_counts, size=(n_resamples, n_cells))
+    else:
+        # Resampling all rows with replacement is a multinomial draw over the cells
+        total = cell_counts.sum()
+        draws = rng.multinomial(total, cell_counts / total, size=n_resamples)
+    draws = draws.astype(np.float64)
+    # Sparse indicators of each cell's actual and predicted class aggregate
+    # all resamples' cells into per class counts with one product each
+    cell_index = np.arange(n_cells)
+    ones = np.ones(n_cells)
+    row_indicator = sp.csr_matrix((ones, (cell_index, cell_rows)), shape=(n_cells, n_labels))
+    col_indicator = sp.csr_matrix((ones, (cell_index, cell_cols)), shape=(n_cells, n_labels))
+    actual_count = np.asarray(row_indicator.T.dot(draws.T)).T[:, class_positions]
+    predicted_count = np.asarray(col_indicator.T.dot(draws.T)).T[:, class_positions]
+    diagonal = cell_rows == cell_cols
+    true_positives = np.zeros((n_resamples, n_labels))
+    true_positives[:, cell_rows[diagonal]] = draws[:, diagonal]
+    metrics = class_count_metrics(actual_count, predicted_count, true_positives[:, class_positions])
+    return {metric: metrics[metric].astype(np.float32) for metric in BOOTSTRAP_METRICS}
+
+
+def bootstrap_class_metrics(cm, labels, classes=None, n_resamples=1000, confidence=0.95,
+                            method='multinomial', chunk_size=100, random_state=None,
+                            parallel=False, ncores=None):
+    """ Bootstrap confidence intervals of per class precision, recall and F1 computed
+    from a (dense or sparse) confusion matrix. Resampling the rows only changes the
+    counts of the confusion matrix cells, so each resample is drawn directly as
+    multinomial (or Poisson) counts over the nonzero cells instead of resampling the data.
+
+    Parameters
+    ----------
+    cm: numpy array/scipy sparse matrix
+        Confusion matrix with actual classes as rows and predicted as columns
+    labels: list
+        The class of each row/column
+    classes: list
+        The classes to report. Default is all labels with actual instances
+    n_resamples: int
+        The number of bootstrap resamples
+    confidence: float
+        The confidence level of the percentile intervals
+    method: str
+        'multinomial' for the classic bootstrap with a fixed number of rows, or
+        'poisson' for independent Poisson(1) row weights
+    chunk_size: int
+        The number of resamples drawn at once
+    random_state: int
+        Seed for reproducible resamples
+    parallel: boolean
+        Flag to draw the chunks of resamples in parallel threads
+    ncores : int
+        Number of threads to use when parallel. Defaults to all cores in cpu minus one.
+
+    Returns
+    -------
+    bootstrap_df: Pandas DataFrame
+        Tidy DataFrame with columns class, metric, estimate, lower and upper
+    """
+    if method not in ['multinomial', 'poisson']:
+        raise ValueError("method must be 'multinomial' or 'poisson'")
+    labels = np.asarray(labels)
+    coo_cm = sp.coo_matrix(cm)
+    nonzero = coo_cm.data > 0
+    cell_rows, cell_cols = coo_cm.row[nonzero], coo_cm.col[nonzero]
+    cell_counts = coo_cm.data[nonzero].astype(np.int64)
+    if classes is None:
+        class_positions = np.flatnonzero(confusion_matrix_sums(coo_cm, axis=1) > 0)
+    else:
+        class_positions = pd.Index(labels).get_indexer(list(classes))
+        class_positions = class_positions[class_positions >= 0]
+
+    # One independent random stream per chunk so results don't depend on threading
+    chunk_sizes = [min(chunk_size, n_resamples - start) for start in range(0, n_resamples, chunk_size)]
+    seeds = np.random.SeedSequence(random_state).spawn(len(chunk_sizes))
+
+    def resample_chunk(chunk):
+        chunk_n_resamples, seed = chunk
+        return _bootstrap_resamples(cell_counts, cell_rows, cell_cols, len(labels), chunk_n_resamples,
+                                    method, seed, class_positions)
+
+    if parallel and len(chunk_sizes) > 1:
+        # If no number of cores to work with, default to max
+        if not ncores:
+            ncores = max(cpu_count() - 1, 1)
+        with ThreadPoolExecutor(max_workers=ncores) as executor:
+            chunk_results = list(executor.map(resample_chunk, zip(chunk_sizes, seeds)))
+    else:
+        chunk_results = [resample_chunk(chunk) for chunk in zip(chunk_sizes, seeds)]
+
+    estimates = confusion_matrix_metrics(cm)
+    alpha = (1 - confidence) / 2
+    metric_dfs = []
+    for metric in BOOTSTRAP_METRICS:
+        resampled = np.concatenate([chunk_result[metric] for chunk_result in chunk_results])
+        lower, upper = np.quantile(resampled, [alpha, 1 - alpha], axis=0)
+        metric_dfs.append(pd.DataFrame({'class': labels[class_positions],
+                                        'metric': metric,
+                                        'estimate': estimates[metric][class_positions],
+                                        'lower': lower,
+                                        'upper': upper}))
+    return (pd.concat(metric_dfs, ignore_index=True)
+            .sort_values(by=['class', 'metric'])
+            .reset_index(drop=True))
+
+
+def confusion_matrix_metrics_df(cm, labels, classes=None):
+    """ Dataframe of per class metrics from a confusion matrix, with the same columns as
+    multiclass_metrics: class, actual_count, predicted_count, classification_accuracy,
+    f1, precision, recall. classification_accuracy is the share of a class's actual
+    instances predicted correctly.
+
+    Parameters
+    ----------
+    cm: numpy array/scipy sparse matrix
+        Confusion matrix with actual classes as rows and predicted as columns
+    labels: list
+        The class of each row/column
+    classes: list
+        The classes to report. Default is all labels with actual instances
+    """
+    metrics = confusion_matrix_metrics(cm)
+    metrics_df = pd.DataFrame({'class': labels,
+                               'actual_count': metrics['actual_count'],
+                               'predicted_count': metrics['predicted_count'],
+                               'classification_accuracy': metrics['recall'],
+                               'f1': metrics['f1'],
+                               'precision': metrics['precision'],
+                               'recall': metrics['recall']})
+    if classes is None:
+        metrics_df = metrics_df[metrics_df.actual_count > 0]
+    else:
+        metrics_df = metrics_df[metrics_df['class'].isin(list(classes))]
+    return metrics_df.sort_values(by='class').reset_index(drop=True)
         
+def segment_confusion_matrices(y_true, y_pred, segments, n_segments, labels=None):
+    """ Confusion matrix of every segment from a single bincount over (segment, true, pred) codes.
+    Rows with a missing segment (-1) or class are left out.
+
+    Parameters
+    ----------
+    y_true: numpy array
+        The actual classes
+    y_pred: numpy array
+        The predicted classes
+    segments: numpy array
+        Integer segment code of every row (see segment_codes)
+    n_segments: int
+        The number of segments
+    labels: list
+        The label set. Default is the sorted union of the actual and predicted classes
+
+    Returns
+    -------
+    cms: numpy array
+        int64 array of shape (number of segments, number of labels, number of labels)
+    labels: numpy array
+        The class of each row/column
+    """
+    true_codes, pred_codes, labels = label_codes(y_true, y_pred, labels=labels)
+    n_labels = len(labels)
+    known = (true_codes >= 0) & (pred_codes >= 0) & (segments >= 0)
+    codes = (segments[known] * n_labels + true_codes[known]) * n_labels + pred_codes[known]
+    cms = np.bincount(codes, minlength=n_segments * n_labels * n_labels)
+    return cms.reshape(n_segments, n_labels, n_labels), labels
+
+
+def sliced_class_metrics(df, target_col, predicted_col, segment_cols):
+    """ Per class metrics of every segment (combination of the values of segment_cols)
+    computed from one grouped bincount instead of a ClassMetrics per filtered frame.
+
+    Parameters
+    ----------
+    df : Pandas DataFrame
+        The dataframe where data resides
+    target_col: str
+        Column name of the actual classes
+    predicted_col: str
+        Column name of the predicted classes
+    segment_cols: str/list
+        The column(s) defining the segments
+
+    Returns
+    -------
+    sliced_df: Pandas DataFrame
+        Tidy DataFrame with the segment_cols followed by the multiclass_metrics columns,
+        with a row for every class with actual instances in each segment
+    """
+    segments, segments_df = segment_codes(df, segment_cols)
+    cms, labels = segment_confusion_matrices(df[target_col].values, df[predicted_col].values,
+                                             segments, segments_df.shape[0])
+    # Metrics of all segments at once over the leading axis
+    metrics = confusion_matrix_metrics(cms)
+    segment_ids, class_ids = np.nonzero(metrics['actual_count'] > 0)
+    sliced_df = pd.DataFrame({'class': labels[class_ids],
+                              'actual_count': metrics['actual_count'][segment_ids, class_ids],
+                              'predicted_count': metrics['predicted_count'][segment_ids, class_ids],
+                              'classification_accuracy': metrics['recall'][segment_ids, class_ids],
+                              'f1': metrics['f1'][segment_ids, class_ids],
+                              'precision': metrics['precision'][segment_ids, class_ids],
+                              'recall': metrics['recall'][segment_ids, class_ids]})
+    return pd.concat([segments_df.iloc[segment_ids].reset_index(drop=True), sliced_df], axis=1)
+
+
+def multi_model_confusion_matrices(y_true, y_preds, labels=None):
+    """ Confusion matrices of several models' predictions of the same target. The target is
+    factorized once and every prediction column is coded against the shared labels and
+    bincounted. Also records which models are correct on every row, as a bit mask, for
+    pairwise McNemar tests.
+
+    Parameters
+    ----------
+    y_true: numpy array
+        The actual classes
+    y_preds: list[numpy array]
+        The predicted classes of every model
+    labels: list
+        The label set. Default is the sorted union of the actual and all predicted classes
+
+    Returns
+    -------
+    cms: numpy array
+        int64 array of shape (number of models, number of labels, number of labels)
+    labels: numpy array
+        The class of each row/column
+    correct_masks: tuple
+        (unique masks, count of rows with each mask) where bit j of a mask is set
+        when model j predicted the row correctly. None with more than 64 models
+    """
+    true_codes, true_uniques = pd.factorize(y_true)
+    pred_factorized = [pd.factorize(y_pred) for y_pred in y_preds]
+    if labels is None:
+        all_uniques = [pd.Index(true_uniques)] + [pd.Index(uniques) for _, uniques in pred_factorized]
+        labels = np.asarray(reduce(lambda x, y: x.union(y), all_uniques).sort_values())
+    labels = np.asarray(labels)
+    label_index = pd.Index(labels)
+    n_labels = len(labels)
+
+    def to_label_codes(codes, uniques):
+        # Map the codes of the column's own uniques to positions in labels
+        unique_positions = label_index.get_indexer(uniques)
+        return np.where(codes >= 0, unique_positions[np.maximum(codes, 0)], -1) if len(uniques) else codes
+
+    true_codes = to_label_codes(true_codes, true_uniques)
+    true_known = true_codes >= 0
+    n_models = len(y_preds)
+    track_masks = n_models <= 64
+    masks = np.zeros(true_codes.shape[0], dtype=np.uint64)
+    cms = np.zeros((n_models, n_labels, n_labels), dtype=np.int64)
+    for model, (pred_codes, pred_uniques) in enumerate(pred_factorized):
+        pred_codes = to_label_codes(pred_codes, pred_uniques)
+        known = true_known & (pred_codes >= 0)
+        cms[model] = np.bincount(true_codes[known] * n_labels + pred_codes[known],
+                                 minlength=n_labels * n_labels).reshape(n_labels, n_labels)
+        if track_masks:
+            correct = known & (pred_codes == true_codes)
+            masks |= correct.astype(np.uint64) << np.uint64(model)
+    correct_masks = np.unique(masks[true_known], return_counts=True) if track_masks else None
+    return cms, labels, correct_masks
+
+
+def mcnemar_tests(correct_masks, model_names):
+    """ Pairwise McNemar tests of whether two models have the same accuracy on the same rows.
+    Uses the exact binomial test when the two models disagree on fewer than 25 rows and the
+    continuity corrected chi square test otherwise.
+
+    Parameters
+    ----------
+    correct_masks: tuple
+        (unique masks, count of rows with each mask) from multi_model_confusion_matrices
+    model_names: list
+        The name of the model of every bit of the masks
+
+    Returns
+    -------
+    mcnemar_df: Pandas DataFrame
+        DataFrame with columns model_a, model_b, a_correct_b_wrong, a_wrong_b_correct,
+        accuracy_a, accuracy_b, statistic and pvalue
+    """
+    unique_masks, mask_counts = correct_masks
+    n_models = len(model_names)
+    # (number of unique masks, number of models) correctness of every mask
+    correct = ((unique_masks[:, np.newaxis] >> np.arange(n_models, dtype=np.uint64)) & np.uint64(1)).astype(float)
+    # Rows where model i is correct and model j is wrong, for all pairs at once
+    discordant = (correct * mask_counts[:, np.newaxis]).T.dot(1 - correct)
+    accuracy = correct.T.dot(mask_counts) / max(mask_counts.sum(), 1)
+    model_a, model_b = np.triu_indices(n_models, k=1)
+    b = discordant[model_a, model_b]
+    c = discordant[model_b, model_a]
+    n_discordant = b + c
+    with np.errstate(divide='ignore', invalid='ignore'):
+        statistic = np.where(n_discordant > 0, (np.abs(b - c) - 1).clip(min=0) ** 2 / n_discordant, 0.0)
+    pvalue = np.where(n_discordant < 25,
+                      np.minimum(1.0, 2 * binom.cdf(np.minimum(b, c), n_discordant, 0.5)),
+                      chi2.sf(statistic, df=1))
+    model_names = np.asarray(model_names)
+    return pd.DataFrame({'model_a': model_names[model_a],
+                         'model_b': model_names[model_b],
+                         'a_correct_b_wrong': b.astype(np.int64),
+                         'a_wrong_b_correct': c.astype(np.int64),
+                         'accuracy_a': accuracy[model_a],
+                         'accuracy_b': accuracy[model_b],
+                         'statistic': statistic,
+                         'pvalue': pvalue})
+
+
 def find_predicted_and_actual_instances(df, target_col, predict_col):
     """
     Look through a target column and predicted columns to find the counts of predicted vs actual
@@ -115,105 +576,279 @@ class ClassMetrics(object):
     """
     Take a dataframe with predictions and compute various metrics
     Plot common metrics and analysis
+
+    The confusion matrix is computed once with a single bincount and every
+    count and metric is derived from it. With very many classes use sparse=True
+    to keep it as a scipy sparse matrix of only the observed (actual, predicted) pairs
+
+    predicted_col can be a list of the prediction columns of several models. Then
+    metrics_df has a model column, mcnemar_tests compares the models pairwise and
+    for_model gives the single model outputs (confusion matrix, plots, ...) of one model
     """
-    def __init__(self, df, target_col, predicted_col):
+    # Names of the prediction columns when comparing several models
+    model_names = None
+
+    def __init__(self, df, target_col, predicted_col, sparse=False):
         self.df = df
         self.y_true = df[target_col].values
         self.y_pred = df[predicted_col].values
         self.target_col = target_col
         self.predicted_col = predicted_col
+        if isinstance(predicted_col, (list, tuple)):
+            if sparse:
+                raise ValueError('sparse is only supported for a single prediction column')
+            self.model_names = list(predicted_col)
+        self.sparse = sparse
         # Class names sorted alphabetically
         self.class_names = sorted(list(df[target_col].unique()))
-        # Multiclass Metrics Df
-        #self.metrics_df = multiclass_metrics(self.df, target_col, predicted_col)
-        # Max of the max response value counts of predictions and actual
-        #self.majority_class_count = self.metrics_df[['actual_count','predicted_count']].max().max()
+        # Computed on first access and cached
+        self._confusion_matrix = None
+        self._labels = None
+        self._metrics_df = None
+        self._correct_masks = None
     
     np.set_printoptions(precision=2)
+
+    def _compute_confusion_matrix(self):
+        if self.model_names:
+            y_preds = [self.df[col].values for col in self.model_names]
+            self._confusion_matrix, self._labels, self._correct_masks = \
+                multi_model_confusion_matrices(self.y_true, y_preds)
+        else:
+            self._confusion_matrix, self._labels = label_confusion_matrix(self.y_true, self.y_pred,
+                                                                          sparse=self.sparse)
+
+    def _check_single_model(self):
+        if self.model_names:
+            raise ValueError('ClassMetrics has several prediction columns, use .for_model(model_name)')
     
     @property
     def confusion_matrix(self):
-        # Confusion matrix from sklearn
-        return sklearn.metrics.confusion_matrix(self.y_true, self.y_pred)
+        """ Confusion matrix with actual classes as rows and predicted classes as columns,
+        both in the order of labels. A scipy sparse matrix if sparse"""
+        self._check_single_model()
+        if self._confusion_matrix is None:
+            self._compute_confusion_matrix()
+        return self._confusion_matrix
+
+    @property
+    def confusion_matrices(self):
+        """ Stack of the confusion matrices of every model, of shape
+        (number of models, number of labels, number of labels)"""
+        if self._confusion_matrix is None:
+            self._compute_confusion_matrix()
+        if self.model_names:
+            return self._confusion_matrix
+        cm = self._confusion_matrix.toarray() if sp.issparse(self._confusion_matrix) else self._confusion_matrix
+        return cm[np.newaxis]
+
+    def for_model(self, model_name):
+        """ ClassMetricsAccumulator with the confusion matrix of one of the prediction columns,
+        giving all single model outputs without recomputing"""
+        if not self.model_names:
+            raise ValueError('for_model needs a list of prediction columns')
+        return ClassMetricsAccumulator.from_confusion_matrix(
+            self.confusion_matrices[self.model_names.index(model_name)], self.labels)
+
+    def mcnemar_tests(self):
+        """ Pairwise McNemar tests between the models, see mcnemar_tests"""
+        if not self.model_names:
+            raise ValueError('mcnemar_tests needs a list of prediction columns')
+        if self._confusion_matrix is None:
+            self._compute_confusion_matrix()
+        if self._correct_masks is None:
+            raise ValueError('mcnemar_tests supports at most 64 models')
+        return mcnemar_tests(self._correct_masks, self.model_names)
+
+    @property
+    def labels(self):
+        """ Sorted union of the actual and predicted classes, the rows/columns of confusion_matrix"""
+        if self._labels is None:
+            self._compute_confusion_matrix()
+        return self._labels
     
     @property
     def metrics_df(self):
-        """ A dataframe of various classification metrics by class"""
-        return multiclass_metrics(self.df, self.target_col, self.predicted_col)
+        """ A dataframe of various classification metrics by class (and model if several)"""
+        if self._metrics_df is None and self.model_names:
+            self._metrics_df = pd.concat([confusion_matrix_metrics_df(cm, self.labels, classes=self.class_names)
+                                          .assign(model=model_name)
+                                          for model_name, cm in zip(self.model_names, self.confusion_matrices)],
+                                         ignore_index=True)
+            self._metrics_df = self._metrics_df[['model'] + [col for col in self._metrics_df.columns
+                                                             if col != 'model']]
+        elif self._metrics_df is None:
+            self._metrics_df = confusion_matrix_metrics_df(self.confusion_matrix, self.labels,
+                                                           classes=self.class_names)
+        # Copy so callers can't modify the cached metrics
+        return self._metrics_df.copy()
     
     @property
     def _majority_class_count(self):
         """ Count of the majority class count"""
-        return self.metrics_df[['actual_count','predicted_count']].max().max()
+        cm = self.confusion_matrix
+        return max(confusion_matrix_sums(cm, axis=1).max(), confusion_matrix_sums(cm, axis=0).max())
     
     @property
     def count_comparison(self):
         """ Dataframe of actual class counts compared to predicted class counts"""
-        return difference_predicted_actual(self.df, self.target_col, self.predicted_col)
+        cm = self.confusion_matrix
+        count_df = pd.DataFrame({'class': self.labels,
+                                 'actual_count': confusion_matrix_sums(cm, axis=1),
+                                 'predicted_count': confusion_matrix_sums(cm, axis=0)})
+        count_df['difference'] = count_df.predicted_count - count_df.actual_count
+        return count_df.sort_values(by='class')
     
     @property
     def chi_square_test(self):
         """ Return the results of runnning a chi square test on the predicted vs. actual class counts"""
-        return chisquare_preds(self.df, self.target_col, self.predicted_col)
+        observed_expected = self.count_comparison
+        # Classes that are only predicted have no expected count
+        observed_expected = observed_expected[observed_expected.actual_count > 0]
+        return chisquare(f_obs=observed_expected.predicted_count, f_exp=observed_expected.actual_count)
+
+    def bootstrap_metrics(self, n_resamples=1000, confidence=0.95, method='multinomial',
+                          random_state=None, parallel=False, ncores=None):
+        """ Bootstrap confidence intervals of the precision, recall and F1 of every class.
+        See bootstrap_class_metrics
+
+        Returns
+        -------
+        bootstrap_df: Pandas DataFrame
+            Tidy DataFrame with columns class, metric, estimate, lower and upper
+        """
+        return bootstrap_class_metrics(self.confusion_matrix, self.labels, classes=self.class_names,
+                                       n_resamples=n_resamples, confidence=confidence, method=method,
+                                       random_state=random_state, parallel=parallel, ncores=ncores)
+
+    def sliced_metrics(self, segment_cols):
+        """ Per class metrics of every segment of segment_cols, see sliced_class_metrics"""
+        if self.model_names:
+            sliced_dfs = [sliced_class_metrics(self.df, self.target_col, model_name, segment_cols)
+                          .assign(model=model_name) for model_name in self.model_names]
+            sliced_df = pd.concat(sliced_dfs, ignore_index=True)
+            return sliced_df[['model'] + [col for col in sliced_df.columns if col != 'model']]
+        return sliced_class_metrics(self.df, self.target_col, self.predicted_col, segment_cols)
+
+    def segment_class_metrics(self, segment_cols):
+        """ ClassMetricsAccumulator of every segment of segment_cols, built from one grouped
+        bincount, so every ClassMetrics output is available per segment.
+
+        Returns
+        -------
+        segment_metrics: dict
+            {segment value (a tuple if several segment_cols): ClassMetricsAccumulator}
+        """
+        self._check_single_model()
+        segments, segments_df = segment_codes(self.df, segment_cols)
+        cms, labels = segment_confusion_matrices(self.y_true, self.y_pred, segments,
+                                                 segments_df.shape[0], labels=self.labels)
+        segment_keys = (segments_df.iloc[:, 0].tolist() if segments_df.shape[1] == 1
+                        else list(segments_df.itertuples(index=False, name=None)))
+        return {segment_key: ClassMetricsAccumulator.from_confusion_matrix(cm, labels)
+                for segment_key, cm in zip(segment_keys, cms)}
+
+    def most_confused_pairs(self, top_n=10):
+        """ Dataframe of the top_n (actual, predicted) class pairs with the most misclassifications"""
+        return most_confused_pairs(self.confusion_matrix, self.labels, top_n=top_n)
+
+    def _top_class_positions(self, max_classes):
+        """ Positions in labels of the max_classes classes with the most actual plus predicted instances"""
+        cm = self.confusion_matrix
+        class_counts = confusion_matrix_sums(cm, axis=1) + confusion_matrix_sums(cm, axis=0)
+        if class_counts.shape[0] <= max_classes:
+            return np.arange(class_counts.shape[0])
+        top = np.argpartition(-class_counts, max_classes - 1)[:max_classes]
+        return np.sort(top)
         
     def plot_confusion_matrix(self,
                           normalize=False,
                           title='Confusion matrix',
-                          cmap=plt.cm.Blues):
+                          cmap=plt.cm.Blues,
+                          max_classes=50,
+                          ax=None,
+                          show=True):
         """
         This function prints and plots the confusion matrix.
         Normalization can be applied by setting `normalize=True`.
+        Only the max_classes most populated classes are plotted, and cells are
+        only annotated when there are at most 30 of them, otherwise the matrix is
+        drawn as a single image.
+        Draws on ax if given (new figure otherwise) and calls plt.show if show.
         """
-        cm = self.confusion_matrix
-        classes=self.class_names
-        if normalize:
-            cm = cm.astype('float') / cm.sum(axis=1)[:, np.newaxis]
-            print("Normalized confusion matrix")
+        positions = self._top_class_positions(max_classes)
+        full_cm = self.confusion_matrix
+        actual_count = confusion_matrix_sums(full_cm, axis=1)[positions]
+        if sp.issparse(full_cm):
+            cm = sp.csr_matrix(full_cm)[positions][:, positions].toarray()
         else:
+            cm = full_cm[np.ix_(positions, positions)]
+        classes=self.labels[positions]
+        if normalize:
+            # Normalized by all actual instances of the class, plotted or not
+            cm = _safe_divide(cm, actual_count[:, np.newaxis])
+            if show:
+                print("Normalized confusion matrix")
+        elif show:
             print('Confusion matrix, without normalization')
 
-        #print(cm)
-        plt.figure(figsize=(12,8))
-        plt.imshow(cm, interpolation='nearest', cmap=cmap)
-        plt.title(title)
-        plt.colorbar()
+        if ax is None:
+            _, ax = plt.subplots(figsize=(12,8))
+        image = ax.imshow(cm, interpolation='nearest', cmap=cmap)
+        ax.set_title(title)
+        ax.figure.colorbar(image, ax=ax)
         tick_marks = np.arange(len(classes))
-        plt.xticks(tick_marks, classes, rotation=45)
-        plt.yticks(tick_marks, classes)
-        plt.figsize=(12,8)
+        ax.set_xticks(tick_marks)
+        ax.set_xticklabels(classes, rotation=45)
+        ax.set_yticks(tick_marks)
+        ax.set_yticklabels(classes)
 
         fmt = '.2f' if normalize else 'd'
         thresh = cm.max() / 2.
-        for i, j in itertools.product(range(cm.shape[0]), range(cm.shape[1])):
-            plt.text(j, i, format(cm[i, j], fmt),
-                     horizontalalignment="center",
-                     color="white" if cm[i, j] > thresh else "black")
+        # Text artists for every cell are too slow and unreadable with many classes
+        if cm.shape[0] <= 30:
+            for i, j in itertools.product(range(cm.shape[0]), range(cm.shape[1])):
+                ax.text(j, i, format(cm[i, j], fmt),
+                        horizontalalignment="center",
+                        color="white" if cm[i, j] > thresh else "black")
 
-        plt.tight_layout()
-        plt.ylabel('True label')
-        plt.xlabel('Predicted label')
-
-        plt.show()
+        ax.set_ylabel('True label')
+        ax.set_xlabel('Predicted label')
+        ax.figure.tight_layout()
+        if show:
+            plt.show()
+        return ax
         
-    def plot_predicted_distribution(self):
-        g = sns.countplot(x=self.y_pred, order=self.class_names)
-        g.set_xticklabels(g.get_xticklabels(), rotation=30)
+    def _class_counts(self, axis):
+        """ Actual (axis=1) or predicted (axis=0) count of every class in class_names"""
+        counts = pd.Series(confusion_matrix_sums(self.confusion_matrix, axis=axis), index=self.labels)
+        return counts.reindex(self.class_names, fill_value=0)
+
+    def _plot_class_counts(self, axis, title, ax=None, show=True):
+        counts = self._class_counts(axis=axis)
+        g = sns.barplot(x=counts.index.tolist(), y=counts.values, order=self.class_names, color='C0', ax=ax)
+        g.set_xticks(np.arange(len(self.class_names)))
+        g.set_xticklabels(self.class_names, rotation=30)
         g.set_ylim(0,1.1*self._majority_class_count)
-        g.set_title('Predicted Distriubtion of Classes')
-        plt.show()
+        g.set_title(title)
+        if show:
+            plt.show()
+        return g
+
+    def plot_predicted_distribution(self, ax=None, show=True):
+        return self._plot_class_counts(axis=0, title='Predicted Distriubtion of Classes', ax=ax, show=show)
     
-    def plot_target_distribution(self):
-        g = sns.countplot(x=self.y_true, order=self.class_names)
-        g.set_xticklabels(g.get_xticklabels(), rotation=30)
-        g.set_ylim(0,1.1*self._majority_class_count)
-        g.set_title('Actual Distriubtion of Classes')
-        plt.show()
+    def plot_target_distribution(self, ax=None, show=True):
+        return self._plot_class_counts(axis=1, title='Actual Distriubtion of Classes', ax=ax, show=show)
     
-    def plot_distributions(self):
-        self.plot_predicted_distribution()
-        self.plot_target_distribution()
+    def plot_distributions(self, axes=None, show=True):
+        """ Plot the predicted and actual class distributions, on the pair of axes if given"""
+        if axes is None:
+            axes = [None, None]
+        self.plot_predicted_distribution(ax=axes[0], show=show)
+        self.plot_target_distribution(ax=axes[1], show=show)
         
-    def plot_class_metrics(self, classes='all', metrics='all'):
+    def plot_class_metrics(self, classes='all', metrics='all', ax=None, show=False):
         """
         Given a data frame with class names and metrics, return a bar chart plotting these
 
@@ -221,16 +856,115 @@ class ClassMetrics(object):
 
         Can specify which classes to chart as well as specific classes
         """
+        metrics_df = self.metrics_df
         if classes=='all':
-            classes=list(self.metrics_df['class'].unique())
-        df = self.metrics_df[self.metrics_df['class'].isin(classes)]
-        df.set_index('class', inplace=True)
+            classes=list(metrics_df['class'].unique())
+        df = metrics_df[metrics_df['class'].isin(classes)].set_index('class')
         df = df.loc[:,  ['classification_accuracy','f1','precision','recall']]
         if metrics != 'all':
             try:
                 df = df.loc[:,  metrics]
             except KeyError:
                 return print("Metrics must be a list combination of 'classification_accuracy','f1','precision','recall'")
-            df.plot(kind='bar', title='Metrics for '+ " ".join(classes), figsize=(12,8), ylim=(0, 1))
+            title = 'Metrics for '+ " ".join(map(str, classes))
+        else:
+            title = 'Metrics for '+ ", ".join(map(str, classes))
+        figsize = None if ax is not None else (12,8)
+        ax = df.plot(kind='bar', title=title, figsize=figsize, ylim=(0, 1), ax=ax)
+        if show:
+            plt.show()
+        return ax
+
+
+class ClassMetricsAccumulator(ClassMetrics):
+    """
+    Streaming version of ClassMetrics over a fixed set of labels. The only state
+    is the confusion matrix, so batches of predictions can be added with update,
+    accumulators from several workers combined with merge, and every ClassMetrics
+    output (metrics_df, count_comparison, chi_square_test, plots) computed without
+    keeping the raw predictions.
+
+    Example
+    -------
+    accumulator = ClassMetricsAccumulator(labels=['cat', 'dog', 'bird'])
+    for batch in batches:
+        accumulator.update(batch['target'], batch['predicted'])
+    accumulator.merge(other_worker_accumulator)
+    accumulator.metrics_df
+    """
+    def __init__(self, labels, sparse=False):
+        """
+        Parameters
+        ----------
+        labels: list
+            All the classes that can be actual or predicted. Fixes the order
+            of the rows/columns of the confusion matrix
+        sparse: boolean
+            Flag to keep the confusion matrix as a scipy sparse CSR matrix
+        """
+        self._labels = np.asarray(labels)
+        if pd.Index(self._labels).has_duplicates:
+            raise ValueError('labels must be unique')
+        self.sparse = sparse
+        n_labels = len(self._labels)
+        if sparse:
+            self._confusion_matrix = sp.csr_matrix((n_labels, n_labels), dtype=np.int64)
+        else:
+            self._confusion_matrix = np.zeros((n_labels, n_labels), dtype=np.int64)
+        self._metrics_df = None
+
+    def _add(self, cm):
+        """ Add a dense or sparse confusion matrix to the state"""
+        if self.sparse:
+            self._confusion_matrix = (self._confusion_matrix + sp.csr_matrix(cm)).tocsr()
+        elif sp.issparse(cm):
+            self._confusion_matrix += cm.toarray()
         else:
-            df.plot(kind='bar', title='Metrics for '+ ", ".join(classes), figsize=(12,8), ylim=(0, 1)) 
\ No newline at end of file
+            self._confusion_matrix += np.asarray(cm, dtype=np.int64)
+        self._metrics_df = None
+
+    @classmethod
+    def from_confusion_matrix(cls, cm, labels):
+        """ Accumulator starting from an existing (dense or sparse) confusion matrix with
+        actual classes as rows and predicted classes as columns, both in the order of labels"""
+        accumulator = cls(labels, sparse=sp.issparse(cm))
+        if not sp.issparse(cm):
+            cm = np.asarray(cm, dtype=np.int64)
+        if cm.shape != accumulator._confusion_matrix.shape:
+            raise ValueError(f'Confusion matrix of shape {cm.shape} does not match {len(labels)} labels')
+        accumulator._add(cm)
+        return accumulator
+
+    @property
+    def class_names(self):
+        """ Classes with actual instances, sorted alphabetically"""
+        actual_count = confusion_matrix_sums(self._confusion_matrix, axis=1)
+        return sorted(self._labels[actual_count > 0].tolist())
+
+    def update(self, y_true, y_pred):
+        """ Add a batch of actual and predicted classes. Rows with a missing class are skipped"""
+        true_codes, pred_codes, _ = label_codes(y_true, y_pred, labels=self._labels)
+        unknown = ((true_codes < 0) & pd.notnull(y_true)) | ((pred_codes < 0) & pd.notnull(y_pred))
+        if unknown.any():
+            unknown_classes = set(np.asarray(y_true)[(true_codes < 0) & pd.notnull(y_true)]) | \
+                              set(np.asarray(y_pred)[(pred_codes < 0) & pd.notnull(y_pred)])
+            raise ValueError(f'Classes not in labels: {sorted(map(str, unknown_classes))}')
+        cm, _ = label_confusion_matrix(y_true, y_pred, labels=self._labels, sparse=self.sparse)
+        self._add(cm)
+        return self
+
+    def sliced_metrics(self, segment_cols):
+        raise ValueError('A ClassMetricsAccumulator only holds the confusion matrix counts, not the rows '
+                         'to slice by segment_cols. Use ClassMetrics(df, ...).sliced_metrics')
+
+    def segment_class_metrics(self, segment_cols):
+        raise ValueError('A ClassMetricsAccumulator only holds the confusion matrix counts, not the rows '
+                         'to segment by segment_cols. Keep one accumulator per segment or use '
+                         'ClassMetrics(df, ...).segment_class_metrics')
+
+    def merge(self, other):
+        """ Add the confusion matrix of another accumulator over the same labels"""
+        if not np.array_equal(self._labels, other.labels):
+            raise ValueError('Can only merge accumulators with the same labels')
+        self._add(other.confusion_matrix)
+        return self
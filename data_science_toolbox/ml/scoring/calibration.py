@@ -0,0 +1,182 @@
+import numpy as np
+import pandas as pd
+import matplotlib.style as style
+import matplotlib.pyplot as plt
+from .segments import segment_codes
+
+style.use('fivethirtyeight')
+
+
+def calibration_bin_edges(y_prob, n_bins=10, strategy='uniform'):
+    """ Edges of the probability bins, from 0 to 1
+
+    Parameters
+    ----------
+    y_prob: numpy array
+        The predicted probabilities of the positive class
+    n_bins: int
+        The number of bins
+    strategy: str
+        'uniform' for equal width bins or 'quantile' for (at most n_bins) equal frequency bins
+    """
+    if strategy == 'uniform':
+        return np.linspace(0, 1, n_bins + 1)
+    if strategy == 'quantile':
+        edges = np.quantile(y_prob, np.linspace(0, 1, n_bins + 1))
+        edges[0], edges[-1] = 0, 1
+        return np.unique(edges)
+    raise ValueError("strategy must be 'uniform' or 'quantile'")
+
+
+def calibration_bin_codes(y_prob, edges):
+    """ Bin of every probability. Bin i holds [edges[i], edges[i+1]), the last bin includes 1"""
+    return np.searchsorted(edges[1:-1], y_prob, side='right')
+
+
+def calibration_stats(y_true, y_prob, sample_weight=None, segments=None, n_bins=10, strategy='uniform',
+                      pos_label=1, eps=1e-15):
+    """ Calibration curve and proper scoring rules in one vectorized pass: every row gets a
+    (segment, bin) code and the weights, predicted probabilities, outcomes, squared errors
+    and log losses are summed per code with bincount.
+
+    Parameters
+    ----------
+    y_true: numpy array
+        The actual classes
+    y_prob: numpy array
+        The predicted probabilities of the positive class
+    sample_weight: numpy array
+        Weight of every row. Default is 1 for every row
+    segments: numpy array
+        Integer segment code of every row (see segment_codes). Rows with -1 are left out.
+        Default is a single segment
+    n_bins: int
+        The number of probability bins
+    strategy: str
+        'uniform' for equal width bins or 'quantile' for equal frequency bins
+        (edges from all rows, shared by every segment)
+    pos_label: int/str
+        The class of y_true that is the positive class
+    eps: float
+        Probabilities are clipped to [eps, 1 - eps] for the log loss
+
+    Returns
+    -------
+    curve_df: Pandas DataFrame
+        Non empty bins of every segment with columns segment, bin, bin_lower, bin_upper,
+        weight, mean_predicted and fraction_positive
+    scores_df: Pandas DataFrame
+        Every segment's weight, mean_predicted, fraction_positive, brier_score, log_loss
+        and expected_calibration_error
+    """
+    outcomes = (np.asarray(y_true) == pos_label).astype(float)
+    y_prob = np.asarray(y_prob, dtype=float)
+    weights = np.ones(y_prob.shape[0]) if sample_weight is None else np.asarray(sample_weight, dtype=float)
+    if segments is None:
+        segments = np.zeros(y_prob.shape[0], dtype=np.int64)
+    keep = segments >= 0
+    outcomes, y_prob, weights, segments = outcomes[keep], y_prob[keep], weights[keep], segments[keep]
+    n_segments = int(segments.max()) + 1 if segments.shape[0] else 0
+
+    edges = calibration_bin_edges(y_prob, n_bins=n_bins, strategy=strategy)
+    n_edge_bins = edges.shape[0] - 1
+    codes = segments * n_edge_bins + calibration_bin_codes(y_prob, edges)
+    n_codes = n_segments * n_edge_bins
+
+    clipped = np.clip(y_prob, eps, 1 - eps)
+    row_log_loss = -(outcomes * np.log(clipped) + (1 - outcomes) * np.log(1 - clipped))
+    sums = {name: np.bincount(codes, weights=values * weights, minlength=n_codes).reshape(n_segments, n_edge_bins)
+            for name, values in [('weight', np.ones(y_prob.shape[0])),
+                                 ('predicted', y_prob),
+                                 ('positive', outcomes),
+                                 ('squared_error', (y_prob - outcomes) ** 2),
+                                 ('log_loss', row_log_loss)]}
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bin_mean_predicted = sums['predicted'] / sums['weight']
+        bin_fraction_positive = sums['positive'] / sums['weight']
+        segment_weight = sums['weight'].sum(axis=1)
+        calibration_gap = np.nansum(np.abs(bin_mean_predicted - bin_fraction_positive) * sums['weight'], axis=1)
+        scores_df = pd.DataFrame({'segment': np.arange(n_segments),
+                                  'weight': segment_weight,
+                                  'mean_predicted': sums['predicted'].sum(axis=1) / segment_weight,
+                                  'fraction_positive': sums['positive'].sum(axis=1) / segment_weight,
+                                  'brier_score': sums['squared_error'].sum(axis=1) / segment_weight,
+                                  'log_loss': sums['log_loss'].sum(axis=1) / segment_weight,
+                                  'expected_calibration_error': calibration_gap / segment_weight})
+
+    segment_ids, bin_ids = np.nonzero(sums['weight'] > 0)
+    curve_df = pd.DataFrame({'segment': segment_ids,
+                             'bin': bin_ids,
+                             'bin_lower': edges[bin_ids],
+                             'bin_upper': edges[bin_ids + 1],
+                             'weight': sums['weight'][segment_ids, bin_ids],
+                             'mean_predicted': bin_mean_predicted[segment_ids, bin_ids],
+                             'fraction_positive': bin_fraction_positive[segment_ids, bin_ids]})
+    return curve_df, scores_df
+
+
+def brier_score(y_true, y_prob, sample_weight=None, pos_label=1):
+    """ Weighted mean squared error of the predicted probabilities of the positive class"""
+    outcomes = (np.asarray(y_true) == pos_label).astype(float)
+    return float(np.average((np.asarray(y_prob, dtype=float) - outcomes) ** 2, weights=sample_weight))
+
+
+def log_loss(y_true, y_prob, sample_weight=None, pos_label=1, eps=1e-15):
+    """ Weighted mean negative log likelihood of the predicted probabilities of the positive class"""
+    outcomes = (np.asarray(y_true) == pos_label).astype(float)
+    clipped = np.clip(np.asarray(y_prob, dtype=float), eps, 1 - eps)
+    return float(np.average(-(outcomes * np.log(clipped) + (1 - outcomes) * np.log(1 - clipped)),
+                            weights=sample_weight))
+
+
+class CalibrationMetrics(object):
+    """
+    Take a dataframe with probabilities of the positive class and compute calibration
+    curves, Brier score, log loss and expected calibration error, overall or by segment
+
+    Example
+    -------
+    calibration = CalibrationMetrics(df, 'churned', 'churn_probability', segment_cols=['region'])
+    calibration.scores_df
+    calibration.plot_calibration_curve()
+    """
+    def __init__(self, df, target_col, prob_col, weight_col=None, segment_cols=None, n_bins=10,
+                 strategy='uniform', pos_label=1):
+        self.target_col = target_col
+        self.prob_col = prob_col
+        self.weight_col = weight_col
+        self.segment_cols = [segment_cols] if isinstance(segment_cols, str) else segment_cols
+        self.n_bins = n_bins
+        self.strategy = strategy
+        sample_weight = df[weight_col].values if weight_col else None
+        if self.segment_cols:
+            segments, segments_df = segment_codes(df, self.segment_cols)
+        else:
+            segments, segments_df = None, pd.DataFrame(index=[0])
+        curve_df, scores_df = calibration_stats(df[target_col].values, df[prob_col].values,
+                                                sample_weight=sample_weight, segments=segments,
+                                                n_bins=n_bins, strategy=strategy, pos_label=pos_label)
+        # Replace segment codes with the segment values
+        self.curve_df = self._with_segment_values(curve_df, segments_df)
+        self.scores_df = self._with_segment_values(scores_df, segments_df)
+
+    def _with_segment_values(self, stats_df, segments_df):
+        if not self.segment_cols:
+            return stats_df.drop(columns='segment')
+        segment_values = segments_df.iloc[stats_df.segment.values].reset_index(drop=True)
+        return pd.concat([segment_values, stats_df.drop(columns='segment')], axis=1)
+
+    def plot_calibration_curve(self, title='Calibration Curve'):
+        plt.figure(figsize=(12, 8))
+        plt.plot([0, 1], [0, 1], linestyle='--', color='grey', label='Perfectly calibrated')
+        if self.segment_cols:
+            for segment, segment_df in self.curve_df.groupby(self.segment_cols):
+                plt.plot(segment_df.mean_predicted, segment_df.fraction_positive, marker='o', label=str(segment))
+        else:
+            plt.plot(self.curve_df.mean_predicted, self.curve_df.fraction_positive, marker='o', label=self.prob_col)
+        plt.xlabel('Mean Predicted Probability')
+        plt.ylabel('Fraction of Positives')
+        plt.title(title)
+        plt.legend(loc='upper left')
+        plt.show()
@@ -0,0 +1,122 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import cpu_count
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from .ClassMetrics import ClassMetrics, ClassMetricsAccumulator
+
+PLOTS = ['confusion_matrix', 'distributions', 'class_metrics']
+
+
+def _new_figure(nrows=1, ncols=1, figsize=(12, 8)):
+    """ Figure drawn off screen with the Agg canvas, independent of pyplot's global state"""
+    figure = Figure(figsize=figsize)
+    FigureCanvasAgg(figure)
+    axes = figure.subplots(nrows, ncols)
+    return figure, axes
+
+
+def render_class_metrics(class_metrics, output_dir, name, plots=None, formats=('png',), max_classes=50,
+                         normalize=False, dpi=100):
+    """ Draw the plots of a ClassMetrics off screen and save them as files
+
+    Parameters
+    ----------
+    class_metrics: ClassMetrics/ClassMetricsAccumulator
+        The metrics to plot
+    output_dir: str
+        Directory where the files are written
+    name: str
+        Prefix of the file names, e.g. the model name. Files are named {name}_{plot}.{format}
+    plots: list
+        The plots to draw out of 'confusion_matrix', 'distributions' and 'class_metrics'.
+        Default is all
+    formats: list
+        File formats to save, e.g. ['png', 'svg']
+    max_classes: int
+        The number of most populated classes shown in the confusion matrix
+    normalize: boolean
+        Flag to normalize the confusion matrix by the actual class counts
+    dpi: int
+        Resolution of raster formats
+
+    Returns
+    -------
+    fpaths: list
+        The paths of the written files
+    """
+    plots = PLOTS if plots is None else plots
+    os.makedirs(output_dir, exist_ok=True)
+    fpaths = []
+    for plot in plots:
+        if plot == 'confusion_matrix':
+            figure, ax = _new_figure()
+            class_metrics.plot_confusion_matrix(normalize=normalize, max_classes=max_classes, ax=ax, show=False)
+        elif plot == 'distributions':
+            figure, axes = _new_figure(nrows=2, figsize=(12, 12))
+            class_metrics.plot_distributions(axes=axes, show=False)
+            figure.tight_layout()
+        elif plot == 'class_metrics':
+            figure, ax = _new_figure()
+            class_metrics.plot_class_metrics(ax=ax, show=False)
+            figure.tight_layout()
+        else:
+            raise ValueError(f'plots must be a list combination of {PLOTS}')
+        for fmt in formats:
+            fpath = os.path.join(output_dir, f'{name}_{plot}.{fmt}')
+            figure.savefig(fpath, format=fmt, dpi=dpi)
+            fpaths.append(fpath)
+    return fpaths
+
+
+def _render_job(job):
+    name, class_metrics, output_dir, render_kwargs = job
+    return name, render_class_metrics(class_metrics, output_dir, name, **render_kwargs)
+
+
+def batch_render_class_metrics(models, output_dir, plots=None, formats=('png',), max_classes=50,
+                               normalize=False, dpi=100, ncores=None):
+    """ Render the plots of many models into files in parallel processes.
+
+    Each model's confusion matrix and metrics_df are computed once in this process and
+    only that compact state (not the predictions) is sent to the workers, which draw
+    with the Agg backend and never open a window.
+
+    Example
+    -------
+    models = {col: ClassMetrics(df, 'target', col) for col in prediction_cols}
+    batch_render_class_metrics(models, 'reports/nightly', formats=['png', 'svg'])
+
+    Parameters
+    ----------
+    models: dict
+        {model name: ClassMetrics or ClassMetricsAccumulator}
+    output_dir: str
+        Directory where the files are written
+    plots, formats, max_classes, normalize, dpi:
+        See render_class_metrics
+    ncores : int
+        Number of processes to use. Defaults to all cores in cpu minus one.
+
+    Returns
+    -------
+    fpaths: dict
+        {model name: list of the paths of its files}
+    """
+    render_kwargs = {'plots': plots, 'formats': formats, 'max_classes': max_classes,
+                     'normalize': normalize, 'dpi': dpi}
+    jobs = []
+    for name, class_metrics in models.items():
+        # Compact, picklable state with the metrics computed once
+        accumulator = ClassMetricsAccumulator.from_confusion_matrix(class_metrics.confusion_matrix,
+                                                                    class_metrics.labels)
+        accumulator._metrics_df = class_metrics.metrics_df
+        jobs.append((name, accumulator, output_dir, render_kwargs))
+
+    # If no number of cores to work with, default to max
+    if not ncores:
+        ncores = max(cpu_count() - 1, 1)
+    if ncores == 1 or len(jobs) == 1:
+        return dict(_render_job(job) for job in jobs)
+    with ProcessPoolExecutor(max_workers=ncores) as executor:
+        return dict(executor.map(_render_job, jobs))
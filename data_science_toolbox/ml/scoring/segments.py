@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+
+def segment_codes(df, segment_cols):
+    """ Integer code of the segment (combination of the values of segment_cols) of every row.
+    Each column is factorized once and the column codes are combined arithmetically.
+    Rows with a missing segment value get -1.
+
+    Parameters
+    ----------
+    df : Pandas DataFrame
+        The dataframe where data resides
+    segment_cols: str/list
+        The column(s) defining the segments
+
+    Returns
+    -------
+    codes: numpy array
+        The segment code of every row
+    segments_df: Pandas DataFrame
+        The values of segment_cols of each segment code, sorted
+    """
+    if isinstance(segment_cols, str):
+        segment_cols = [segment_cols]
+    column_codes, column_uniques = [], []
+    for col in segment_cols:
+        codes, uniques = pd.factorize(df[col], sort=True)
+        column_codes.append(codes)
+        column_uniques.append(uniques)
+    present = np.logical_and.reduce([codes >= 0 for codes in column_codes])
+    dims = [max(len(uniques), 1) for uniques in column_uniques]
+    combined = np.ravel_multi_index([codes[present] for codes in column_codes], dims)
+    # Only keep the combinations that occur
+    unique_combined, inverse = np.unique(combined, return_inverse=True)
+    codes = np.full(present.shape[0], -1, dtype=np.int64)
+    codes[present] = inverse
+    unique_positions = np.unravel_index(unique_combined, dims)
+    segments_df = pd.DataFrame({col: np.asarray(uniques)[positions]
+                                for col, uniques, positions in zip(segment_cols, column_uniques, unique_positions)},
+                               columns=segment_cols)
+    return codes, segments_df
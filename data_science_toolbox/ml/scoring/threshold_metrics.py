@@ -0,0 +1,216 @@
+import numpy as np
+import pandas as pd
+import matplotlib.style as style
+import matplotlib.pyplot as plt
+from .ClassMetrics import _safe_divide
+
+style.use('fivethirtyeight')
+
+
+def threshold_counts(y_true, y_score, sample_weight=None, pos_label=1):
+    """ Weighted true and false positive counts at every distinct score threshold from a
+    single sort of the scores. A row is predicted positive when its score >= threshold.
+
+    Parameters
+    ----------
+    y_true: numpy array
+        The actual classes
+    y_score: numpy array
+        The scores/probabilities of the positive class
+    sample_weight: numpy array
+        Weight of every row. Default is 1 for every row
+    pos_label: int/str
+        The class of y_true that is the positive class
+
+    Returns
+    -------
+    thresholds: numpy array
+        The distinct scores in decreasing order
+    tps, fps: numpy arrays
+        Weighted true and false positives at each threshold
+    """
+    y_true = np.asarray(y_true) == pos_label
+    y_score = np.asarray(y_score, dtype=float)
+    if sample_weight is None:
+        sample_weight = np.ones(y_score.shape[0])
+    sample_weight = np.asarray(sample_weight, dtype=float)
+    # Stable sort on decreasing scores
+    order = np.argsort(-y_score, kind='mergesort')
+    y_score = y_score[order]
+    positive_weights = y_true[order] * sample_weight[order]
+    # Last row of every run of equal scores
+    threshold_ends = np.r_[np.flatnonzero(np.diff(y_score)), y_score.shape[0] - 1]
+    tps = np.cumsum(positive_weights)[threshold_ends]
+    fps = np.cumsum(sample_weight[order])[threshold_ends] - tps
+    return y_score[threshold_ends], tps, fps
+
+
+def threshold_sweep(y_true, y_score, sample_weight=None, pos_label=1):
+    """ Classification metrics at every distinct score threshold, computed from one
+    sort based pass instead of re-scoring the predictions once per threshold.
+
+    Parameters
+    ----------
+    y_true: numpy array
+        The actual classes
+    y_score: numpy array
+        The scores/probabilities of the positive class
+    sample_weight: numpy array
+        Weight of every row. Default is 1 for every row
+    pos_label: int/str
+        The class of y_true that is the positive class
+
+    Returns
+    -------
+    sweep_df: Pandas DataFrame
+        DataFrame with one row per threshold (decreasing) and columns threshold,
+        tp, fp, fn, tn, tpr, fpr, precision, recall, f1, accuracy, specificity,
+        youden, predicted_positive_rate, gain and lift
+    """
+    thresholds, tps, fps = threshold_counts(y_true, y_score, sample_weight=sample_weight,
+                                            pos_label=pos_label)
+    total_positives = tps[-1]
+    total_negatives = fps[-1]
+    total = total_positives + total_negatives
+    fns = total_positives - tps
+    tns = total_negatives - fps
+    tpr = _safe_divide(tps, total_positives)
+    fpr = _safe_divide(fps, total_negatives)
+    precision = _safe_divide(tps, tps + fps)
+    predicted_positive_rate = _safe_divide(tps + fps, total)
+    sweep_df = pd.DataFrame({'threshold': thresholds,
+                             'tp': tps,
+                             'fp': fps,
+                             'fn': fns,
+                             'tn': tns,
+                             'tpr': tpr,
+                             'fpr': fpr,
+                             'precision': precision,
+                             'recall': tpr,
+                             'f1': _safe_divide(2 * tps, 2 * tps + fps + fns),
+                             'accuracy': _safe_divide(tps + tns, total),
+                             'specificity': 1 - fpr,
+                             'youden': tpr - fpr,
+                             'predicted_positive_rate': predicted_positive_rate,
+                             # Share of all positives captured in the top scored rows
+                             'gain': tpr,
+                             # Precision of the top scored rows over the base rate
+                             'lift': _safe_divide(precision, _safe_divide(total_positives, total))})
+    return sweep_df
+
+
+def roc_auc_from_sweep(sweep_df):
+    """ Area under the ROC curve (trapezoidal rule) of a threshold sweep"""
+    fpr = np.r_[0, sweep_df.fpr.values]
+    tpr = np.r_[0, sweep_df.tpr.values]
+    return float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+
+
+def average_precision_from_sweep(sweep_df):
+    """ Average precision (step-wise area under the precision recall curve) of a threshold sweep"""
+    recall = np.r_[0, sweep_df.recall.values]
+    return float(np.sum(np.diff(recall) * sweep_df.precision.values))
+
+
+def optimal_threshold(sweep_df, metric='f1'):
+    """ Row of a threshold sweep with the best value of a metric
+
+    Parameters
+    ----------
+    sweep_df: Pandas DataFrame
+        Output of threshold_sweep
+    metric: str
+        Any column of sweep_df to maximize, e.g. 'f1', 'youden' (tpr - fpr) or 'accuracy'
+
+    Returns
+    -------
+    best: Pandas Series
+        The sweep row with the highest metric (the highest threshold on ties)
+    """
+    if metric not in sweep_df.columns:
+        raise ValueError(f'metric must be one of {sweep_df.columns.values.tolist()}')
+    return sweep_df.loc[sweep_df[metric].idxmax()]
+
+
+class ThresholdMetrics(object):
+    """
+    Take a dataframe with scores of the positive class and compute ROC, precision
+    recall and lift/gain curves and the metrics at every threshold from one sort
+
+    Example
+    -------
+    threshold_metrics = ThresholdMetrics(df, 'churned', 'churn_probability')
+    threshold_metrics.roc_auc
+    threshold_metrics.optimal_threshold(metric='f1')
+    threshold_metrics.plot_roc_curve()
+    """
+    def __init__(self, df, target_col, score_col, weight_col=None, pos_label=1):
+        self.target_col = target_col
+        self.score_col = score_col
+        self.weight_col = weight_col
+        self.pos_label = pos_label
+        sample_weight = df[weight_col].values if weight_col else None
+        self.sweep_df = threshold_sweep(df[target_col].values, df[score_col].values,
+                                        sample_weight=sample_weight, pos_label=pos_label)
+
+    @property
+    def roc_auc(self):
+        """ Area under the ROC curve"""
+        return roc_auc_from_sweep(self.sweep_df)
+
+    @property
+    def average_precision(self):
+        """ Average precision, the area under the precision recall curve"""
+        return average_precision_from_sweep(self.sweep_df)
+
+    def optimal_threshold(self, metric='f1'):
+        """ Threshold sweep row with the best value of metric, see optimal_threshold"""
+        return optimal_threshold(self.sweep_df, metric=metric)
+
+    def metrics_at_threshold(self, threshold):
+        """ Metrics when rows with score >= threshold are predicted positive"""
+        # Sweep thresholds are decreasing, the last one >= threshold has the same predictions
+        above = self.sweep_df[self.sweep_df.threshold >= threshold]
+        if above.empty:
+            raise ValueError(f'No scores are >= {threshold}')
+        return above.iloc[-1]
+
+    def plot_roc_curve(self, title='ROC Curve'):
+        plt.figure(figsize=(12, 8))
+        plt.plot(np.r_[0, self.sweep_df.fpr.values], np.r_[0, self.sweep_df.tpr.values],
+                 label=f'AUC = {self.roc_auc:.3f}')
+        plt.plot([0, 1], [0, 1], linestyle='--', color='grey')
+        plt.xlabel('False Positive Rate')
+        plt.ylabel('True Positive Rate')
+        plt.title(title)
+        plt.legend(loc='lower right')
+        plt.show()
+
+    def plot_precision_recall_curve(self, title='Precision Recall Curve'):
+        plt.figure(figsize=(12, 8))
+        plt.step(self.sweep_df.recall, self.sweep_df.precision, where='post',
+                 label=f'AP = {self.average_precision:.3f}')
+        plt.xlabel('Recall')
+        plt.ylabel('Precision')
+        plt.ylim(0, 1.05)
+        plt.title(title)
+        plt.legend(loc='lower left')
+        plt.show()
+
+    def plot_gain_curve(self, title='Cumulative Gain'):
+        plt.figure(figsize=(12, 8))
+        plt.plot(np.r_[0, self.sweep_df.predicted_positive_rate.values], np.r_[0, self.sweep_df.gain.values])
+        plt.plot([0, 1], [0, 1], linestyle='--', color='grey')
+        plt.xlabel('Share of Population Targeted')
+        plt.ylabel('Share of Positives Captured')
+        plt.title(title)
+        plt.show()
+
+    def plot_lift_curve(self, title='Lift'):
+        plt.figure(figsize=(12, 8))
+        plt.plot(self.sweep_df.predicted_positive_rate, self.sweep_df.lift)
+        plt.axhline(1, linestyle='--', color='grey')
+        plt.xlabel('Share of Population Targeted')
+        plt.ylabel('Lift')
+        plt.title(title)
+        plt.show()
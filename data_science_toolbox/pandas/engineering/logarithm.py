@@ -42,3 +42,37 @@ def log_plus_constant(df, data=None, constant=1, new_col_name=None, return_df=Fa
         return df_copy
     else:
         return df_copy[new_col_name]
+
+
+def positive_domain_offsets(df, columns=None):
+    """ Compute the constant to add to each column so that its minimum is at least 1
+    and the natural log of the column is defined everywhere. Columns that are already
+    strictly positive get an offset of 0.
+
+    Parameters
+    ----------
+    df : Pandas DataFrame
+        A dataframe containing the numeric data to shift
+    columns: list
+        A list of the columns to compute offsets for. Default is all columns
+
+    Returns
+    ----------
+    offsets: Pandas Series
+        A series indexed by column name with the constant to add to each column
+
+    Example
+    ---------
+    positive_domain_offsets(pd.DataFrame({'a': [-3, 0, 5], 'b': [0, 1, 2], 'c': [2, 3, 4]}))
+
+    >>> a    4.0
+        b    1.0
+        c    0.0
+    """
+    if columns is None:
+        columns = df.columns.values.tolist()
+    # Column minimums (NaNs are skipped, all NaN columns have a NaN minimum)
+    column_mins = df[columns].min().astype(float)
+    # Shift non positive columns so their minimum becomes 1
+    offsets = np.where(column_mins <= 0, 1 - column_mins, 0.0)
+    return pd.Series(offsets, index=column_mins.index)
@@ -0,0 +1,160 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse as sp
+
+# Number of set bits of every possible byte
+_POPCOUNT_TABLE = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.uint8)
+
+
+def _popcount(words, axis=-1):
+    """ Number of set bits in an array of uint64 words, summed along axis"""
+    bit_counts = _POPCOUNT_TABLE[words.view(np.uint8)]
+    bit_counts = bit_counts.reshape(words.shape[:-1] + (words.shape[-1] * 8,))
+    return bit_counts.sum(axis=axis, dtype=np.int64)
+
+
+class PackedBoolBlock(object):
+    """ A block of boolean (one hot) columns stored as packed bits.
+
+    Each column is packed with np.packbits into uint64 words, one bit per row, so
+    the block takes 64x less memory than int64 0/1 columns. any/all/count over columns
+    run directly on the packed words with bitwise operations.
+
+    Example
+    -------
+    block = PackedBoolBlock.from_frame(one_hot_df)
+    block.nbytes, one_hot_df.memory_usage().sum()
+    block.any(['flag1', 'flag2'])         # row wise OR as a boolean array
+    block.count()                        # number of 1s in each column
+    df_group_one_hot(block, ['flag1', 'flag2'], how='all')
+    """
+
+    def __init__(self, words, n_rows, columns, index=None):
+        """
+        Parameters
+        ----------
+        words: numpy array
+            uint64 array of shape (number of columns, number of words) with the packed
+            bits of each column (bit i of the column is row i, little endian)
+        n_rows: int
+            The number of rows in the block
+        columns: list
+            The name of each column
+        index: Pandas Index
+            The row index. Default is a RangeIndex
+        """
+        self.words = words
+        self.n_rows = n_rows
+        self.columns = pd.Index(columns)
+        self.index = pd.RangeIndex(n_rows) if index is None else index
+
+    @staticmethod
+    def _pack(bool_columns):
+        """ Pack a (number of columns, number of rows) boolean array into uint64 words"""
+        n_cols, n_rows = bool_columns.shape
+        packed = np.packbits(bool_columns, axis=1, bitorder='little')
+        # Pad every column to a whole number of 64 bit words
+        n_bytes = -(-n_rows // 64) * 8
+        padded = np.zeros((n_cols, n_bytes), dtype=np.uint8)
+        padded[:, :packed.shape[1]] = packed
+        return padded.view(np.uint64)
+
+    def _unpack(self, words):
+        """ Unpack uint64 words (last axis) back into booleans, one per row"""
+        unpacked = np.unpackbits(np.ascontiguousarray(words).view(np.uint8), axis=-1, bitorder='little')
+        return unpacked[..., :self.n_rows].astype(bool)
+
+    @classmethod
+    def from_frame(cls, df, columns=None):
+        """ Pack the one hot columns of a dataframe. Values equal to 1 (or True) are set"""
+        if columns is None:
+            columns = df.columns.values.tolist()
+        bool_columns = (df[columns].values == 1).T
+        return cls(cls._pack(bool_columns), df.shape[0], columns, index=df.index)
+
+    @classmethod
+    def from_csr(cls, matrix, columns=None, index=None):
+        """ Pack a scipy sparse matrix. Non zero entries are set. Bits are set straight
+        from the column indices of the stored entries, without a dense matrix"""
+        matrix = sp.csc_matrix(matrix)
+        matrix.sum_duplicates()
+        n_rows, n_cols = matrix.shape
+        if columns is None:
+            columns = list(range(n_cols))
+        words = np.zeros((n_cols, -(-n_rows // 64)), dtype=np.uint64)
+        # Column of every stored entry in csc order
+        entry_cols = np.repeat(np.arange(n_cols), np.diff(matrix.indptr))
+        nonzero = matrix.data != 0
+        entry_rows = matrix.indices[nonzero]
+        # Bit i of a column is bit i % 8 (little endian) of byte i // 8
+        np.bitwise_or.at(words.view(np.uint8), (entry_cols[nonzero], entry_rows // 8),
+                         np.left_shift(1, entry_rows % 8).astype(np.uint8))
+        return cls(words, n_rows, columns, index=index)
+
+    def to_frame(self, dtype=np.uint8):
+        """ Unpack into a dataframe of 0/1 columns"""
+        return pd.DataFrame(self._unpack(self.words).T.astype(dtype), index=self.index,
+                            columns=self.columns)
+
+    def to_csr(self, dtype=np.uint8):
+        """ Scipy sparse CSR matrix of shape (number of rows, number of columns), built from
+        the set bits of the non zero packed bytes without a dense matrix"""
+        column_bytes = self.words.view(np.uint8)
+        byte_cols, byte_positions = np.nonzero(column_bytes)
+        byte_bits = np.unpackbits(column_bytes[byte_cols, byte_positions].reshape(-1, 1), axis=1,
+                                  bitorder='little')
+        set_bytes, set_bits = np.nonzero(byte_bits)
+        rows = byte_positions[set_bytes] * 8 + set_bits
+        return sp.csr_matrix((np.ones(rows.shape[0], dtype=dtype), (rows, byte_cols[set_bytes])),
+                             shape=self.shape)
+
+    @property
+    def shape(self):
+        return (self.n_rows, len(self.columns))
+
+    @property
+    def nbytes(self):
+        """ Bytes taken by the packed bits"""
+        return self.words.nbytes
+
+    def _column_words(self, columns=None):
+        if columns is None:
+            return self.words
+        if isinstance(columns, str):
+            columns = [columns]
+        positions = self.columns.get_indexer_for(columns)
+        if (positions < 0).any():
+            missing_columns = [col for col, position in zip(columns, positions) if position < 0]
+            raise KeyError(f'Columns not in the block: {missing_columns}')
+        return self.words[positions]
+
+    def any(self, columns=None):
+        """ Row wise OR of the columns as a boolean array"""
+        return self._unpack(np.bitwise_or.reduce(self._column_words(columns), axis=0))
+
+    def all(self, columns=None):
+        """ Row wise AND of the columns as a boolean array"""
+        return self._unpack(np.bitwise_and.reduce(self._column_words(columns), axis=0))
+
+    def count(self, columns=None):
+        """ Number of set rows in each column as a Series"""
+        column_words = self._column_words(columns)
+        column_names = self.columns if columns is None else pd.Index(np.atleast_1d(columns))
+        return pd.Series(_popcount(column_words), index=column_names)
+
+    def count_any(self, columns=None):
+        """ Number of rows where any of the columns is set"""
+        return int(_popcount(np.bitwise_or.reduce(self._column_words(columns), axis=0)))
+
+    def count_all(self, columns=None):
+        """ Number of rows where all of the columns are set"""
+        return int(_popcount(np.bitwise_and.reduce(self._column_words(columns), axis=0)))
+
+    def with_column(self, name, values):
+        """ Return a new block with a boolean column added"""
+        new_words = self._pack(np.asarray(values, dtype=bool).reshape(1, self.n_rows))
+        return PackedBoolBlock(np.vstack([self.words, new_words]), self.n_rows,
+                               self.columns.tolist() + [name], index=self.index)
+
+    def __repr__(self):
+        return f'PackedBoolBlock(rows={self.n_rows}, columns={len(self.columns)}, nbytes={self.nbytes})'
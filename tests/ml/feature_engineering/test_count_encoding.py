@@ -0,0 +1,45 @@
+import pandas as pd
+import numpy as np
+
+from data_science_toolbox.etl.custom_transformers.DF.feature_engineering import DFCountEncoder
+from data_science_toolbox.ml.feature_engineering.count_encoding import ValueCountTable
+
+
+def _test_df(n=600):
+    return pd.DataFrame({
+        'A': np.random.choice(['foo', 'bar', 'banana', None], n),
+        'B': np.random.choice(['x', 'y', 'z'], n),
+        'C': np.random.rand(n)
+    })
+
+
+def test_count_encoder_matches_groupby_size():
+    test_df = _test_df()
+    encoded_df = DFCountEncoder().fit(test_df).transform(test_df)
+    assert encoded_df.columns.tolist() == ['A', 'B', 'C', 'A_count', 'B_count']
+    for column in ['A', 'B']:
+        # groupby drops missing values, which are encoded as 0
+        expected = test_df.groupby(column)[column].transform('size').fillna(0)
+        assert (encoded_df[f'{column}_count'].values == expected.values).all()
+
+    frequency_df = DFCountEncoder(columns=['A'], normalize=True, remove_original=True).fit(test_df).transform(test_df)
+    assert frequency_df.columns.tolist() == ['B', 'C', 'A_frequency']
+    expected = test_df.A.map(test_df.A.value_counts(normalize=True)).fillna(0)
+    assert np.allclose(frequency_df.A_frequency.values, expected.values)
+
+
+def test_chunked_counts_match_full_fit():
+    test_df = _test_df()
+    full_encoder = DFCountEncoder(columns=['A', 'B']).fit(test_df)
+    chunk_encoder = DFCountEncoder(columns=['A', 'B']).partial_fit(test_df.iloc[:100])
+    chunk_encoder.partial_fit(test_df.iloc[100:350])
+    chunk_encoder.merge(DFCountEncoder(columns=['A', 'B']).fit(test_df.iloc[350:]))
+    pd.testing.assert_frame_equal(chunk_encoder.transform(test_df), full_encoder.transform(test_df))
+    assert chunk_encoder.value_counts_.totals == {'A': int(test_df.A.notnull().sum()), 'B': test_df.shape[0]}
+
+
+def test_unseen_values_are_zero():
+    counts = ValueCountTable(['A']).partial_fit(pd.DataFrame({'A': ['foo', 'foo', 'bar']}))
+    encoded = counts.lookup(pd.DataFrame({'A': ['foo', 'never_seen', None, 'bar']}, index=[3, 2, 1, 0]))
+    assert encoded.index.tolist() == [3, 2, 1, 0]
+    assert encoded.A.tolist() == [2, 0, 0, 1]
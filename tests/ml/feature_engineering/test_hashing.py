@@ -0,0 +1,75 @@
+import pandas as pd
+import numpy as np
+
+from data_science_toolbox.etl.custom_transformers.DF.feature_engineering import DFHashingEncoder
+from data_science_toolbox.ml.feature_engineering.hashing import column_hash_buckets, hash_encode, hash_strings
+
+
+def _test_df(n=500):
+    return pd.DataFrame({
+        'A': np.random.choice(['foo', 'bar', 'banana', None], n),
+        'B': np.random.randint(0, 50, n),
+        'C': np.random.choice(['x', 'y'], n)
+    })
+
+
+def test_hashes_are_deterministic_and_seeded():
+    keys = [f'A={value}' for value in range(1000)]
+    assert (hash_strings(keys, seed=3) == hash_strings(keys, seed=3)).all()
+    assert (hash_strings(keys, seed=3) != hash_strings(keys, seed=4)).mean() > .99
+
+    test_df = _test_df()
+    first = hash_encode(test_df, n_buckets=64, seed=1)
+    assert (first != hash_encode(test_df.copy(), n_buckets=64, seed=1)).nnz == 0
+    assert (first != hash_encode(test_df, n_buckets=64, seed=2)).nnz > 0
+
+
+def test_buckets_in_range_and_missing_skipped():
+    values = _test_df().A.values
+    rows, buckets, signs = column_hash_buckets(values, 'A', n_buckets=7, signed=True)
+    assert ((buckets >= 0) & (buckets < 7)).all()
+    assert set(np.unique(signs)).issubset({-1, 1})
+    assert (rows == np.flatnonzero(pd.notnull(values))).all()
+    # Every occurrence of a value gets the same bucket and sign
+    bucket_per_value = pd.DataFrame({'value': values[rows], 'bucket': buckets, 'sign': signs})
+    assert (bucket_per_value.groupby('value').nunique().values == 1).all()
+
+
+def test_collisions_are_summed():
+    test_df = _test_df()
+    # A single bucket makes every column=value pair of a row collide
+    for signed in [False, True]:
+        hashed_matrix = hash_encode(test_df, n_buckets=1, signed=signed)
+        expected = np.zeros(test_df.shape[0], dtype=np.float32)
+        for column in test_df.columns:
+            rows, _, signs = column_hash_buckets(test_df[column].values, column, n_buckets=1, signed=signed)
+            np.add.at(expected, rows, signs)
+        assert hashed_matrix.dtype == np.float32
+        assert np.allclose(hashed_matrix.toarray()[:, 0], expected)
+    assert np.allclose(hash_encode(test_df, n_buckets=1).toarray()[:, 0], test_df.notnull().sum(axis=1))
+
+
+def test_hashing_encoder():
+    test_df = _test_df()
+    encoder = DFHashingEncoder(n_buckets=16, signed=True, return_sparse_matrix=False).fit(test_df)
+    assert encoder.encoded_cols_ == ['A', 'C']
+    encoded_df = encoder.transform(test_df)
+    assert encoded_df.shape == (test_df.shape[0], 16)
+    assert (encoded_df.index == test_df.index).all()
+    assert np.allclose(encoded_df.sparse.to_dense().values,
+                       hash_encode(test_df, ['A', 'C'], n_buckets=16, signed=True).toarray())
+
+
+def test_equal_values_share_buckets_across_batch_dtypes():
+    int_batch = pd.DataFrame({'A': [5, 7, 9]})
+    float_batch = pd.DataFrame({'A': [5, 7, np.nan]})
+    int32_batch = pd.DataFrame({'A': np.array([9, 5, 7], dtype=np.int32)})
+    int_buckets = hash_encode(int_batch, n_buckets=1024, signed=True).toarray()
+    float_buckets = hash_encode(float_batch, n_buckets=1024, signed=True).toarray()
+    int32_buckets = hash_encode(int32_batch, n_buckets=1024, signed=True).toarray()
+    assert (float_buckets[:2] == int_buckets[:2]).all()
+    assert (float_buckets[2] == 0).all()
+    assert (int32_buckets == int_buckets[[2, 0, 1]]).all()
+    # Non integral floats keep their value
+    assert (hash_encode(pd.DataFrame({'A': [5.5]}), n_buckets=1024).toarray() !=
+            hash_encode(pd.DataFrame({'A': [5]}), n_buckets=1024).toarray()).any()
@@ -0,0 +1,42 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_science_toolbox.etl.custom_transformers.DF.feature_engineering import DFInteractionsTransformer
+from data_science_toolbox.ml.feature_engineering.interactions import screen_pairwise_interactions
+
+
+@pytest.mark.parametrize('method', ['scale', 'log-additive'])
+@pytest.mark.parametrize('block_size', [1, 2, 3, 100])
+def test_blocked_scores_match_transformer_interactions(method, block_size):
+    rng = np.random.RandomState(0)
+    columns = ['a', 'b', 'c', 'd', 'e']
+    # Columns far from 0 so raw and centered products correlate differently with the target
+    test_df = pd.DataFrame(rng.rand(200, 5) * 10 + np.array([-2, 5, 20, -30, 0]), columns=columns)
+    test_df['target'] = test_df.a * test_df.b + rng.rand(200)
+    interactions_dict_map, scores_df = screen_pairwise_interactions(test_df, 'target', method=method, top_k=10,
+                                                                    block_size=block_size, return_scores=True)
+    # Every pair is returned with top_k = number of pairs
+    assert scores_df.shape[0] == 10
+    assert set(map(frozenset, zip(scores_df.Base_Feature, scores_df.Interaction_Term))) == \
+        set(map(frozenset, itertools.combinations(columns, 2)))
+
+    # Score the columns the transformer actually creates
+    transformed_df = DFInteractionsTransformer(interactions_dict_map, method=method, verbose=0).fit_transform(test_df)
+    for row in scores_df.itertuples():
+        if method == 'scale':
+            interaction_col = f'{row.Base_Feature}_TIMES_{row.Interaction_Term}'
+        else:
+            interaction_col = f'LOG_{row.Base_Feature}_PLUS_LOG_{row.Interaction_Term}'
+        expected = np.corrcoef(transformed_df[interaction_col], test_df.target)[0, 1]
+        np.testing.assert_allclose(row.Correlation, expected, rtol=1e-8)
+
+
+def test_screen_ranks_the_raw_product():
+    rng = np.random.RandomState(1)
+    test_df = pd.DataFrame({'a': rng.rand(500) + 10, 'b': rng.rand(500) + 10, 'c': rng.rand(500) + 10})
+    test_df['target'] = test_df.a * test_df.b
+    interactions_dict_map = screen_pairwise_interactions(test_df, 'target', top_k=1)
+    assert interactions_dict_map == {'a': ['b']}
@@ -0,0 +1,41 @@
+import pandas as pd
+import numpy as np
+import pytest
+
+from data_science_toolbox.ml.feature_engineering.one_hot import get_specific_dummies
+
+
+def _np_where_dummies(df, col_map):
+    """ Reference dummies with one np.where comparison per listed value"""
+    return pd.DataFrame({column+'_==_'+str(val): np.where(df[column] == val, 1, 0)
+                         for column, values in col_map.items() for val in values},
+                        index=df.index)
+
+
+@pytest.mark.parametrize('sparse', [False, True])
+def test_get_specific_dummies_matches_np_where(sparse):
+    test_df = pd.DataFrame({
+        'A': np.random.choice(['foo', 'bar', 'banana', None], 300),
+        'B': np.random.choice([0, 1, 2, np.nan], 300),
+        'C': np.random.choice([True, False], 300)
+    }, index=np.arange(300) * 3 + 7)
+    # 1, 1.0 and True compare equal but each listed value gets its own column
+    col_map = {'A': ['banana', 'foo', 'not_present', np.nan], 'B': [2, 1, 1.0, True], 'C': [True]}
+    one_hot_df = get_specific_dummies(test_df, col_map=col_map, return_df=False, sparse=sparse)
+    expected = _np_where_dummies(test_df, col_map)
+
+    assert one_hot_df.columns.tolist() == ['A_==_banana', 'A_==_foo', 'A_==_not_present', 'A_==_nan',
+                                           'B_==_2', 'B_==_1', 'B_==_1.0', 'B_==_True', 'C_==_True']
+    assert (one_hot_df.index == test_df.index).all()
+    if sparse:
+        one_hot_df = one_hot_df.sparse.to_dense()
+    assert (one_hot_df.values == expected.values).all()
+    # Rows with missing values have no dummies set
+    assert (one_hot_df.loc[test_df.A.isnull(), ['A_==_banana', 'A_==_foo', 'A_==_nan']].values == 0).all()
+
+
+def test_get_specific_dummies_return_df():
+    test_df = pd.DataFrame({'A': ['foo', 'bar', 'foo']}, index=['x', 'y', 'z'])
+    result_df = get_specific_dummies(test_df, col_map={'A': ['foo']}, prefix='is_')
+    assert result_df.columns.tolist() == ['A', 'is_A_==_foo']
+    assert result_df['is_A_==_foo'].tolist() == [1, 0, 1]
@@ -0,0 +1,59 @@
+import pandas as pd
+import numpy as np
+import pytest
+
+from data_science_toolbox.ml.feature_engineering import phrase_matching
+from data_science_toolbox.ml.feature_engineering.one_hot import text_match_one_hot_from_map
+from data_science_toolbox.ml.feature_engineering.phrase_matching import PhraseMatcher
+
+
+@pytest.fixture(params=['automaton', 'regex'])
+def matcher_backend(request, monkeypatch):
+    """ Run each test with the Aho-Corasick automaton (if installed) and the regex fallback"""
+    if request.param == 'automaton' and phrase_matching.ahocorasick is None:
+        pytest.skip('pyahocorasick is not installed')
+    if request.param == 'regex':
+        monkeypatch.setattr(phrase_matching, 'ahocorasick', None)
+    return request.param
+
+
+def _str_contains_indicators(texts, phrase_groups, case=False):
+    """ Reference indicators from one str.contains per phrase"""
+    texts = pd.Series(texts, dtype=object)
+    return np.column_stack([
+        np.any([texts.str.contains(phrase, case=case, na=False).values for phrase in phrases], axis=0)
+        for phrases in phrase_groups
+    ]).astype(np.uint8)
+
+
+def test_prefix_phrases_flag_every_group(matcher_backend):
+    # 'back' is a prefix of 'back pain', so a text with 'back pain' matches both groups
+    phrase_groups = [['back pain'], ['back'], ['pain', 'ache']]
+    texts = ['Back pain since monday', 'lower back', 'headache', 'nothing', np.nan, None]
+    matches = PhraseMatcher(phrase_groups).match(texts)
+    assert (matches == _str_contains_indicators(texts, phrase_groups)).all()
+    assert matches[0].tolist() == [1, 1, 1]
+
+
+def test_case_sensitive(matcher_backend):
+    phrase_groups = [['Fracture'], ['broken (?:arm|leg)'], ['x-ray']]
+    texts = ['fracture of the wrist', 'Fracture', 'Broken leg', 'broken arm', 'X-RAY taken', np.nan]
+    for case in [True, False]:
+        matches = PhraseMatcher(phrase_groups, case=case).match(pd.Series(texts))
+        assert (matches == _str_contains_indicators(texts, phrase_groups, case=case)).all()
+
+
+def test_missing_texts_never_match(matcher_backend):
+    matches = PhraseMatcher([['nan'], ['none']]).match(pd.Series([np.nan, None, 'nan', 'None']))
+    assert matches.tolist() == [[0, 0], [0, 0], [1, 0], [0, 1]]
+
+
+def test_text_match_one_hot_from_dict_map(matcher_backend):
+    test_df = pd.DataFrame({'notes': ['A cat and a red ball', 'blue dog', 'nothing here', np.nan]},
+                           index=[10, 20, 30, 40])
+    col_map = {'notes': {'animals': ['cat', 'dog'], 'colors': ['red', 'blue']}}
+    one_hot_df = text_match_one_hot_from_map(test_df, col_map=col_map, return_df=False)
+    assert one_hot_df.index.tolist() == [10, 20, 30, 40]
+    assert one_hot_df.columns.tolist() == ['notes_match_for_____animals', 'notes_match_for_____colors']
+    assert one_hot_df['notes_match_for_____animals'].tolist() == [1, 1, 0, 0]
+    assert one_hot_df['notes_match_for_____colors'].tolist() == [1, 1, 0, 0]
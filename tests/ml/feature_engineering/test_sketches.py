@@ -0,0 +1,50 @@
+import pandas as pd
+import numpy as np
+import pytest
+
+from data_science_toolbox.ml.feature_engineering.sketches import CountMinSketch, heavy_hitter_target_average
+from data_science_toolbox.ml.feature_engineering.target_mean_aggregate import column_values_target_average
+
+
+def _id_df(n=20000, seed=0):
+    rng = np.random.RandomState(seed)
+    # A few frequent ids and a long tail of rare ones
+    ids = np.where(rng.rand(n) < .5, rng.randint(0, 20, n), rng.randint(20, 5000, n))
+    return pd.DataFrame({'user_id': ids.astype(str),
+                         'target': rng.randint(0, 2, n)})
+
+
+def test_count_min_sketch_never_undercounts():
+    values = _id_df().user_id.values
+    sketch = CountMinSketch(width=256, depth=3).update(values)
+    true_counts = pd.Series(values).value_counts()
+    estimates = sketch.query(true_counts.index.values)
+    assert (estimates >= true_counts.values).all()
+    assert sketch.total_count == len(values)
+
+
+def test_count_min_sketch_merge_equals_single_sketch():
+    values = _id_df().user_id.values
+    full_sketch = CountMinSketch(width=512, depth=4).update(values)
+    merged_sketch = (CountMinSketch(width=512, depth=4).update(values[:7000])
+                     .merge(CountMinSketch(width=512, depth=4).update(values[7000:])))
+    assert (merged_sketch.table == full_sketch.table).all()
+    assert merged_sketch.total_count == full_sketch.total_count
+    with pytest.raises(ValueError):
+        merged_sketch.merge(CountMinSketch(width=256, depth=4))
+
+
+@pytest.mark.parametrize('sample_frequency,freq_weighted_average', [(True, True), (False, False)])
+def test_heavy_hitters_match_exact_averages(sample_frequency, freq_weighted_average):
+    test_df = _id_df()
+    kwargs = dict(sample_frequency=sample_frequency, freq_weighted_average=freq_weighted_average,
+                  min_sample_size=100, min_sample_frequency=.03)
+    exact_df = column_values_target_average(test_df, 'user_id', 'target', **kwargs)
+    approx_df = heavy_hitter_target_average(test_df, 'user_id', 'target', sketch_width=256,
+                                            chunksize=3000, **kwargs)
+    assert set(approx_df.user_id) == set(exact_df.user_id)
+    exact_df = exact_df.set_index('user_id').loc[approx_df.user_id]
+    approx_df = approx_df.set_index('user_id')
+    assert (approx_df.columns == exact_df.columns).all()
+    assert (approx_df.sample_size.values == exact_df.sample_size.values).all()
+    assert np.allclose(approx_df.values.astype(float), exact_df.values.astype(float))
@@ -0,0 +1,66 @@
+import pandas as pd
+import numpy as np
+import pytest
+
+from data_science_toolbox.etl.custom_transformers.DF.feature_engineering import TargetAssociatedFeatureValueAggregator
+from data_science_toolbox.ml.feature_engineering.target_association import (
+    TargetAssociationStats,
+    column_target_stats,
+    df_target_association_stats,
+)
+
+
+def test_column_target_stats():
+    test_df = pd.DataFrame({
+        'A': ['foo', 'bar', 'foo', None, 'bar', 'foo'],
+        'target': [1, 0, 0, 1, 1, 1]
+    })
+    stats_df = column_target_stats(test_df, 'A', 'target')
+    assert stats_df.index.tolist() == ['bar', 'foo']
+    assert stats_df['sample_size'].tolist() == [2, 3]
+    assert stats_df['target_sum'].tolist() == [1, 2]
+
+
+def test_df_target_association_stats_matches_groupby():
+    test_df = pd.DataFrame({
+        'A': np.random.choice(['foo', 'bar', 'banana'], 500),
+        'B': np.random.randint(0, 10, 500),
+        'target': np.random.randint(0, 2, 500)
+    })
+    stats_df = df_target_association_stats(test_df, 'target', parallel=True, ncores=2)
+    for column in ['A', 'B']:
+        expected = test_df.groupby(column)['target'].agg(['size', 'mean'])
+        computed = stats_df[stats_df.feature == column].set_index('feature_value').loc[expected.index]
+        assert (computed['sample_size'].values == expected['size'].values).all()
+        assert np.allclose(computed['avg_target'].values, expected['mean'].values)
+        assert np.allclose(computed['feature_value_frequency'].values, expected['size'].values / 500)
+
+
+def test_target_association_stats_chunks_match_full_fit():
+    test_df = pd.DataFrame({
+        'A': np.random.choice(['foo', 'bar', 'banana', None], 600),
+        'B': np.random.randint(0, 10, 600),
+        'target': np.random.randint(0, 2, 600)
+    })
+    full_stats = TargetAssociationStats('target').partial_fit(test_df)
+    chunk_stats = TargetAssociationStats('target').partial_fit(test_df.iloc[:200])
+    chunk_stats.partial_fit(test_df.iloc[200:350])
+    chunk_stats.merge(TargetAssociationStats('target').partial_fit(test_df.iloc[350:]))
+
+    assert chunk_stats.n_samples == full_stats.n_samples
+    for column in ['A', 'B']:
+        expected = full_stats.column_stats[column]
+        computed = chunk_stats.column_stats[column].loc[expected.index]
+        assert (computed['sample_size'].values == expected['sample_size'].values).all()
+        assert np.allclose(computed['target_sum'].values, expected['target_sum'].values)
+        assert np.allclose(computed['target_count'].values, expected['target_count'].values)
+    pd.testing.assert_frame_equal(chunk_stats.association_frame().sort_values(['feature', 'feature_value'])
+                                  .reset_index(drop=True),
+                                  full_stats.association_frame().sort_values(['feature', 'feature_value'])
+                                  .reset_index(drop=True))
+
+
+def test_aggregator_partial_fit_requires_target_on_first_call():
+    test_df = pd.DataFrame({'A': ['foo', 'bar', 'foo'], 'target': [1, 0, 1]})
+    with pytest.raises(ValueError):
+        TargetAssociatedFeatureValueAggregator().partial_fit(test_df)
@@ -0,0 +1,59 @@
+import pandas as pd
+import numpy as np
+import pytest
+
+from data_science_toolbox.etl.custom_transformers.DF.feature_engineering import DFKFoldTargetEncoder
+from data_science_toolbox.ml.feature_engineering.target_encoding import (
+    apply_target_encoding,
+    df_kfold_target_encoding,
+    kfold_fold_ids,
+)
+
+
+def _test_df(n=400):
+    return pd.DataFrame({
+        'A': np.random.choice(['foo', 'bar', 'banana', None], n),
+        'B': np.random.randint(0, 6, n),
+        'target': np.random.randint(0, 2, n)
+    })
+
+
+def test_kfold_fold_ids_balanced():
+    fold_ids = kfold_fold_ids(103, n_splits=5, random_state=0)
+    assert sorted(np.bincount(fold_ids).tolist()) == [20, 20, 21, 21, 21]
+    assert (fold_ids == kfold_fold_ids(103, n_splits=5, random_state=0)).all()
+
+
+@pytest.mark.parametrize('smoothing', [0, 10])
+def test_oof_encoding_matches_fold_groupby(smoothing):
+    test_df = _test_df()
+    n_splits = 4
+    oof_encoded_df, encodings, prior = df_kfold_target_encoding(test_df, 'target', ['A', 'B'], n_splits=n_splits,
+                                                                smoothing=smoothing, random_state=1)
+    fold_ids = kfold_fold_ids(test_df.shape[0], n_splits=n_splits, random_state=1)
+    for column in ['A', 'B']:
+        expected = np.zeros(test_df.shape[0])
+        for fold in range(n_splits):
+            in_fold = fold_ids == fold
+            other_folds = test_df[~in_fold]
+            fold_prior = other_folds.target.mean()
+            value_stats = other_folds.groupby(column)['target'].agg(['sum', 'count'])
+            smoothed = (value_stats['sum'] + smoothing * fold_prior) / (value_stats['count'] + smoothing)
+            expected[in_fold] = test_df.loc[in_fold, column].map(smoothed).fillna(fold_prior).values
+        assert np.allclose(oof_encoded_df[column].values, expected)
+
+        full_stats = test_df.groupby(column)['target'].agg(['sum', 'count'])
+        full_smoothed = (full_stats['sum'] + smoothing * prior) / (full_stats['count'] + smoothing)
+        assert np.allclose(encodings[column].loc[full_smoothed.index].values, full_smoothed.values)
+    assert np.isclose(prior, test_df.target.mean())
+
+
+def test_unseen_and_missing_values_get_prior():
+    test_df = _test_df()
+    encoder = DFKFoldTargetEncoder(columns=['A'], random_state=0).fit(test_df, 'target')
+    new_df = pd.DataFrame({'A': ['foo', 'never_seen', None, np.nan]})
+    encoded = encoder.transform(new_df)['A_target_encoded'].values
+    assert np.isclose(encoded[0], encoder.encodings_['A']['foo'])
+    assert np.allclose(encoded[1:], encoder.prior_)
+    assert np.allclose(apply_target_encoding(np.array(['never_seen', None], dtype=object),
+                                             encoder.encodings_['A'], encoder.prior_), encoder.prior_)
@@ -0,0 +1,67 @@
+import pandas as pd
+import numpy as np
+
+from data_science_toolbox.etl.custom_transformers.DF.feature_engineering import DFWoETransformer
+from data_science_toolbox.ml.feature_engineering.woe import apply_woe, column_woe, df_woe_iv_report
+
+
+def test_column_woe_matches_crosstab():
+    test_df = pd.DataFrame({
+        'A': np.random.choice(['foo', 'bar', 'banana', None], 1000),
+        'target': np.random.randint(0, 2, 1000)
+    })
+    smoothing = .5
+    woe_table, edges = column_woe(test_df.A.values, test_df.target.values, smoothing=smoothing)
+    assert edges is None
+
+    counts = pd.crosstab(test_df.A.fillna('missing'), test_df.target)
+    dist_event = (counts[1] + smoothing) / (counts[1].sum() + smoothing * counts.shape[0])
+    dist_non_event = (counts[0] + smoothing) / (counts[0].sum() + smoothing * counts.shape[0])
+    expected_woe = np.log(dist_event / dist_non_event)
+    computed = woe_table.assign(feature_value=woe_table.feature_value.fillna('missing')).set_index('feature_value')
+    assert np.allclose(computed.woe.loc[expected_woe.index].values, expected_woe.values)
+    assert np.isclose(computed.iv.sum(), ((dist_event - dist_non_event) * expected_woe).sum())
+
+
+def test_numeric_columns_are_binned():
+    test_df = pd.DataFrame({
+        'float': np.random.rand(1000),
+        'nullable_int': pd.array(np.random.randint(0, 100, 1000), dtype='Int64'),
+        'target': np.random.randint(0, 2, 1000)
+    })
+    test_df.loc[::50, 'nullable_int'] = pd.NA
+    woe_df, iv_df = df_woe_iv_report(test_df, 'target', n_bins=5)
+    assert set(iv_df.feature) == {'float', 'nullable_int'}
+    assert iv_df.set_index('feature').n_bins.to_dict() == {'float': 5, 'nullable_int': 6}
+    nullable_table = woe_df[woe_df.feature == 'nullable_int']
+    assert nullable_table.feature_value.isnull().sum() == 1
+    assert nullable_table.sample_size.sum() == 1000
+
+
+def test_apply_woe_unseen_and_missing():
+    test_df = pd.DataFrame({
+        'A': np.random.choice(['foo', 'bar', None], 500),
+        'B': np.random.choice(['foo', 'bar'], 500),
+        'target': np.random.randint(0, 2, 500)
+    })
+    woe_table, edges = column_woe(test_df.A.values, test_df.target.values)
+    woe_by_value = woe_table.set_index(woe_table.feature_value.fillna('missing')).woe
+    encoded = apply_woe(np.array(['foo', 'never_seen', None], dtype=object), woe_table, edges)
+    assert np.allclose(encoded, [woe_by_value['foo'], 0, woe_by_value['missing']])
+
+    # Without a fitted missing bin missing values are neutral
+    woe_table, edges = column_woe(test_df.B.values, test_df.target.values)
+    assert np.allclose(apply_woe(np.array([None, 'never_seen'], dtype=object), woe_table, edges), 0)
+
+
+def test_woe_transformer():
+    test_df = pd.DataFrame({
+        'A': np.random.choice(['foo', 'bar'], 500),
+        'B': np.random.rand(500),
+        'target': np.random.randint(0, 2, 500)
+    })
+    transformer = DFWoETransformer(n_bins=4).fit(test_df, 'target')
+    transformed = transformer.transform(test_df)
+    assert {'A_woe', 'B_woe'}.issubset(transformed.columns)
+    assert set(transformer.iv_.index) == {'A', 'B'}
+    assert np.allclose(transformed.A_woe.values, apply_woe(test_df.A.values, *transformer.woe_tables_['A']))
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_science_toolbox.ml.feature_list.consensus_ranking import ConsensusRanking, consensus_ranking
+from data_science_toolbox.ml.feature_list.feature_list import ranked_flists
+from data_science_toolbox.ml.feature_list.feature_list_store import FeatureListStore
+
+
+def test_consensus_ranking_scores():
+    flist_log = pd.DataFrame({
+        'Method': ['RFE', 'RFE', 'Lasso'],
+        'Features': ['a---b---c', 'b---a', 'c']
+    })
+    consensus_df = consensus_ranking(ranked_flists(flist_log)).set_index('Feature')
+    # Borda points: a = 3 + 1, b = 2 + 2, c = 1 + 1, over 3 lists
+    np.testing.assert_allclose(consensus_df.loc[['a', 'b', 'c'], 'Borda_Score'], [4 / 3, 4 / 3, 2 / 3])
+    np.testing.assert_allclose(consensus_df.loc[['a', 'b', 'c'], 'Mean_Reciprocal_Rank'],
+                               [(1 + 1 / 2) / 3, (1 / 2 + 1) / 3, (1 / 3 + 1) / 3])
+    np.testing.assert_allclose(consensus_df.loc[['a', 'b', 'c'], 'Selection_Frequency'], [2 / 3, 2 / 3, 2 / 3])
+
+    # Incremental updates give the same ranking as all lists at once
+    incremental = ConsensusRanking()
+    for i in range(flist_log.shape[0]):
+        incremental.update(ranked_flists(flist_log.iloc[[i]]))
+    pd.testing.assert_frame_equal(incremental.ranking(), consensus_ranking(ranked_flists(flist_log)))
+
+
+def test_merged_rankers_continue_after_the_lists_they_read(tmp_path):
+    store = FeatureListStore(str(tmp_path / 'feature_lists.db'))
+    for features in [['a', 'b'], ['b', 'c'], ['c', 'a']]:
+        store.append(features, method='RFE')
+    first_ranker = ConsensusRanking().update_from_store(store)
+    for features in [['a'], ['b', 'a']]:
+        store.append(features, method='RFE')
+    # A second ranker reads only the lists logged after the first one
+    second_ranker = ConsensusRanking()
+    second_ranker.last_list_id = first_ranker.last_list_id
+    second_ranker.update_from_store(store)
+
+    merged = ConsensusRanking().merge(first_ranker).merge(second_ranker)
+    assert merged.last_list_id == 5
+    store.append(['c'], method='RFE')
+    merged.update_from_store(store)
+    pd.testing.assert_frame_equal(merged.ranking(), ConsensusRanking().update_from_store(store).ranking())
+
+    # Rankers that read the same lists would count them twice
+    with pytest.raises(ValueError, match='overlapping'):
+        ConsensusRanking().update_from_store(store).merge(first_ranker)
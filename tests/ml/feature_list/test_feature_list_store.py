@@ -0,0 +1,68 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from data_science_toolbox.ml.feature_list.feature_list import (
+    feature_list_latest,
+    feature_list_log,
+    ranked_flists,
+)
+from data_science_toolbox.ml.feature_list.feature_list_store import FeatureListStore
+
+
+def test_feature_list_store_matches_dataframe_log(tmp_path):
+    store = FeatureListStore(str(tmp_path / 'feature_lists.db'))
+    feature_dfs = [pd.DataFrame(columns=[f'feature_{i}' for i in range(n_features)])
+                   for n_features in range(1, 21)]
+
+    def log(i):
+        return feature_list_log(feature_dfs[i], method=f'method_{i % 2}', notes=f'run {i}', store=store)
+
+    # Concurrent appends from parallel jobs
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(log, range(20)))
+    assert len(store) == 20
+
+    log_df = store.to_frame()
+    assert feature_list_latest(store, method='method_1', max_features=10) == \
+        feature_list_latest(log_df, method='method_1', max_features=10)
+    assert feature_list_latest(store, notes_contains='run 1[0-9]') == \
+        feature_list_latest(log_df, notes_contains='run 1[0-9]')
+    pd.testing.assert_frame_equal(ranked_flists(store), ranked_flists(log_df))
+
+
+def test_empty_store_is_logged_to(tmp_path):
+    # An empty store has a length of 0 but must still be written to
+    store = FeatureListStore(str(tmp_path / 'feature_lists.db'))
+    assert len(store) == 0
+    feature_list_log(pd.DataFrame(columns=['a', 'b']), method='RFE', store=store)
+    assert len(store) == 1
+    assert feature_list_latest(store, method='RFE') == ['a', 'b']
+    # Reopening the file keeps the logged lists
+    assert len(FeatureListStore(str(tmp_path / 'feature_lists.db'))) == 1
+
+
+def test_import_log_with_empty_lists(tmp_path):
+    log_df = pd.concat([feature_list_log(pd.DataFrame(columns=['a', 'b']), method='RFE'),
+                        feature_list_log(pd.DataFrame(), method='RFE', notes='nothing selected')],
+                       ignore_index=True)
+    log_fpath = str(tmp_path / 'log.csv')
+    log_df.to_csv(log_fpath, index=False)
+    # The empty list is read back as a NaN Features cell
+    csv_log_df = pd.read_csv(log_fpath)
+    assert csv_log_df.Features.isnull().tolist() == [False, True]
+
+    store = FeatureListStore(str(tmp_path / 'feature_lists.db')).import_log(csv_log_df)
+    assert len(store) == 2
+    assert store.latest(method='RFE') == []
+    assert store.to_frame().Number_of_Features.tolist() == [2, 0]
+
+
+def test_feature_list_log_split_char_must_match_store(tmp_path):
+    store = FeatureListStore(str(tmp_path / 'feature_lists.db'), split_char='|')
+    with pytest.raises(ValueError, match='split_char'):
+        feature_list_log(pd.DataFrame(columns=['a', 'b']), store=store)
+    record = feature_list_log(pd.DataFrame(columns=['a', 'b']), split_char='|', store=store)
+    assert record.Features[0] == 'a|b'
+    assert store.to_frame().Features.tolist() == ['a|b']
@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+from sklearn.calibration import calibration_curve
+from sklearn.metrics import brier_score_loss, log_loss
+
+from data_science_toolbox.ml.scoring.calibration import CalibrationMetrics
+
+
+def test_calibration_metrics_match_sklearn():
+    test_df = pd.DataFrame({
+        'target': np.random.randint(0, 2, 1000),
+        'prob': np.random.rand(1000),
+        'region': np.random.choice(['north', 'south'], 1000)
+    })
+    calibration = CalibrationMetrics(test_df, 'target', 'prob', n_bins=5)
+    fraction_positive, mean_predicted = calibration_curve(test_df.target, test_df.prob, n_bins=5)
+    np.testing.assert_allclose(calibration.curve_df.fraction_positive.values, fraction_positive)
+    np.testing.assert_allclose(calibration.curve_df.mean_predicted.values, mean_predicted)
+    np.testing.assert_allclose(calibration.scores_df.brier_score[0], brier_score_loss(test_df.target, test_df.prob))
+
+    segment_calibration = CalibrationMetrics(test_df, 'target', 'prob', segment_cols='region')
+    assert segment_calibration.scores_df.region.tolist() == ['north', 'south']
+    for _, row in segment_calibration.scores_df.iterrows():
+        segment_df = test_df[test_df.region == row.region]
+        np.testing.assert_allclose(row.log_loss, log_loss(segment_df.target, segment_df.prob))
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.metrics import confusion_matrix, f1_score, precision_score, recall_score
+
+from data_science_toolbox.ml.scoring.ClassMetrics import ClassMetrics, ClassMetricsAccumulator
+
+
+def test_class_metrics_match_sklearn():
+    test_df = pd.DataFrame({
+        'target': np.random.choice(['a', 'b', 'c', 'd'], 1000),
+        'predicted': np.random.choice(['a', 'b', 'c', 'e'], 1000)
+    })
+    class_metrics = ClassMetrics(test_df, 'target', 'predicted')
+    labels = sorted(set(test_df.target) | set(test_df.predicted))
+    assert class_metrics.labels.tolist() == labels
+    np.testing.assert_array_equal(class_metrics.confusion_matrix,
+                                  confusion_matrix(test_df.target, test_df.predicted, labels=labels))
+
+    metrics_df = class_metrics.metrics_df
+    classes = ['a', 'b', 'c', 'd']
+    assert metrics_df['class'].tolist() == classes
+    assert metrics_df.actual_count.tolist() == test_df.target.value_counts()[classes].tolist()
+    for metric, scorer in [('f1', f1_score), ('precision', precision_score), ('recall', recall_score)]:
+        expected = scorer(test_df.target, test_df.predicted, labels=classes, average=None)
+        np.testing.assert_allclose(metrics_df[metric].values, expected)
+    np.testing.assert_allclose(metrics_df.classification_accuracy.values, metrics_df.recall.values)
+
+
+def test_accumulator_matches_class_metrics():
+    test_df = pd.DataFrame({
+        'target': np.random.choice(['a', 'b', 'c'], 900),
+        'predicted': np.random.choice(['a', 'b', 'c'], 900)
+    })
+    class_metrics = ClassMetrics(test_df, 'target', 'predicted')
+    accumulators = [ClassMetricsAccumulator(['a', 'b', 'c']) for _ in range(3)]
+    for accumulator, batch in zip(accumulators, np.array_split(test_df, 3)):
+        accumulator.update(batch.target.values, batch.predicted.values)
+    accumulator = accumulators[0].merge(accumulators[1]).merge(accumulators[2])
+
+    np.testing.assert_array_equal(accumulator.confusion_matrix, class_metrics.confusion_matrix)
+    pd.testing.assert_frame_equal(accumulator.metrics_df, class_metrics.metrics_df)
+    assert accumulator.chi_square_test == class_metrics.chi_square_test
+
+    # Segment metrics need the rows, which an accumulator doesn't keep
+    with pytest.raises(ValueError, match='only holds the confusion matrix counts'):
+        accumulator.sliced_metrics('target')
+    with pytest.raises(ValueError, match='only holds the confusion matrix counts'):
+        accumulator.segment_class_metrics('target')
+
+
+def test_sparse_class_metrics_match_dense():
+    test_df = pd.DataFrame({
+        'target': np.random.randint(0, 200, 5000),
+        'predicted': np.random.randint(0, 200, 5000)
+    })
+    dense_metrics = ClassMetrics(test_df, 'target', 'predicted')
+    sparse_metrics = ClassMetrics(test_df, 'target', 'predicted', sparse=True)
+    np.testing.assert_array_equal(sparse_metrics.confusion_matrix.toarray(), dense_metrics.confusion_matrix)
+    pd.testing.assert_frame_equal(sparse_metrics.metrics_df, dense_metrics.metrics_df)
+
+    confused_df = sparse_metrics.most_confused_pairs(top_n=5)
+    pair_counts = test_df[test_df.target != test_df.predicted].groupby(['target', 'predicted']).size()
+    assert confused_df['count'].tolist() == pair_counts.sort_values(ascending=False).head(5).tolist()
+
+
+def test_bootstrap_metrics_intervals():
+    test_df = pd.DataFrame({
+        'target': np.random.choice(['a', 'b'], 2000),
+        'predicted': np.random.choice(['a', 'b'], 2000)
+    })
+    class_metrics = ClassMetrics(test_df, 'target', 'predicted')
+    bootstrap_df = class_metrics.bootstrap_metrics(n_resamples=500, random_state=0, parallel=True, ncores=2)
+    assert bootstrap_df.shape[0] == 6
+    assert ((bootstrap_df.lower <= bootstrap_df.estimate) & (bootstrap_df.estimate <= bootstrap_df.upper)).all()
+    pd.testing.assert_frame_equal(bootstrap_df, class_metrics.bootstrap_metrics(n_resamples=500, random_state=0))
+
+
+def test_sliced_metrics_match_filtered_frames():
+    test_df = pd.DataFrame({
+        'target': np.random.choice(['a', 'b', 'c'], 2000),
+        'predicted': np.random.choice(['a', 'b', 'c'], 2000),
+        'region': np.random.choice(['north', 'south'], 2000),
+        'product': np.random.choice([1, 2, 3], 2000)
+    })
+    sliced_df = ClassMetrics(test_df, 'target', 'predicted').sliced_metrics(['region', 'product'])
+    for (region, product), segment_df in test_df.groupby(['region', 'product']):
+        expected = ClassMetrics(segment_df, 'target', 'predicted').metrics_df
+        computed = sliced_df[(sliced_df.region == region) & (sliced_df['product'] == product)]
+        pd.testing.assert_frame_equal(computed.drop(columns=['region', 'product']).reset_index(drop=True),
+                                      expected, check_dtype=False)
+
+
+def test_multi_model_class_metrics():
+    test_df = pd.DataFrame({
+        'target': np.random.choice(['a', 'b', 'c'], 1000),
+        'model_1': np.random.choice(['a', 'b', 'c'], 1000),
+        'model_2': np.random.choice(['a', 'b', 'd'], 1000),
+    })
+    test_df['model_3'] = np.where(np.random.rand(1000) < 0.8, test_df.target, test_df.model_1)
+    models = ['model_1', 'model_2', 'model_3']
+    class_metrics = ClassMetrics(test_df, 'target', models)
+    metrics_df = class_metrics.metrics_df
+    for model in models:
+        expected = ClassMetrics(test_df, 'target', model).metrics_df
+        computed = metrics_df[metrics_df.model == model].drop(columns='model').reset_index(drop=True)
+        pd.testing.assert_frame_equal(computed, expected)
+        pd.testing.assert_frame_equal(class_metrics.for_model(model).metrics_df, expected)
+
+    mcnemar_df = class_metrics.mcnemar_tests()
+    assert mcnemar_df.shape[0] == 3
+    correct = test_df[models].values == test_df.target.values[:, np.newaxis]
+    row = mcnemar_df[(mcnemar_df.model_a == 'model_1') & (mcnemar_df.model_b == 'model_3')].iloc[0]
+    assert row.a_correct_b_wrong == (correct[:, 0] & ~correct[:, 2]).sum()
+    assert row.a_wrong_b_correct == (~correct[:, 0] & correct[:, 2]).sum()
+    assert row.pvalue < 0.05
@@ -0,0 +1,47 @@
+import os
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+import pytest
+
+from data_science_toolbox.ml.scoring.ClassMetrics import ClassMetrics
+from data_science_toolbox.ml.scoring.render import PLOTS, batch_render_class_metrics, render_class_metrics
+
+
+@pytest.fixture
+def models():
+    test_df = pd.DataFrame({
+        'target': np.random.choice(['a', 'b', 'c'], 500),
+        'model_1': np.random.choice(['a', 'b', 'c'], 500),
+        'model_2': np.random.choice(['a', 'b'], 500)
+    })
+    return {col: ClassMetrics(test_df, 'target', col) for col in ['model_1', 'model_2']}
+
+
+@pytest.fixture(autouse=True)
+def no_show(monkeypatch):
+    def show(*args, **kwargs):
+        raise AssertionError('plt.show must not be called when rendering to files')
+    monkeypatch.setattr(plt, 'show', show)
+
+
+def test_render_class_metrics_writes_files(models, tmp_path):
+    output_dir = str(tmp_path / 'reports')
+    fpaths = render_class_metrics(models['model_1'], output_dir, 'model_1', formats=['png', 'svg'])
+    expected = [os.path.join(output_dir, f'model_1_{plot}.{fmt}') for plot in PLOTS for fmt in ['png', 'svg']]
+    assert fpaths == expected
+    assert all(os.path.getsize(fpath) > 0 for fpath in fpaths)
+    assert sorted(os.listdir(output_dir)) == sorted(os.path.basename(fpath) for fpath in expected)
+    with pytest.raises(ValueError):
+        render_class_metrics(models['model_1'], output_dir, 'model_1', plots=['not_a_plot'])
+
+
+def test_batch_render_same_files_in_parallel(models, tmp_path):
+    serial_fpaths = batch_render_class_metrics(models, str(tmp_path / 'serial'), ncores=1)
+    parallel_fpaths = batch_render_class_metrics(models, str(tmp_path / 'parallel'), ncores=2)
+    assert list(serial_fpaths) == list(parallel_fpaths) == ['model_1', 'model_2']
+    for name in models:
+        assert [os.path.basename(fpath) for fpath in serial_fpaths[name]] == [f'{name}_{plot}.png' for plot in PLOTS]
+        for serial_fpath, parallel_fpath in zip(serial_fpaths[name], parallel_fpaths[name]):
+            with open(serial_fpath, 'rb') as serial_file, open(parallel_fpath, 'rb') as parallel_file:
+                assert serial_file.read() == parallel_file.read()
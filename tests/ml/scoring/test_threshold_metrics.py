@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+from sklearn.metrics import average_precision_score, roc_auc_score, roc_curve
+
+from data_science_toolbox.ml.scoring.threshold_metrics import ThresholdMetrics
+
+
+def test_threshold_metrics_match_sklearn():
+    test_df = pd.DataFrame({
+        'target': np.random.randint(0, 2, 1000),
+        # Rounded so that there are tied scores
+        'score': np.random.rand(1000).round(2),
+        'weight': np.random.rand(1000)
+    })
+    threshold_metrics = ThresholdMetrics(test_df, 'target', 'score', weight_col='weight')
+    fpr, tpr, thresholds = roc_curve(test_df.target, test_df.score, sample_weight=test_df.weight,
+                                     drop_intermediate=False)
+    np.testing.assert_allclose(threshold_metrics.sweep_df.fpr.values, fpr[1:])
+    np.testing.assert_allclose(threshold_metrics.sweep_df.tpr.values, tpr[1:])
+    np.testing.assert_allclose(threshold_metrics.sweep_df.threshold.values, thresholds[1:])
+    np.testing.assert_allclose(threshold_metrics.roc_auc,
+                               roc_auc_score(test_df.target, test_df.score, sample_weight=test_df.weight))
+    np.testing.assert_allclose(threshold_metrics.average_precision,
+                               average_precision_score(test_df.target, test_df.score,
+                                                       sample_weight=test_df.weight))
+
+    best = threshold_metrics.optimal_threshold(metric='f1')
+    assert best.f1 == threshold_metrics.sweep_df.f1.max()
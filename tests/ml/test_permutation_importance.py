@@ -0,0 +1,75 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import r2_score
+
+from data_science_toolbox.ml.feature_list.feature_list import feature_list_latest
+from data_science_toolbox.ml.feature_list.feature_list_store import FeatureListStore
+from data_science_toolbox.ml import permutation_importance as permutation_importance_module
+from data_science_toolbox.ml.permutation_importance import permutation_importance, prefix_column_groups
+
+
+def test_permutation_importance_groups_and_log(tmp_path):
+    X = pd.DataFrame(np.random.rand(500, 4), columns=['noise', 'signal', 'color_red', 'color_blue'])
+    y = 3 * X.signal + X.color_red - X.color_blue
+    model = LinearRegression().fit(X, y)
+    store = FeatureListStore(str(tmp_path / 'feature_lists.db'))
+    importance_df = permutation_importance(model, X, y, r2_score, n_repeats=3,
+                                           column_groups=prefix_column_groups(X.columns, ['color']),
+                                           chunk_size=128, random_state=0, parallel=True, ncores=2,
+                                           flist_log_kwargs={'store': store})
+    assert importance_df.Feature.tolist() == ['signal', 'color', 'noise']
+    pd.testing.assert_frame_equal(importance_df, permutation_importance(
+        model, X, y, r2_score, n_repeats=3, column_groups={'color': ['color_red', 'color_blue']},
+        chunk_size=128, random_state=0))
+    assert feature_list_latest(store, method='Permutation_Importance') == \
+        ['signal', 'color_red', 'color_blue', 'noise']
+
+
+def test_parallel_permutation_importance_requires_numeric_X():
+    X = pd.DataFrame({'number': np.random.rand(50), 'text': np.random.choice(['a', 'b'], 50)})
+    model = LinearRegression().fit(X[['number']], X.number)
+    if permutation_importance_module.shared_memory is None:
+        pytest.skip('multiprocessing.shared_memory needs python 3.8+')
+    with pytest.raises(ValueError, match='numeric'):
+        permutation_importance(model, X, X.number, r2_score, parallel=True, ncores=2)
+
+
+def test_attaching_process_with_own_tracker_keeps_shared_memory():
+    shared_memory = permutation_importance_module.shared_memory
+    if shared_memory is None or os.name != 'posix':
+        pytest.skip('needs posix shared memory')
+    shm = shared_memory.SharedMemory(create=True, size=8)
+    try:
+        # A separate interpreter starts its own resource tracker when attaching
+        code = ('from data_science_toolbox.ml.permutation_importance import _attach_shared_memory; '
+                f'_attach_shared_memory({shm.name!r}).close()')
+        repo_root = os.path.dirname(os.path.dirname(os.path.dirname(permutation_importance_module.__file__)))
+        result = subprocess.run([sys.executable, '-c', code], cwd=repo_root, capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
+        assert 'leaked' not in result.stderr
+        shared_memory.SharedMemory(name=shm.name).close()
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def test_prefix_column_groups_assign_each_column_once():
+    columns = ['age', 'age_group_young', 'age_group_old', 'age_squared', 'income']
+    column_groups = prefix_column_groups(columns, ['age', 'age_group'])
+    assert column_groups == {'age': ['age', 'age_squared'], 'age_group': ['age_group_young', 'age_group_old']}
+
+    X = pd.DataFrame(np.random.rand(100, 5), columns=columns)
+    model = LinearRegression().fit(X, X.age)
+    importance_df = permutation_importance(model, X, X.age.values, r2_score, n_repeats=1,
+                                           column_groups=column_groups, random_state=0)
+    assert sorted(importance_df.Feature) == ['age', 'age_group', 'income']
+
+    with pytest.raises(ValueError, match='more than one'):
+        permutation_importance(model, X, X.age.values, r2_score, n_repeats=1,
+                               column_groups={'age': ['age', 'age_group_young'], 'age_group': ['age_group_young']})
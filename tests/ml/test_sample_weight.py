@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_science_toolbox.ml.sample_weight import (
+    SampleWeightEngine,
+    class_weight_array,
+    even_sample_weights,
+    inverse_sample_weights,
+)
+
+
+def _np_where_inverse_weights(df, target_col, weight_col, min_class_weight=.01):
+    """ Reference inverse weights built with one np.where per class"""
+    pos_class_weights = np.where(df[target_col] == 1, df[weight_col], 0)
+    neg_class_weights_inverse = np.where(df[target_col] == 0, 1/df[weight_col], 0)
+    neg_class_weights_inverse = np.where(neg_class_weights_inverse == np.inf, min_class_weight,
+                                         neg_class_weights_inverse)
+    return np.where(pos_class_weights == 0, neg_class_weights_inverse, pos_class_weights)
+
+
+def _np_where_even_weights(df, target_col, weight_col):
+    """ Reference even weights built with one np.where per class"""
+    pos_class_weights = np.where(df[target_col] == 1, df[weight_col], 0)
+    neg_class_even_weights = np.where(df[target_col] == 0,
+                                      (df[target_col] == 0).sum()/(df[target_col] == 0).shape[0], 0)
+    return np.where(pos_class_weights == 0, neg_class_even_weights, pos_class_weights)
+
+
+@pytest.fixture
+def weights_df():
+    n = 1000
+    test_df = pd.DataFrame({
+        'target': np.random.choice([0, 1, np.nan], n, p=[.6, .3, .1]),
+        'price': np.random.rand(n) * 100
+    })
+    # Zero weights on both classes
+    test_df.loc[::7, 'price'] = 0
+    return test_df
+
+
+def test_weights_match_np_where(weights_df):
+    inverse_df = inverse_sample_weights(weights_df, 'target', 'price', min_class_weight=.05)
+    assert np.allclose(inverse_df.Sample_Inverse_Weights.values,
+                       _np_where_inverse_weights(weights_df, 'target', 'price', min_class_weight=.05))
+    assert 'Sample_Inverse_Weights' not in weights_df.columns
+
+    even_weights = even_sample_weights(weights_df, 'target', 'price', return_df=False)
+    assert np.allclose(even_weights.values, _np_where_even_weights(weights_df, 'target', 'price'))
+
+    # Missing targets get 0 weight, negatives with a 0 weight value get min_class_weight
+    assert (inverse_df.Sample_Inverse_Weights[weights_df.target.isnull()] == 0).all()
+    zero_negatives = (weights_df.target == 0) & (weights_df.price == 0)
+    assert zero_negatives.any()
+    assert (inverse_df.Sample_Inverse_Weights[zero_negatives] == .05).all()
+
+
+def test_inplace_adds_column(weights_df):
+    result_df = even_sample_weights(weights_df, 'target', 'price', new_col_name='w', inplace=True)
+    assert result_df is weights_df
+    assert 'w' in weights_df.columns
+
+
+@pytest.mark.parametrize('method', ['balanced', 'inverse', 'even'])
+def test_engine_chunks_match_whole_frame(weights_df, method):
+    whole_engine = SampleWeightEngine('target', method=method, weight_col='price').fit(weights_df)
+    chunk_engine = SampleWeightEngine('target', method=method, weight_col='price')
+    chunks = [weights_df.iloc[start:start + 300] for start in range(0, weights_df.shape[0], 300)]
+    for chunk in chunks:
+        chunk_engine.partial_fit(chunk)
+
+    whole_weights = whole_engine.weights(weights_df)
+    out = np.empty(weights_df.shape[0], dtype=np.float32)
+    for start, chunk in zip(range(0, weights_df.shape[0], 300), chunks):
+        chunk_engine.weights(chunk, out=out[start:start + 300])
+    assert whole_weights.dtype == np.float32
+    assert np.allclose(out, whole_weights)
+
+    if method == 'balanced':
+        assert np.allclose(whole_weights, class_weight_array(weights_df.target.values))
+    elif method == 'inverse':
+        assert np.allclose(whole_weights, _np_where_inverse_weights(weights_df, 'target', 'price'))
+    else:
+        assert np.allclose(whole_weights, _np_where_even_weights(weights_df, 'target', 'price'))
+
+
+def test_balanced_weights_equalize_classes():
+    target = np.random.choice(['a', 'b', 'c', None], 1000, p=[.7, .2, .05, .05])
+    weights = class_weight_array(target)
+    totals = pd.Series(weights).groupby(pd.Series(target)).sum()
+    assert np.allclose(totals.values, totals.values[0])
+    assert (weights[pd.isnull(target)] == 0).all()
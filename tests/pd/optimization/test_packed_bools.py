@@ -0,0 +1,70 @@
+import pandas as pd
+import numpy as np
+import pytest
+from scipy import sparse as sp
+
+from data_science_toolbox.pandas.optimization.packed_bools import PackedBoolBlock
+
+
+@pytest.fixture(params=[1, 63, 64, 65, 200])
+def one_hot_df(request):
+    # Row counts around the 64 bit word boundary
+    n_rows = request.param
+    return pd.DataFrame(np.random.randint(0, 2, (n_rows, 4)), columns=['a', 'b', 'c', 'd'],
+                        index=np.arange(n_rows) * 2 + 5)
+
+
+def test_frame_round_trip(one_hot_df):
+    block = PackedBoolBlock.from_frame(one_hot_df)
+    assert block.shape == one_hot_df.shape
+    pd.testing.assert_frame_equal(block.to_frame(dtype=one_hot_df.dtypes[0]), one_hot_df)
+
+
+def test_csr_round_trip(one_hot_df):
+    matrix = sp.csr_matrix(one_hot_df.values.astype(np.uint8))
+    block = PackedBoolBlock.from_csr(matrix, columns=one_hot_df.columns.tolist())
+    assert (block.to_csr() != matrix).nnz == 0
+    assert (block.to_frame().values == one_hot_df.values).all()
+
+
+def test_reductions_match_pandas(one_hot_df):
+    block = PackedBoolBlock.from_frame(one_hot_df)
+    columns = ['a', 'c']
+    assert (block.any(columns) == one_hot_df[columns].any(axis=1).values).all()
+    assert (block.all(columns) == one_hot_df[columns].all(axis=1).values).all()
+    assert block.count().tolist() == one_hot_df.sum().tolist()
+    assert block.count_any(columns) == int(one_hot_df[columns].any(axis=1).sum())
+    assert block.count_all(columns) == int(one_hot_df[columns].all(axis=1).sum())
+
+    new_column = one_hot_df.a.values == 0
+    extended = block.with_column('not_a', new_column)
+    assert (extended.to_frame()['not_a'].values == new_column).all()
+
+
+def test_unknown_columns_raise():
+    block = PackedBoolBlock.from_frame(pd.DataFrame({'a': [1, 0], 'b': [0, 1]}))
+    with pytest.raises(KeyError, match='missing'):
+        block.any(['a', 'missing'])
+    with pytest.raises(KeyError):
+        block.count('missing')
+
+
+def test_csr_round_trip_wide_sparse_without_dense_copy():
+    import tracemalloc
+    n_rows, n_cols = 2000, 20000
+    rng = np.random.RandomState(0)
+    matrix = sp.csr_matrix((np.ones(4000), (rng.randint(0, n_rows, 4000), rng.randint(0, n_cols, 4000))),
+                           shape=(n_rows, n_cols))
+    # Explicit zeros and duplicate entries are handled like scipy does
+    matrix = sp.vstack([matrix, sp.csr_matrix(([0, 1, 1], ([0, 0, 0], [0, 5, 5])), shape=(1, n_cols))]).tocsr()
+    dense_nbytes = matrix.shape[0] * n_cols
+    tracemalloc.start()
+    block = PackedBoolBlock.from_csr(matrix)
+    round_trip = block.to_csr()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert peak < dense_nbytes / 4
+    matrix.eliminate_zeros()
+    assert round_trip.shape == matrix.shape
+    assert (round_trip != (matrix != 0)).nnz == 0
+    assert block.count().sum() == matrix.nnz